@@ -0,0 +1,111 @@
+"""
+Measure how long `http` takes to start.
+
+    $ python extras/profiling/startup.py
+    $ python extras/profiling/startup.py --runs 50 --top 30 -- --version
+
+Runs `python -m httpie <ARGS>` (by default `--offline example.org`, a whole
+run without the network; `--version` skips the plugins and the parser)
+repeatedly and prints the wall clock times, then runs it once with
+`-X importtime` and prints the modules with the largest cumulative import
+time, and what the plugins, pygments and requests cost on their own.
+
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run(args):
+    return subprocess.run(
+        [sys.executable, *args],
+        # Otherwise `http` waits for a request body on the inherited stdin.
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def wall_clock_times(http_args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run(['-m', 'httpie', *http_args])
+        times.append(time.perf_counter() - start)
+    return times
+
+
+# Imported by `httpie.plugins` (the formatters), worth watching on their own.
+PACKAGES = ['httpie.plugins', 'pygments', 'requests']
+
+
+def import_times(http_args):
+    """(cumulative µs, self µs, module) of every import, largest first."""
+    stderr = run(['-X', 'importtime', '-m', 'httpie', *http_args]).stderr
+    times = []
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, module = line[len('import time:'):].split('|')
+        times.append((int(cumulative), int(self_time), module.rstrip()))
+    return sorted(times, reverse=True)
+
+
+def package_times(times, package):
+    """(largest cumulative µs of one of the modules of `package`, self µs of
+    all of them), `None` when the run didn't import it.
+
+    Submodules are often imported on their own later on (`pygments.lexers`),
+    so the cumulative time of the package itself would miss them.
+
+    """
+    modules = [
+        (cumulative, self_time)
+        for cumulative, self_time, module in times
+        if module.strip() == package
+        or module.strip().startswith(package + '.')
+    ]
+    if not modules:
+        return None
+    return (max(cumulative for cumulative, _ in modules),
+            sum(self_time for _, self_time in modules))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('http_args', nargs='*',
+                        default=['--offline', 'example.org'])
+    args = parser.parse_args()
+
+    # The first run warms the bytecode and plugin discovery caches.
+    run(['-m', 'httpie', *args.http_args])
+
+    times = wall_clock_times(args.http_args, args.runs)
+    print(f'http {" ".join(args.http_args)}: {args.runs} runs')
+    print(f'  min    {min(times) * 1000:7.1f} ms')
+    print(f'  median {statistics.median(times) * 1000:7.1f} ms')
+    print(f'  max    {max(times) * 1000:7.1f} ms')
+    print()
+    times = import_times(args.http_args)
+    print('Slowest imports (cumulative):')
+    for cumulative, _, module in times[:args.top]:
+        print(f'  {cumulative / 1000:7.1f} ms  {module}')
+    print()
+    print('Packages (largest cumulative import / own modules):')
+    for package in PACKAGES:
+        package_time = package_times(times, package)
+        if package_time is None:
+            print(f'  {"not imported":>21}  {package}')
+        else:
+            cumulative, own = package_time
+            print(f'  {cumulative / 1000:7.1f} / {own / 1000:7.1f} ms  {package}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+"""
+Batch mode: many requests from one file, sent concurrently.
+
+    $ http --batch requests.txt --batch-concurrency 16 --batch-rate 50 --check-status
+    $ generate-requests | http --batch - --batch-order completed --batch-summary
+
+Each non-empty line of the batch file (`#` starts a comment line) is the
+arguments of one `http` invocation, e.g. `POST example.org/items name=x`,
+split like a shell would. The options on the command line apply to every
+request. The lines are parsed by the regular parser, so request items, auth,
+--form, --json etc. behave exactly as they do for a single request.
+
+The requests are sent by a pool of worker threads, each reusing one
+`requests.Session` (and so its keep-alive connections) for all of its
+requests. The output of each request is written with `write_message()`,
+in the order of the file or in the order the responses complete.
+
+"""
+import argparse
+import math
+import shlex
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+from httpie.context import Environment
+from httpie.status import ExitStatus, http_status_to_exit_status
+
+
+BATCH_ORDER_INPUT = 'input'
+BATCH_ORDER_COMPLETED = 'completed'
+DEFAULT_CONCURRENCY = 8
+# Requests submitted ahead of the output, per worker. Bounds the responses
+# held in memory while waiting for an earlier, slower one (--batch-order input).
+WINDOW_PER_WORKER = 2
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('--batch', metavar='FILE')
+    parser.add_argument(
+        '--batch-concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+    )
+    parser.add_argument('--batch-rate', type=float, default=None)
+    parser.add_argument(
+        '--batch-order',
+        choices=[BATCH_ORDER_INPUT, BATCH_ORDER_COMPLETED],
+        default=BATCH_ORDER_INPUT,
+    )
+    parser.add_argument('--batch-summary', action='store_true')
+    return parser
+
+
+def parse_batch_options(
+    args: List[str]
+) -> Tuple[argparse.Namespace, List[str]]:
+    """
+    Split the batch options off the raw args; they aren't options of
+    the regular parser, which requires a URL.
+
+    """
+    if not any(arg.startswith('--batch') for arg in args):
+        return argparse.Namespace(batch=None), args
+    return build_batch_parser().parse_known_args(args)
+
+
+class BatchSpec:
+    """One line of a batch file, parsed."""
+
+    def __init__(self, index: int, line: str, args: argparse.Namespace):
+        self.index = index
+        self.line = line
+        self.args = args
+
+
+class BatchResult:
+
+    def __init__(self, spec: BatchSpec):
+        self.spec = spec
+        self.messages = []
+        self.status_code = None
+        self.size = 0
+        self.elapsed = None
+        self.error = None
+        self.exit_status = ExitStatus.SUCCESS
+
+
+def read_batch_lines(
+    filename: str,
+    env: Environment
+) -> Iterator[Tuple[int, List[str]]]:
+    """Yield the line number and the arguments of each request line."""
+    if filename == '-':
+        f = env.stdin
+        close = False
+    else:
+        f = open(filename, encoding=env.stdin_encoding or 'utf8')
+        close = True
+    try:
+        for lineno, line in enumerate(f, 1):
+            if isinstance(line, bytes):
+                line = line.decode(env.stdin_encoding or 'utf8')
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield lineno, shlex.split(line)
+    finally:
+        if close:
+            f.close()
+
+
+def parse_batch(
+    parser: argparse.ArgumentParser,
+    filename: str,
+    shared_args: List[str],
+    env: Environment,
+) -> List[BatchSpec]:
+    """
+    Parse every line before anything is sent, so that a mistake on the last
+    line doesn't leave the batch half done.
+
+    """
+    specs = []
+    for lineno, line_args in read_batch_lines(filename, env):
+        try:
+            args = parser.parse_args(
+                # The batch file may be stdin, request bodies come from items.
+                args=shared_args + ['--ignore-stdin'] + line_args,
+                env=env,
+            )
+        except SystemExit:
+            env.log_error(f'{filename}:{lineno}: invalid request')
+            raise
+        if args.download or args.session or args.session_read_only:
+            env.log_error(
+                f'{filename}:{lineno}: --download and --session'
+                f' are not supported in batch mode'
+            )
+            raise SystemExit(ExitStatus.ERROR)
+        specs.append(BatchSpec(
+            index=len(specs),
+            line=f'{filename}:{lineno}',
+            args=args,
+        ))
+    return specs
+
+
+class RateLimiter:
+    """Spaces out the start of requests to at most `rate` per second."""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1 / rate if rate else 0
+        self.next_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class SessionPool:
+    """One `requests.Session` per worker thread (and SSL version)."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def get(self, ssl_version: Optional[str]) -> requests.Session:
+        from httpie.client import build_requests_session
+
+        sessions = self.local.__dict__.setdefault('sessions', {})
+        if ssl_version not in sessions:
+            session = build_requests_session(ssl_version=ssl_version)
+            sessions[ssl_version] = session
+            with self.lock:
+                self.sessions.append(session)
+        session = sessions[ssl_version]
+        # Requests are independent, like separate `http` invocations.
+        session.cookies.clear()
+        return session
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+
+def collect_pooled_messages(
+    args: argparse.Namespace,
+    requests_session: requests.Session,
+) -> Iterable[Union[requests.PreparedRequest, requests.Response]]:
+    """
+    `collect_messages()` on a given, reused requests session
+    (and without HTTPie sessions).
+
+    """
+    from httpie.client import (
+        compress_body, ensure_path_as_is, make_request_kwargs,
+        make_send_kwargs, make_send_kwargs_mergeable_from_env,
+    )
+
+    request_kwargs = make_request_kwargs(args=args)
+    send_kwargs = make_send_kwargs(args)
+    send_kwargs_mergeable_from_env = make_send_kwargs_mergeable_from_env(args)
+
+    request = requests.Request(**request_kwargs)
+    prepared_request = requests_session.prepare_request(request)
+    if args.path_as_is:
+        prepared_request.url = ensure_path_as_is(
+            orig_url=args.url,
+            prepped_url=prepared_request.url,
+        )
+    if args.compress and prepared_request.body:
+        compress_body(prepared_request, always=args.compress > 1)
+    response_count = 0
+    while prepared_request:
+        yield prepared_request
+        if not args.offline:
+            send_kwargs_merged = requests_session.merge_environment_settings(
+                url=prepared_request.url,
+                **send_kwargs_mergeable_from_env,
+            )
+            response = requests_session.send(
+                request=prepared_request,
+                **send_kwargs_merged,
+                **send_kwargs,
+            )
+            response_count += 1
+            if response.next:
+                if args.max_redirects and response_count == args.max_redirects:
+                    raise requests.TooManyRedirects
+                if args.follow:
+                    prepared_request = response.next
+                    if args.all:
+                        yield response
+                    continue
+            yield response
+        break
+
+
+def execute(
+    spec: BatchSpec,
+    sessions: SessionPool,
+    limiter: RateLimiter,
+) -> BatchResult:
+    """Send the request of `spec` and read the response (in a worker)."""
+    args = spec.args
+    result = BatchResult(spec)
+    limiter.wait()
+    start = time.monotonic()
+    try:
+        session = sessions.get(args.ssl_version)
+        for message in collect_pooled_messages(args, session):
+            if isinstance(message, requests.Response):
+                # Read now, so that the connection goes back to the pool
+                # and the latency includes the body.
+                result.size += len(message.content)
+                result.status_code = message.status_code
+            result.messages.append(message)
+    except requests.Timeout as e:
+        result.error = e
+        result.exit_status = ExitStatus.ERROR_TIMEOUT
+    except requests.TooManyRedirects as e:
+        result.error = e
+        result.exit_status = ExitStatus.ERROR_TOO_MANY_REDIRECTS
+    except Exception as e:
+        result.error = e
+        result.exit_status = ExitStatus.ERROR
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def iter_results(
+    specs: List[BatchSpec],
+    sessions: SessionPool,
+    limiter: RateLimiter,
+    concurrency: int,
+    ordered: bool,
+) -> Iterator[BatchResult]:
+    """
+    Send the requests `concurrency` at a time and yield their results
+    in the order of `specs` or as they complete.
+
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    remaining = iter(specs)
+    pending = deque()
+
+    def submit():
+        spec = next(remaining, None)
+        if spec is not None:
+            pending.append(executor.submit(execute, spec, sessions, limiter))
+
+    try:
+        for _ in range(concurrency * WINDOW_PER_WORKER):
+            submit()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            submit()
+            yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def write_result(result: BatchResult, env: Environment) -> ExitStatus:
+    from httpie.output.writer import write_message
+
+    args = result.spec.args
+    exit_status = result.exit_status
+    for message in result.messages:
+        write_message(requests_message=message, env=env, args=args)
+        if isinstance(message, requests.Response) and args.check_status:
+            exit_status = http_status_to_exit_status(
+                http_status=message.status_code,
+                follow=args.follow,
+            )
+            if (not env.stdout_isatty
+                    and exit_status != ExitStatus.SUCCESS):
+                env.log_error(
+                    f'{result.spec.line}: HTTP {message.raw.status}'
+                    f' {message.raw.reason}',
+                    level='warning'
+                )
+    if result.status_code is not None and not env.stdout_isatty:
+        # Keep the responses apart, e.g. one JSON document per line.
+        outfile = getattr(env.stdout, 'buffer', env.stdout)
+        outfile.write(b'\n')
+        outfile.flush()
+    if result.error:
+        env.log_error(
+            f'{result.spec.line}: {type(result.error).__name__}:'
+            f' {result.error}'
+        )
+    result.exit_status = exit_status
+    return exit_status
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def format_summary(results: List[BatchResult], total_time: float) -> str:
+    from httpie.utils import humanize_bytes
+
+    lines = []
+    for result in sorted(results, key=lambda r: r.spec.index):
+        args = result.spec.args
+        status = (
+            result.status_code if result.error is None
+            else type(result.error).__name__
+        )
+        lines.append(
+            f'  {result.spec.line}  {args.method} {args.url}  {status}'
+            f'  {result.elapsed:.3f}s  {humanize_bytes(result.size)}'
+        )
+
+    failed = sum(1 for r in results if r.exit_status != ExitStatus.SUCCESS)
+    rate = len(results) / total_time if total_time else 0
+    lines.append(
+        f'{len(results)} requests in {total_time:.2f}s ({rate:.1f}/s),'
+        f' {len(results) - failed} ok, {failed} failed'
+    )
+    statuses = Counter(
+        r.status_code for r in results if r.status_code is not None)
+    if statuses:
+        lines.append('status: ' + ', '.join(
+            f'{code} x{count}' for code, count in sorted(statuses.items())))
+    latencies = [r.elapsed for r in results]
+    if latencies:
+        lines.append(
+            f'latency: mean {sum(latencies) / len(latencies):.3f}s,'
+            f' p50 {percentile(latencies, 50):.3f}s,'
+            f' p90 {percentile(latencies, 90):.3f}s,'
+            f' p99 {percentile(latencies, 99):.3f}s,'
+            f' max {max(latencies):.3f}s'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def run_batch(
+    parser: argparse.ArgumentParser,
+    options: argparse.Namespace,
+    shared_args: List[str],
+    env: Environment,
+) -> ExitStatus:
+    """The batch counterpart of `core.program()`."""
+    from httpie.client import max_headers
+
+    specs = parse_batch(parser, options.batch, shared_args, env)
+    if not specs:
+        return ExitStatus.SUCCESS
+
+    sessions = SessionPool()
+    limiter = RateLimiter(options.batch_rate)
+    results = []
+    exit_status = ExitStatus.SUCCESS
+    start = time.monotonic()
+    # http.client._MAXHEADERS is global, set once rather than per request.
+    limits = {spec.args.max_headers for spec in specs}
+    try:
+        with max_headers(limits.pop() if len(limits) == 1 else None):
+            for result in iter_results(
+                specs=specs,
+                sessions=sessions,
+                limiter=limiter,
+                concurrency=max(1, options.batch_concurrency),
+                ordered=options.batch_order == BATCH_ORDER_INPUT,
+            ):
+                results.append(result)
+                if write_result(result, env) != ExitStatus.SUCCESS \
+                        and exit_status == ExitStatus.SUCCESS:
+                    exit_status = result.exit_status
+                # The output has it, don't keep it until the summary.
+                result.messages = []
+    finally:
+        sessions.close()
+        if options.batch_summary:
+            env.stderr.write(format_summary(results, time.monotonic() - start))
+
+    return exit_status
@@ -4,18 +4,15 @@ import platform
 import sys
 from typing import List, Union
 
-import requests
-from pygments import __version__ as pygments_version
-from requests import __version__ as requests_version
-
 from httpie import __version__ as httpie_version
-from httpie.client import collect_messages
 from httpie.context import Environment
-from httpie.downloads import Downloader
-from httpie.output.writer import write_message, write_stream
-from httpie.plugins import plugin_manager
 from httpie.status import ExitStatus, http_status_to_exit_status
 
+# requests, pygments, the client, the downloader and the output writer
+# are imported where they are used: most runs need only some of them,
+# `http --version` none, and they are most of the startup time
+# (see extras/profiling/startup.py).
+
 
 def main(
     args=sys.argv,
@@ -24,12 +21,25 @@ def main(
     program_name, *args = args # parse out specific argument, save rest to a list
     env.program_name = os.path.basename(program_name)
     args = decode_raw_args(args, env.stdin_encoding)
-    plugin_manager.load_installed_plugins()
-
-    from httpie.cli.definition import parser 
 
     if env.config.default_options:
         args = env.config.default_options + args 
+
+    if args == ['--version']:
+        # Fast path, no plugins, no parser.
+        env.stdout.write(f'{httpie_version}\n')
+        return ExitStatus.SUCCESS
+
+    from httpie.plugins import plugin_manager
+    from httpie.plugins.discovery import load_installed_plugins
+    # Only the installed plugins this run may use, from a cached discovery.
+    load_installed_plugins(plugin_manager, env, args)
+
+    from httpie.cli.definition import parser 
+    from httpie.batch import parse_batch_options
+    from httpie.ranged_downloads import parse_download_options
+    batch_options, args = parse_batch_options(args)
+    download_options, args = parse_download_options(args)
     
     include_debug_info = '--debug' in args
     include_traceback = include_debug_info or '--traceback' in args
@@ -42,10 +52,15 @@ def main(
     exit_status = ExitStatus.SUCCESS
 
     try: 
-        parsed_args = parser.parse_args(
-            args=args,
-            env=env,
-        )
+        if batch_options.batch:
+            # Every line of the batch file is parsed by run_batch().
+            parsed_args = None
+        else:
+            parsed_args = parser.parse_args(
+                args=args,
+                env=env,
+            )
+            vars(parsed_args).update(vars(download_options))
     except KeyboardInterrupt:
         env.stderr.write('\n')
         if include_traceback:
@@ -58,11 +73,21 @@ def main(
                 raise 
             exit_status = ExitStatus.Error 
     else:
+        import requests
         try:
-            exit_status = program(
-                args=parsed_args,
-                env=env,
-            )
+            if batch_options.batch:
+                from httpie.batch import run_batch
+                exit_status = run_batch(
+                    parser=parser,
+                    options=batch_options,
+                    shared_args=args,
+                    env=env,
+                )
+            else:
+                exit_status = program(
+                    args=parsed_args,
+                    env=env,
+                )
         except KeyboardInterrupt:
             env.stderr.write('\n')
             if include_traceback:
@@ -109,15 +134,147 @@ def program(
     The main program without error handling.
 
     """
+    import requests
+    from httpie.client import collect_messages
+    from httpie.downloads import Downloader
+    from httpie.output.writer import write_message, write_stream
+    from httpie.ranged_downloads import (
+        MIN_SEGMENT_SIZE, DownloadError, RangedDownload, get_ranged_body,
+        make_send, recover_partial_download, verify_checksum,
+    )
+
     exit_status = ExitStatus.SUCCESS
     downloader = None 
 
     try:
         if args.download:
             args.follow = True  # --download implies --follow.
+            if args.download_resume and args.output_file_specified:
+                recover_partial_download(args.output_file)
             downloader = Downloader(
                 output_file=args.output_file,
                 progress_file=env.stderr,
                 resume=args.download_resume
             )
-            downloader.pre_request(args.headers)
\ No newline at end of file
+            downloader.pre_request(args.headers)
+
+        initial_request = None
+        final_response = None
+
+        for message in collect_messages(args, env.config.directory):
+            write_message(
+                requests_message=message,
+                env=env,
+                args=args,
+            )
+            if isinstance(message, requests.PreparedRequest):
+                if not initial_request:
+                    initial_request = message
+            else:
+                final_response = message
+                if args.check_status or downloader:
+                    exit_status = http_status_to_exit_status(
+                        http_status=message.status_code,
+                        follow=args.follow
+                    )
+                    if (not env.stdout_isatty
+                            and exit_status != ExitStatus.SUCCESS):
+                        env.log_error(
+                            f'HTTP {message.raw.status} {message.raw.reason}',
+                            level='warning'
+                        )
+
+        if downloader and exit_status == ExitStatus.SUCCESS:
+            # Last response body download.
+            download_stream, download_to = downloader.start(
+                initial_url=initial_request.url,
+                final_response=final_response,
+            )
+            ranged_body = None
+            if args.download_segments > 1:
+                ranged_body = get_ranged_body(
+                    response=final_response,
+                    output_file=download_to,
+                    min_size=MIN_SEGMENT_SIZE,
+                )
+            if ranged_body:
+                # The rest in ranges over several connections.
+                start, total_size = ranged_body
+                download_to.flush()
+                send = make_send(args)
+                try:
+                    RangedDownload(
+                        final_response=final_response,
+                        send=send,
+                        filename=download_to.name,
+                        start=start,
+                        total_size=total_size,
+                        segments=args.download_segments,
+                        segment_size=args.download_segment_size,
+                        retries=args.download_retries,
+                        on_chunk=downloader.status.chunk_downloaded,
+                    ).run()
+                finally:
+                    send.close()
+            else:
+                write_stream(
+                    stream=download_stream,
+                    outfile=download_to,
+                    flush=False,
+                )
+            downloader.finish()
+            if downloader.interrupted:
+                exit_status = ExitStatus.ERROR
+                env.log_error(
+                    'Incomplete download: size=%d; downloaded=%d' % (
+                        downloader.status.total_size,
+                        downloader.status.downloaded
+                    ))
+            elif args.download_checksum:
+                download_to.flush()
+                try:
+                    verify_checksum(download_to.name, args.download_checksum)
+                except DownloadError as e:
+                    exit_status = ExitStatus.ERROR
+                    env.log_error(str(e))
+        return exit_status
+
+    finally:
+        if downloader and not downloader.finished:
+            downloader.failed()
+
+        if (not isinstance(args, list) and args.output_file
+                and args.output_file_specified):
+            args.output_file.close()
+
+
+def print_debug_info(env: Environment):
+    from pygments import __version__ as pygments_version
+    from requests import __version__ as requests_version
+
+    env.stderr.writelines([
+        f'HTTPie {httpie_version}\n',
+        f'Requests {requests_version}\n',
+        f'Pygments {pygments_version}\n',
+        f'Python {sys.version}\n{sys.executable}\n',
+        f'{platform.system()} {platform.release()}',
+    ])
+    env.stderr.write('\n\n')
+    env.stderr.write(repr(env))
+    env.stderr.write('\n')
+
+
+def decode_raw_args(
+    args: List[Union[str, bytes]],
+    stdin_encoding: str
+) -> List[str]:
+    """
+    Convert all bytes args to str
+    by decoding them using stdin encoding.
+
+    """
+    return [
+        arg.decode(stdin_encoding)
+        if type(arg) == bytes else arg
+        for arg in args
+    ]
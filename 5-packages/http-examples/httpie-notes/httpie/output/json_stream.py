@@ -0,0 +1,416 @@
+"""
+Incremental pretty-printing of large JSON bodies.
+
+`BufferedPrettyStream` reads the whole body, parses it with `json.loads()`,
+dumps it indented and highlights the result, so a few hundred MB of JSON
+need several times that much memory. `StreamingJSONPrettyStream` reads
+bodies up to `BUFFER_LIMIT` the same way, but a larger JSON body is
+tokenized as it arrives, re-indented and highlighted token by token and
+written out chunk by chunk, in memory bounded by the chunk size and the
+nesting depth.
+
+Unlike the buffered path, the streamed output keeps the keys in their
+original order and strings and numbers as they are written in the body
+(escapes included), which is what makes it incremental.
+
+"""
+import codecs
+import re
+from itertools import chain
+from typing import Iterable, List, Optional, Tuple
+
+from httpie.output.streams import BinarySuppressedError, BufferedPrettyStream
+
+
+# Bodies up to this size are read whole and go through the formatter
+# plugins as before.
+BUFFER_LIMIT = 1024 * 1024
+
+PUNCTUATION = 'punctuation'
+KEY = 'key'
+STRING = 'string'
+NUMBER = 'number'
+LITERAL = 'literal'
+WHITESPACE = 'whitespace'
+
+LITERALS = ('true', 'false', 'null')
+# Whitespace, then a complete string, a number or literal, or any other
+# character (punctuation, or the opening quote of an incomplete string).
+TOKEN_RE = re.compile(r'''
+    [ \t\r\n]*
+    (?:
+        ("[^"\\]*(?:\\.[^"\\]*)*")
+        |([-+0-9.eE]+|[a-z]+)
+        |([^ \t\r\n])
+    )
+''', re.VERBOSE | re.DOTALL)
+NUMBER_RE = re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?\Z')
+
+
+Token = Tuple[str, str]
+COLON_SPACE = (WHITESPACE, ' ')
+
+
+class JSONTokenizer:
+    """
+    Split JSON text fed in arbitrary pieces into tokens, validating the
+    structure on the way.
+
+    Whitespace is dropped. A long string may come out as several
+    consecutive tokens of the same kind, the first one starting with its
+    opening quote and the last one ending with its closing quote.
+
+    """
+
+    def __init__(self):
+        self.stack = []
+        # What may come next: 'value', 'key', 'colon', 'comma' or 'end'
+        # (only whitespace), and whether a closing bracket may, too.
+        self.expect = 'value'
+        self.closable = False
+        self.in_string = False
+        self.string_kind = None
+        self.escape = False
+        # The beginning of a number or literal cut off at the end of a piece.
+        self.partial = ''
+
+    def feed(self, text: str) -> List[Token]:
+        """Return the tokens of `text`, raise `ValueError` if it isn't JSON."""
+        text, self.partial = self.partial + text, ''
+        tokens = []
+        match = TOKEN_RE.match
+        i, n = 0, len(text)
+        while i < n:
+            if self.in_string:
+                i = self._scan_string(text, i, tokens)
+                continue
+
+            m = match(text, i)
+            if not m:
+                # Only whitespace left.
+                break
+            string, scalar, char = m.groups()
+            if string is not None and self.expect in ['key', 'value']:
+                kind = KEY if self.expect == 'key' else STRING
+                if kind == KEY:
+                    self._expect('colon')
+                else:
+                    self._after_value()
+                tokens.append((kind, string))
+            elif scalar is not None and self.expect == 'value':
+                if m.end() == n:
+                    # May continue in the next piece.
+                    self.partial = scalar
+                    break
+                tokens.append(self._scalar(scalar))
+            elif char == '"' and self.expect in ['key', 'value']:
+                # A string that continues in the next piece.
+                self.in_string = True
+                self.string_kind = KEY if self.expect == 'key' else STRING
+                self._scan_string(text, m.end(), tokens, start=m.start(3))
+                break
+            elif char is None:
+                raise ValueError(f'Unexpected {(string or scalar)[0]!r}')
+            elif char in '{[' and self.expect == 'value':
+                self.stack.append(char)
+                self._expect('key' if char == '{' else 'value', closable=True)
+                tokens.append((PUNCTUATION, char))
+            elif char in '}]' and self.closable \
+                    and self.stack[-1] == '{['['}]'.index(char)]:
+                self.stack.pop()
+                self._after_value()
+                tokens.append((PUNCTUATION, char))
+            elif char == ',' and self.expect == 'comma':
+                self._expect('key' if self.stack[-1] == '{' else 'value')
+                tokens.append((PUNCTUATION, char))
+            elif char == ':' and self.expect == 'colon':
+                self._expect('value')
+                tokens.append((PUNCTUATION, char))
+            else:
+                raise ValueError(f'Unexpected {char!r}')
+            i = m.end()
+        return tokens
+
+    def _expect(self, expect: str, closable: bool = False):
+        self.expect = expect
+        self.closable = closable
+
+    def _after_value(self):
+        if self.stack:
+            self._expect('comma', closable=True)
+        else:
+            self._expect('end')
+
+    def _scan_string(
+        self,
+        text: str,
+        i: int,
+        tokens: List[Token],
+        start: int = None
+    ) -> int:
+        start = i if start is None else start
+        n = len(text)
+        while i < n:
+            if self.escape:
+                self.escape = False
+                i += 1
+                continue
+            quote = text.find('"', i)
+            backslash = text.find('\\', i, n if quote == -1 else quote)
+            if backslash != -1:
+                self.escape = True
+                i = backslash + 1
+            elif quote == -1:
+                i = n
+            else:
+                i = quote + 1
+                self.in_string = False
+                if self.string_kind == KEY:
+                    self._expect('colon')
+                else:
+                    self._after_value()
+                break
+        if i > start:
+            tokens.append((self.string_kind, text[start:i]))
+        return i
+
+    def _scalar(self, value: str) -> Token:
+        if value in LITERALS:
+            kind = LITERAL
+        elif NUMBER_RE.match(value):
+            kind = NUMBER
+        else:
+            raise ValueError(f'Invalid value {value!r}')
+        self._after_value()
+        return kind, value
+
+    def close(self) -> List[Token]:
+        """Return the last tokens, raise `ValueError` if the JSON is cut off."""
+        tokens = [self._scalar(self.partial)] if self.partial else []
+        self.partial = ''
+        if self.in_string or self.expect != 'end':
+            raise ValueError('Unexpected end of JSON')
+        return tokens
+
+
+class JSONPrettyPrinter:
+    """
+    Re-indent a stream of tokens the way `json.dumps(indent=...)` lays out
+    JSON: one item per line, `": "` after keys, empty containers as `{}`.
+
+    """
+
+    def __init__(self, indent: int):
+        self.indent = ' ' * indent
+        self.depth = 0
+        # An opening bracket whose first item hasn't been seen yet.
+        self.pending_open = False
+        # The line break and indentation token of each depth.
+        self.newlines = []
+
+    def newline(self) -> Token:
+        while len(self.newlines) <= self.depth:
+            self.newlines.append(
+                (WHITESPACE, '\n' + self.indent * len(self.newlines)))
+        return self.newlines[self.depth]
+
+    def format(self, tokens: Iterable[Token]) -> List[Token]:
+        out = []
+        append = out.append
+        for token in tokens:
+            kind, value = token
+            if kind != PUNCTUATION:
+                if self.pending_open:
+                    self.pending_open = False
+                    append(self.newline())
+                append(token)
+            elif value in '}]':
+                self.depth -= 1
+                if self.pending_open:
+                    self.pending_open = False
+                else:
+                    append(self.newline())
+                append(token)
+            else:
+                if self.pending_open:
+                    self.pending_open = False
+                    append(self.newline())
+                append(token)
+                if value == ',':
+                    append(self.newline())
+                elif value == ':':
+                    append(COLON_SPACE)
+                else:
+                    self.depth += 1
+                    self.pending_open = True
+        return out
+
+
+def highlight(tokens: List[Token], formatter) -> str:
+    """Highlight `tokens` with a Pygments `formatter`, as its JSON lexer would."""
+    import pygments
+    from pygments.token import Keyword, Name, Number, Punctuation, String, Text
+
+    token_types = {
+        PUNCTUATION: Punctuation,
+        KEY: Name.Tag,
+        STRING: String.Double,
+        LITERAL: Keyword.Constant,
+        WHITESPACE: Text.Whitespace,
+    }
+    return pygments.format([
+        (
+            (Number.Float if any(c in value for c in '.eE') else
+             Number.Integer) if kind == NUMBER else token_types[kind],
+            value
+        )
+        for kind, value in tokens
+    ], formatter)
+
+
+class StreamingJSONPrettyStream(BufferedPrettyStream):
+    """
+    The same as :class:`BufferedPrettyStream` except that JSON bodies
+    larger than `BUFFER_LIMIT` are formatted incrementally.
+
+    Everything else (other content types, binary data, bodies that turn
+    out not to be JSON, formatter plugins that need the whole body) is
+    still buffered.
+
+    """
+
+    def iter_body(self) -> Iterable[bytes]:
+        chunks = self.msg.iter_body(self.CHUNK_SIZE)
+        head = bytearray()
+        for chunk in chunks:
+            head.extend(chunk)
+            if len(head) > BUFFER_LIMIT or b'\0' in chunk:
+                break
+        else:
+            # The whole body is here already.
+            yield from self.iter_buffered([head])
+            return
+
+        decoder = codecs.getincrementaldecoder(
+            self.msg.encoding or 'utf8')('replace')
+        tokenizer = JSONTokenizer()
+        options = None if b'\0' in head else self.get_json_options()
+        tokens = None
+        if options:
+            try:
+                tokens = tokenizer.feed(decoder.decode(bytes(head)))
+            except ValueError:
+                pass
+        if not tokens or tokens[0] not in [(PUNCTUATION, '{'),
+                                           (PUNCTUATION, '[')]:
+            yield from self.iter_buffered(chain([head], chunks))
+            return
+
+        indent, formatter = options
+        printer = JSONPrettyPrinter(indent=indent)
+
+        def render(tokens: List[Token]) -> bytes:
+            tokens = printer.format(tokens)
+            if formatter:
+                text = highlight(tokens, formatter)
+            else:
+                text = ''.join(value for _, value in tokens)
+            return text.encode(self.output_encoding, 'replace')
+
+        yield render(tokens)
+        for chunk in chunks:
+            if b'\0' in chunk:
+                raise BinarySuppressedError()
+            text = decoder.decode(chunk)
+            unparsed = tokenizer.partial + text
+            try:
+                tokens = tokenizer.feed(text)
+            except ValueError:
+                # Not JSON after all: the rest as it is.
+                yield from self.iter_unformatted(unparsed, decoder, chunks)
+                return
+            if tokens:
+                yield render(tokens)
+
+        text = decoder.decode(b'', final=True)
+        unparsed = tokenizer.partial + text
+        try:
+            tokens = tokenizer.feed(text) + tokenizer.close()
+        except ValueError:
+            tokens = []
+            yield unparsed.encode(self.output_encoding, 'replace')
+        if tokens:
+            yield render(tokens)
+
+    def iter_buffered(self, chunks: Iterable[bytes]) -> Iterable[bytes]:
+        # Read the whole body before prettifying it,
+        # but bail out immediately if the body is binary.
+        converter = None
+        body = bytearray()
+
+        for chunk in chunks:
+            if not converter and b'\0' in chunk:
+                converter = self.conversion.get_converter(self.mime)
+                if not converter:
+                    raise BinarySuppressedError()
+            body.extend(chunk)
+
+        if converter:
+            self.mime, body = converter.convert(body)
+
+        yield self.process_body(body)
+
+    def iter_unformatted(
+        self,
+        text: str,
+        decoder: codecs.IncrementalDecoder,
+        chunks: Iterable[bytes]
+    ) -> Iterable[bytes]:
+        yield text.encode(self.output_encoding, 'replace')
+        for chunk in chunks:
+            if b'\0' in chunk:
+                raise BinarySuppressedError()
+            yield decoder.decode(chunk).encode(self.output_encoding, 'replace')
+        yield decoder.decode(b'', final=True).encode(
+            self.output_encoding, 'replace')
+
+    def get_json_options(self) -> Optional[Tuple[int, object]]:
+        """
+        The indent and the Pygments formatter (or `None` without colors)
+        to format the body with, or `None` when it isn't to be formatted as
+        JSON, or another enabled formatter plugin needs the whole body.
+
+        """
+        from httpie.output.formatters.colors import ColorFormatter
+        from httpie.output.formatters.json import DEFAULT_INDENT, JSONFormatter
+        from httpie.output.processing import is_valid_mime
+        from httpie.plugins import FormatterPlugin
+
+        if not is_valid_mime(self.mime):
+            return None
+        json_formatter = color_formatter = None
+        for plugin in self.formatting.enabled_plugins:
+            if isinstance(plugin, JSONFormatter):
+                json_formatter = plugin
+            elif isinstance(plugin, ColorFormatter):
+                color_formatter = plugin
+            elif type(plugin).format_body is not FormatterPlugin.format_body:
+                return None
+        if json_formatter is None:
+            return None
+
+        # The same test as JSONFormatter.format_body().
+        maybe_json = ['json', 'javascript', 'text']
+        if not (json_formatter.kwargs['explicit_json']
+                or any(token in self.mime for token in maybe_json)):
+            return None
+
+        formatter = None
+        if color_formatter:
+            lexer = color_formatter.get_lexer_for_body(self.mime, '')
+            lexer_name = getattr(lexer, 'name', None)
+            if lexer_name == 'JSON' or (
+                    color_formatter.explicit_json
+                    and lexer_name in [None, 'Text only']):
+                formatter = color_formatter.formatter
+        return DEFAULT_INDENT, formatter
@@ -1,15 +1,15 @@
 import argparse
 import errno
+import os
+import threading
 from typing import Union, IO, TextIO, Tuple, Type
 
 import requests
 
 from httpie.context import Environment
 from httpie.models import HTTPRequest, HTTPResponse
-from httpie.output.processing import Conversion, Formatting
 from httpie.output.streams import (
-    RawStream, PrettyStream,
-    BufferedPrettyStream, EncodedStream,
+    RawStream, PrettyStream, EncodedStream,
     BaseStream,
 )
 from httpie.cli.constants import (
@@ -17,6 +17,15 @@ from httpie.cli.constants import (
 )
 
 
+# Output is collected into writes of at least this many bytes.
+OUTPUT_BUFFER_SIZE = 64 * 1024
+# When the output is flushed (a terminal, --stream), whatever has been
+# collected is written out at least this often (seconds).
+FLUSH_INTERVAL = 0.1
+# Read size when copying a response body straight to the output.
+PASSTHROUGH_CHUNK_SIZE = 1024 * 1024
+
+
 def write_message(
     requests_message: Union[requests.PreparedRequest, requests.Response],
     env: Environment,
@@ -35,18 +44,29 @@ def write_message(
     output_options = output_options_by_message_type[type(requests_message)]
     if not any(output_options.values()):
         return 
+    passthrough = can_pass_through(
+        env=env,
+        args=args,
+        requests_message=requests_message,
+        with_body=output_options['with_body'],
+    )
+    if passthrough:
+        # The headers as usual, the body bypasses the stream.
+        output_options['with_body'] = False
     write_stream_kwargs = {
         'stream': build_output_stream_for_message(
             args=args,
             env=env,
             requests_message=requests_message,
             **output_options
-        )
-        'outputfile': env.stdout,
+        ),
+        'outfile': env.stdout,
         'flush': env.stdout_isatty or args.stream
     }
     try: 
         write_stream(**write_stream_kwargs)
+        if passthrough:
+            write_raw_body(requests_message.raw, env.stdout)
     except IOError as e:
         show_traceback = args.debug or args.traceback
         if not show_traceback and e.errno == errno.EPIPE:
@@ -56,20 +76,152 @@ def write_message(
             raise
 
 
+class OutputBuffer:
+    """
+    Coalesces the chunks of a stream into few large writes.
+
+    With `flush`, what has been collected is also written out and flushed
+    at least every `flush_interval` seconds (from a background thread),
+    so a slow --stream still shows up promptly, but a fast one doesn't
+    cost a write and a flush per line.
+
+    """
+
+    def __init__(
+        self,
+        outfile: Union[IO, TextIO],
+        flush: bool = False,
+        size: int = OUTPUT_BUFFER_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.outfile = outfile
+        try:
+            self.buf = outfile.buffer
+        except AttributeError:
+            self.buf = outfile
+        self.size = size
+        self.pending = bytearray()
+        self.lock = threading.Lock()
+        self.error = None
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically,
+                args=(flush_interval,),
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def write(self, chunk: bytes):
+        if self.error:
+            raise self.error
+        with self.lock:
+            if not self.pending and len(chunk) >= self.size:
+                self.buf.write(chunk)
+            else:
+                self.pending += chunk
+                if len(self.pending) < self.size:
+                    return
+                self._write_pending()
+            if self._flusher:
+                self.outfile.flush()
+
+    def _write_pending(self):
+        if self.pending:
+            self.buf.write(self.pending)
+            del self.pending[:]
+
+    def _flush_periodically(self, interval: float):
+        while not self._closed.wait(interval):
+            with self.lock:
+                if not self.pending:
+                    continue
+                try:
+                    self._write_pending()
+                    self.outfile.flush()
+                except IOError as e:
+                    # Raised by the next write().
+                    self.error = e
+                    return
+
+    def flush(self):
+        if self.error:
+            raise self.error
+        with self.lock:
+            self._write_pending()
+            self.outfile.flush()
+
+    def close(self):
+        self._closed.set()
+        if self._flusher:
+            self._flusher.join()
+
+
 def write_stream(
     stream: BaseStream,
     outfile: Union[IO, TextIO],
     flush: bool
 ):
+    output = OutputBuffer(outfile, flush=flush)
     try:
-        buf = outfile.buffer 
-    except AttributeError:
-        buf = outfile 
-    
-    for chunk in stream: 
-        buf.write(chunk)
-        if flush:
-            outfile.flush()
+        for chunk in stream: 
+            output.write(chunk)
+        output.flush()
+    finally:
+        output.close()
+
+
+def can_pass_through(
+    env: Environment,
+    args: argparse.Namespace,
+    requests_message: Union[requests.PreparedRequest, requests.Response],
+    with_body: bool,
+) -> bool:
+    """
+    Whether the response body can be copied from the connection to the
+    output as it is, i.e. would be written unchanged by a `RawStream`.
+
+    """
+    if not with_body or not isinstance(requests_message, requests.Response):
+        return False
+    if env.stdout_isatty or args.prettify or args.stream:
+        return False
+    # iter_content() would decode it.
+    encoding = requests_message.headers.get('Content-Encoding', 'identity')
+    if encoding.strip().lower() != 'identity':
+        return False
+    # The body hasn't been read yet (the request was made with stream=True).
+    if requests_message._content is not False or requests_message.raw is None:
+        return False
+    try:
+        env.stdout.fileno()
+    except (AttributeError, IOError, ValueError):
+        return False
+    return True
+
+
+def write_raw_body(
+    raw,
+    outfile: Union[IO, TextIO],
+    chunk_size: int = PASSTHROUGH_CHUNK_SIZE
+):
+    """
+    Copy a response body straight from the connection to the file
+    descriptor of `outfile`, through one reused buffer.
+
+    """
+    outfile.flush()
+    fd = outfile.fileno()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        n = raw.readinto(buf)
+        if not n:
+            break
+        data = view[:n]
+        while data:
+            data = data[os.write(fd, data):]
 
 
 def build_output_stream_for_message(
@@ -116,7 +268,11 @@ def get_stream_type_and_kwargs(
             )
         }
     elif args.prettify:
-        stream_class = PrettyStream if args.stream else BufferedPrettyStream
+        # Formatting pulls in pygments and the formatter plugins.
+        from httpie.output.json_stream import StreamingJSONPrettyStream
+        from httpie.output.processing import Conversion, Formatting
+        stream_class = (
+            PrettyStream if args.stream else StreamingJSONPrettyStream)
         stream_kwargs = {
             'env': env,
             'conversion': Conversion(),
@@ -0,0 +1,192 @@
+"""
+Cached discovery of installed plugins.
+
+Scanning the entry points of every installed distribution is the slowest part
+of ``http`` startup. The result is cached in the config directory, keyed by the
+mtimes of the ``sys.path`` directories (installing or removing a distribution
+touches its site-packages directory), and only the plugins a run can actually
+use are imported:
+
+* auth plugins when ``--auth-type`` is given,
+* formatter and converter plugins when the output may be prettified,
+* transport plugins whose prefix one of the arguments starts with.
+
+Everything is loaded for ``--help``, ``--debug`` and ``--batch`` (the
+requests are in the batch file).
+
+"""
+import json
+import os
+import sys
+from importlib import import_module
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from httpie import __version__
+
+
+ENTRY_POINT_AUTH = 'httpie.plugins.auth.v1'
+ENTRY_POINT_FORMATTER = 'httpie.plugins.formatter.v1'
+ENTRY_POINT_CONVERTER = 'httpie.plugins.converter.v1'
+ENTRY_POINT_TRANSPORT = 'httpie.plugins.transport.v1'
+ENTRY_POINT_NAMES = [
+    ENTRY_POINT_AUTH,
+    ENTRY_POINT_FORMATTER,
+    ENTRY_POINT_CONVERTER,
+    ENTRY_POINT_TRANSPORT,
+]
+
+CACHE_FILENAME = 'plugins-cache.json'
+
+
+def iter_entry_points(group: str) -> Iterable[Tuple[str, str, Optional[str]]]:
+    """Yield ``(name, 'module:attr', package name)`` of the entry points."""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # Python < 3.8
+        from pkg_resources import iter_entry_points as pkg_entry_points
+        for entry_point in pkg_entry_points(group):
+            value = f'{entry_point.module_name}:{".".join(entry_point.attrs)}'
+            yield entry_point.name, value, entry_point.dist.key
+        return
+
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, 'select'):
+        selected = all_entry_points.select(group=group)
+    else:
+        selected = all_entry_points.get(group, [])
+    for entry_point in selected:
+        dist = getattr(entry_point, 'dist', None)
+        package_name = dist.metadata['name'].lower() if dist else None
+        yield entry_point.name, entry_point.value, package_name
+
+
+def load_entry_point(value: str):
+    module_name, _, attrs = value.partition(':')
+    obj = import_module(module_name)
+    for attr in filter(None, attrs.split('.')):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def fingerprint() -> list:
+    """What the cached discovery is valid for."""
+    paths = []
+    for path in sys.path:
+        try:
+            paths.append([path, os.stat(path or '.').st_mtime])
+        except OSError:
+            pass
+    return [__version__, sys.version, paths]
+
+
+class PluginDiscoveryCache:
+    """The installed plugins' entry points, with what is needed
+    to decide whether a run needs them (auth type, transport prefix).
+
+    """
+
+    def __init__(self, directory: Path):
+        self.path = Path(directory) / CACHE_FILENAME
+        # Plugins imported while scanning, by entry point value.
+        self.loaded = {}
+
+    def entries(self) -> List[dict]:
+        current = fingerprint()
+        try:
+            with self.path.open('rt') as f:
+                data = json.load(f)
+            if data['fingerprint'] == current:
+                return data['entries']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+
+        entries = self.scan()
+        self.save({'fingerprint': current, 'entries': entries})
+        return entries
+
+    def scan(self) -> List[dict]:
+        entries = []
+        for group in ENTRY_POINT_NAMES:
+            for name, value, package_name in iter_entry_points(group):
+                plugin = load_entry_point(value)
+                self.loaded[value] = plugin
+                entries.append({
+                    'group': group,
+                    'name': name,
+                    'value': value,
+                    'package_name': package_name,
+                    'auth_type': getattr(plugin, 'auth_type', None),
+                    'prefix': getattr(plugin, 'prefix', None),
+                })
+        return entries
+
+    def save(self, data: dict):
+        # Best effort, e.g. the config directory may be read-only.
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with tmp.open('w') as f:
+                json.dump(data, f)
+            os.replace(str(tmp), str(self.path))
+        except OSError:
+            pass
+
+    def load(self, entry: dict):
+        plugin = self.loaded.get(entry['value'])
+        if plugin is None:
+            plugin = self.loaded[entry['value']] = load_entry_point(entry['value'])
+        plugin.package_name = entry['package_name']
+        return plugin
+
+
+def _option_value(args: List[str], long: str, short: str = None):
+    for i, arg in enumerate(args):
+        if arg == long or (short and arg == short):
+            return args[i + 1] if i + 1 < len(args) else ''
+        if arg.startswith(long + '='):
+            return arg[len(long) + 1:]
+        if short and arg.startswith(short) and not arg.startswith('--'):
+            return arg[len(short):]
+    return None
+
+
+def needed_groups(args: List[str], stdout_isatty: bool) -> Set[str]:
+    """The entry point groups a run with these raw args may use,
+    deliberately erring on the side of loading too much.
+
+    """
+    if any(arg in ('--help', '--debug', '--batch')
+           or arg.startswith('--batch=') for arg in args):
+        return set(ENTRY_POINT_NAMES)
+
+    groups = {ENTRY_POINT_TRANSPORT}
+    if _option_value(args, '--auth-type', '-A') is not None:
+        groups.add(ENTRY_POINT_AUTH)
+
+    pretty = _option_value(args, '--pretty')
+    if pretty is None:
+        prettified = stdout_isatty or any(
+            arg in ('--json', '-j') for arg in args)
+    else:
+        prettified = pretty != 'none'
+    if prettified or _option_value(args, '--style', '-s') is not None:
+        groups.update([ENTRY_POINT_FORMATTER, ENTRY_POINT_CONVERTER])
+
+    return groups
+
+
+def load_installed_plugins(plugin_manager, env, args: List[str]):
+    """Register the installed plugins this run may use
+    (a cached replacement for ``plugin_manager.load_installed_plugins()``).
+
+    """
+    cache = PluginDiscoveryCache(env.config_dir)
+    groups = needed_groups(args, env.stdout_isatty)
+    for entry in cache.entries():
+        if entry['group'] not in groups:
+            continue
+        if entry['group'] == ENTRY_POINT_TRANSPORT and entry['prefix'] and \
+                not any(arg.startswith(entry['prefix']) for arg in args):
+            continue
+        plugin_manager.register(cache.load(entry))
@@ -0,0 +1,446 @@
+"""
+Parallel ranged downloads for `--download`.
+
+When the server advertises `Accept-Ranges: bytes` for a body of known length,
+the body is split into pieces fetched with `Range` requests over several
+connections at once and written straight to their offsets in the output
+file (`os.pwrite()`). A piece that fails is retried from where it stopped.
+
+The file stays resumable with `--continue`: while downloading, the length of
+the contiguous prefix that is complete is kept in `<file>.parts`, and an
+interrupted download is cut back to that prefix, so that a plain resume
+picks up from there (and goes parallel again for the rest).
+
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import IO, List, Optional, Tuple
+
+
+DEFAULT_SEGMENTS = 4
+# Pieces aren't made smaller than this, and smaller bodies aren't split.
+MIN_SEGMENT_SIZE = 1024 * 1024
+DEFAULT_RETRIES = 3
+CHUNK_SIZE = 256 * 1024
+PARTS_SUFFIX = '.parts'
+PARTS_SAVE_INTERVAL = 1.0
+
+SIZE_RE = re.compile(r'^(\d+)([kmg]?)i?b?$', re.IGNORECASE)
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class DownloadError(Exception):
+    pass
+
+
+def parse_size(value: str) -> int:
+    match = SIZE_RE.match(value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f'{value!r} is not a valid size')
+    number, unit = match.groups()
+    return int(number) * 1024 ** ' kmg'.index(unit.lower() or ' ')
+
+
+def parse_checksum(value: str) -> Tuple[str, str]:
+    algorithm, _, digest = value.partition(':')
+    if not digest or algorithm.lower() not in hashlib.algorithms_available:
+        raise argparse.ArgumentTypeError(
+            f'{value!r} is not ALGORITHM:HEXDIGEST, e.g. sha256:9f86d0...')
+    return algorithm.lower(), digest.lower()
+
+
+def build_download_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument(
+        '--download-segments',
+        type=int,
+        default=DEFAULT_SEGMENTS,
+    )
+    parser.add_argument('--download-segment-size', type=parse_size)
+    parser.add_argument(
+        '--download-retries',
+        type=int,
+        default=DEFAULT_RETRIES,
+    )
+    parser.add_argument('--download-checksum', type=parse_checksum)
+    return parser
+
+
+def parse_download_options(
+    args: List[str]
+) -> Tuple[argparse.Namespace, List[str]]:
+    """Split the ranged download options off the raw args."""
+    if not any(arg.startswith('--download-') for arg in args):
+        return build_download_parser().parse_args([]), args
+    return build_download_parser().parse_known_args(args)
+
+
+def make_send(args: argparse.Namespace):
+    """A `send(prepared_request)` for the worker threads, with the
+    request options of `args` and one session per thread."""
+    from httpie.batch import SessionPool
+    from httpie.client import (
+        make_send_kwargs, make_send_kwargs_mergeable_from_env,
+    )
+
+    sessions = SessionPool()
+    send_kwargs = make_send_kwargs(args)
+    send_kwargs_mergeable_from_env = make_send_kwargs_mergeable_from_env(args)
+
+    def send(request):
+        session = sessions.get(args.ssl_version)
+        send_kwargs_merged = session.merge_environment_settings(
+            url=request.url,
+            **send_kwargs_mergeable_from_env,
+        )
+        return session.send(request, **send_kwargs_merged, **send_kwargs)
+
+    send.close = sessions.close
+    return send
+
+
+def content_range(response) -> Tuple[int, int, Optional[int]]:
+    match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+    if not match:
+        raise DownloadError(
+            f'Invalid Content-Range'
+            f' {response.headers.get("Content-Range")!r}'
+        )
+    first, last, total = match.groups()
+    return int(first), int(last), None if total == '*' else int(total)
+
+
+def range_validator(response) -> Optional[str]:
+    """
+    The `If-Range` value that makes the server send the pieces only of the
+    body `response` is the start of, `None` if there's none.
+
+    A weak ETag (`W/"..."`) can't be used with `If-Range` (RFC 7233 3.2).
+
+    """
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def get_ranged_body(response, output_file: IO, min_size: int):
+    """
+    `(start, total size)` of the part of the body to download when
+    `response` can be downloaded in ranges into `output_file`, else `None`.
+
+    """
+    if response.status_code not in (200, 206):
+        return None
+    if not range_validator(response):
+        # Nothing to tell whether the pieces are of the same body.
+        return None
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return None
+    if response.status_code == 200:
+        if response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+            return None
+        try:
+            start, total_size = 0, int(response.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return None
+    else:
+        # --continue
+        try:
+            start, _, total_size = content_range(response)
+        except DownloadError:
+            return None
+        if total_size is None:
+            return None
+    try:
+        regular_file = os.path.isfile(output_file.name)
+    except (AttributeError, TypeError):
+        regular_file = False
+    if not regular_file or total_size - start < 2 * min_size:
+        return None
+    return start, total_size
+
+
+class Piece:
+    """A byte range of the body, `downloaded` bytes of it are in the file."""
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        # Exclusive.
+        self.end = end
+        self.downloaded = 0
+        self.attempts = 0
+
+    @property
+    def offset(self) -> int:
+        return self.start + self.downloaded
+
+    @property
+    def done(self) -> bool:
+        return self.offset >= self.end
+
+
+def plan_pieces(
+    start: int,
+    total_size: int,
+    segments: int,
+    segment_size: Optional[int] = None,
+) -> List[Piece]:
+    remaining = total_size - start
+    if not segment_size:
+        segment_size = -(-remaining // max(1, segments))
+    segment_size = max(segment_size, MIN_SEGMENT_SIZE)
+    return [
+        Piece(offset, min(offset + segment_size, total_size))
+        for offset in range(start, total_size, segment_size)
+    ]
+
+
+def contiguous_prefix(pieces: List[Piece]) -> int:
+    """The end of the complete part at the beginning of the file."""
+    prefix = pieces[0].start
+    for piece in pieces:
+        prefix = piece.offset
+        if not piece.done:
+            break
+    return prefix
+
+
+def parts_filename(filename: str) -> str:
+    return filename + PARTS_SUFFIX
+
+
+def recover_partial_download(output_file: IO):
+    """
+    Before `--continue`: cut a download that was interrupted without
+    cleaning up (killed) back to its last recorded complete prefix.
+
+    """
+    filename = parts_filename(output_file.name)
+    try:
+        with open(filename) as f:
+            prefix = json.load(f)['prefix']
+    except (IOError, OSError, ValueError, KeyError):
+        return
+    output_file.flush()
+    os.truncate(output_file.name, min(prefix, os.path.getsize(output_file.name)))
+    os.remove(filename)
+
+
+def verify_checksum(filename: str, checksum: Tuple[str, str]):
+    algorithm, expected = checksum
+    digest = hashlib.new(algorithm)
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if digest.hexdigest() != expected:
+        raise DownloadError(
+            f'{algorithm} checksum mismatch:'
+            f' expected {expected}, got {digest.hexdigest()}'
+        )
+
+
+class RangedDownload:
+    """
+    Fetch the rest of a body in pieces over `segments` connections.
+
+    :param final_response: the response to the download request, its body
+                           not read yet. It supplies the first piece.
+    :param send: `send(prepared_request)` returns a streamed response,
+                 called from the worker threads.
+    :param on_chunk: called with the size of every chunk written.
+
+    """
+
+    def __init__(
+        self,
+        final_response,
+        send,
+        filename: str,
+        start: int,
+        total_size: int,
+        segments: int = DEFAULT_SEGMENTS,
+        segment_size: int = None,
+        retries: int = DEFAULT_RETRIES,
+        on_chunk=None,
+    ):
+        self.final_response = final_response
+        self.send = send
+        self.filename = filename
+        self.total_size = total_size
+        self.segments = max(1, segments)
+        self.retries = retries
+        self.on_chunk = on_chunk
+        self.pieces = plan_pieces(start, total_size, segments, segment_size)
+        # Only a resource that hasn't changed since is to be pieced together.
+        self.validator = range_validator(final_response)
+        self.queue = queue.Queue()
+        self.stopped = threading.Event()
+        self.errors = []
+        self.fd = None
+        self.workers = []
+        # Guards the file descriptor, which is closed when stopping while
+        # a worker may still be about to write.
+        self.write_lock = threading.Lock()
+        self.progress_lock = threading.Lock()
+
+    def run(self):
+        # Recorded before the file is extended, a download killed from
+        # here on is cut back to what had been downloaded already.
+        self._save_parts()
+        self.fd = os.open(self.filename, os.O_WRONLY)
+        try:
+            os.ftruncate(self.fd, self.total_size)
+            first, *rest = self.pieces
+            for piece in rest:
+                self.queue.put(piece)
+            self.workers = [
+                threading.Thread(target=self._worker, args=(first,)),
+            ] + [
+                threading.Thread(target=self._worker)
+                for _ in range(min(self.segments, len(self.pieces)) - 1)
+            ]
+            for worker in self.workers:
+                worker.daemon = True
+                worker.start()
+            self._wait()
+        finally:
+            self._finish()
+        if self.errors:
+            raise self.errors[0]
+
+    def _wait(self):
+        try:
+            while any(worker.is_alive() for worker in self.workers):
+                for worker in self.workers:
+                    worker.join(PARTS_SAVE_INTERVAL / len(self.workers))
+                self._save_parts()
+        except BaseException:
+            self.stopped.set()
+            raise
+
+    def _finish(self):
+        self.stopped.set()
+        for worker in self.workers:
+            # Stops after its current read.
+            worker.join(1)
+        with self.write_lock:
+            if not all(piece.done for piece in self.pieces):
+                # Resumable with --continue.
+                os.ftruncate(self.fd, contiguous_prefix(self.pieces))
+            os.close(self.fd)
+            self.fd = None
+        try:
+            os.remove(parts_filename(self.filename))
+        except OSError:
+            pass
+
+    def _save_parts(self):
+        filename = parts_filename(self.filename)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump({
+                'total_size': self.total_size,
+                'prefix': contiguous_prefix(self.pieces),
+            }, f)
+        os.replace(filename + '.tmp', filename)
+
+    def _worker(self, piece: Piece = None):
+        response = None
+        if piece is not None:
+            response = self.final_response
+        while not self.stopped.is_set():
+            if piece is None:
+                try:
+                    piece = self.queue.get_nowait()
+                except queue.Empty:
+                    return
+            try:
+                self._fetch(piece, response)
+                piece = None
+            except DownloadError as e:
+                self._fail(e)
+            except Exception as e:
+                if piece.attempts > self.retries:
+                    self._fail(e)
+                else:
+                    # Again, from where it stopped.
+                    time.sleep(min(piece.attempts, 5))
+            response = None
+
+    def _fail(self, error: Exception):
+        self.errors.append(error)
+        self.stopped.set()
+
+    def _fetch(self, piece: Piece, response=None):
+        piece.attempts += 1
+        if response is None:
+            response = self._request(piece)
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if self.stopped.is_set():
+                    return
+                chunk = chunk[:piece.end - piece.offset]
+                if not self._write(chunk, piece.offset):
+                    return
+                piece.downloaded += len(chunk)
+                if self.on_chunk:
+                    with self.progress_lock:
+                        self.on_chunk(len(chunk))
+                if piece.done:
+                    return
+        finally:
+            response.close()
+        if not piece.done:
+            raise IOError(
+                f'Connection closed at byte {piece.offset}'
+                f' of {piece.start}-{piece.end - 1}'
+            )
+
+    def _request(self, piece: Piece):
+        request = self.final_response.request.copy()
+        request.headers['Range'] = f'bytes={piece.offset}-{piece.end - 1}'
+        if self.validator:
+            request.headers['If-Range'] = self.validator
+        response = self.send(request)
+        if response.status_code != 206:
+            response.close()
+            raise DownloadError(
+                f'HTTP {response.status_code} to a Range request'
+                f' (the resource may have changed on the server)'
+            )
+        first, last, total = content_range(response)
+        if first != piece.offset or (total not in (None, self.total_size)):
+            response.close()
+            raise DownloadError(
+                f'Unexpected Content-Range'
+                f' {response.headers["Content-Range"]!r}'
+                f' for bytes={piece.offset}-{piece.end - 1}'
+            )
+        return response
+
+    def _write(self, data: bytes, offset: int) -> bool:
+        """Write `data` at `offset`, `False` if stopped in the meantime."""
+        view = memoryview(data)
+        with self.write_lock:
+            if self.fd is None:
+                return False
+            if not hasattr(os, 'pwrite'):
+                os.lseek(self.fd, offset, os.SEEK_SET)
+            while view:
+                if hasattr(os, 'pwrite'):
+                    written = os.pwrite(self.fd, view, offset)
+                else:
+                    written = os.write(self.fd, view)
+                view = view[written:]
+                offset += written
+        return True
+
+    @property
+    def downloaded(self) -> int:
+        return sum(piece.downloaded for piece in self.pieces)
@@ -0,0 +1,202 @@
+import argparse
+import io
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from httpie import batch
+from httpie.batch import (
+    BATCH_ORDER_INPUT, WINDOW_PER_WORKER,
+    BatchResult, BatchSpec, RateLimiter, SessionPool, iter_results,
+    run_batch,
+)
+from httpie.cli.definition import parser
+from httpie.context import Environment
+from httpie.status import ExitStatus
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """Responds with the status in the path, e.g. `/404`."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        status = int(self.path.strip('/') or 200)
+        body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def env(tmp_path):
+    env = Environment(
+        config_dir=tmp_path / 'config',
+        stdin=None,
+        stdin_isatty=True,
+        stdout=io.BytesIO(),
+        stdout_isatty=False,
+        stdout_encoding='utf8',
+        # A text stream with a `buffer`, like sys.stderr, for the parser.
+        stderr=tempfile.TemporaryFile(mode='w+t'),
+        stderr_isatty=False,
+        colors=0,
+    )
+    yield env
+    env.stderr.close()
+
+
+def batch_file(tmp_path, lines):
+    path = tmp_path / 'requests.txt'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def batch_options(filename, concurrency=4, order=BATCH_ORDER_INPUT):
+    return argparse.Namespace(
+        batch=filename,
+        batch_concurrency=concurrency,
+        batch_rate=None,
+        batch_order=order,
+        batch_summary=False,
+    )
+
+
+def test_bad_line_rejected_before_anything_is_sent(server, env, tmp_path):
+    filename = batch_file(tmp_path, [
+        f'{server.url}/200',
+        '# a comment',
+        f'{server.url}/200 --no-such-option',
+    ])
+    with pytest.raises(SystemExit):
+        run_batch(parser, batch_options(filename), [], env)
+    assert server.requests == []
+    env.stderr.seek(0)
+    assert f'{filename}:3: invalid request' in env.stderr.read()
+
+
+def test_exit_status_is_the_first_failure(server, env, tmp_path):
+    filename = batch_file(tmp_path, [
+        f'{server.url}/200',
+        f'{server.url}/404',
+        f'{server.url}/500',
+        f'{server.url}/200',
+    ])
+    exit_status = run_batch(
+        parser, batch_options(filename, concurrency=1), ['--check-status'],
+        env)
+    assert exit_status == ExitStatus.ERROR_HTTP_4XX
+    assert server.requests == ['/200', '/404', '/500', '/200']
+    assert env.stdout.getvalue().count(b'{}') == 4
+
+
+class FakeExecute:
+    """Stands in for `batch.execute()`: request `i` takes `delays[i]`."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.lock = threading.Lock()
+        self.started = []
+        self.running = 0
+        self.max_running = 0
+
+    def __call__(self, spec, sessions, limiter):
+        with self.lock:
+            self.started.append(spec.index)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delays[spec.index])
+        with self.lock:
+            self.running -= 1
+        return BatchResult(spec)
+
+
+def collect_results(monkeypatch, delays, concurrency, ordered):
+    fake_execute = FakeExecute(delays)
+    monkeypatch.setattr(batch, 'execute', fake_execute)
+    specs = [
+        BatchSpec(index=i, line=f'requests.txt:{i + 1}', args=None)
+        for i in range(len(delays))
+    ]
+    window = concurrency * WINDOW_PER_WORKER
+    indexes = []
+    for result in iter_results(
+        specs=specs,
+        sessions=SessionPool(),
+        limiter=RateLimiter(None),
+        concurrency=concurrency,
+        ordered=ordered,
+    ):
+        indexes.append(result.spec.index)
+        with fake_execute.lock:
+            # Never more than the window ahead of the output.
+            assert max(fake_execute.started) < len(indexes) + window
+    assert fake_execute.max_running <= concurrency
+    return indexes
+
+
+def test_results_in_input_order(monkeypatch):
+    # The first request is the slowest, the rest wait for it in the window.
+    delays = [0.2] + [0.01] * 11
+    indexes = collect_results(monkeypatch, delays, concurrency=2, ordered=True)
+    assert indexes == list(range(12))
+
+
+def test_results_in_completed_order(monkeypatch):
+    # The other worker gets through the rest while the first one is slow.
+    delays = [0.5] + [0.01] * 7
+    indexes = collect_results(
+        monkeypatch, delays, concurrency=2, ordered=False)
+    assert indexes == list(range(1, 8)) + [0]
+
+
+def test_rate_limiter_spacing():
+    limiter = RateLimiter(50)
+    starts = []
+    lock = threading.Lock()
+
+    def start():
+        limiter.wait()
+        with lock:
+            starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=start) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    starts.sort()
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # 20 ms apart, give or take the scheduler.
+    assert min(gaps) > 0.015
+    assert starts[-1] - starts[0] > 5 * 0.02 - 0.01
+
+
+def test_rate_limiter_without_rate():
+    limiter = RateLimiter(None)
+    start = time.monotonic()
+    for _ in range(100):
+        limiter.wait()
+    assert time.monotonic() - start < 0.05
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from httpie import ranged_downloads
+from httpie.ranged_downloads import (
+    DownloadError, RangedDownload, get_ranged_body, parts_filename,
+    range_validator, recover_partial_download, verify_checksum,
+)
+
+
+BODY = os.urandom(10 * 1024 + 123)
+SEGMENT_SIZE = 1024
+LAST_MODIFIED = 'Tue, 01 Sep 2020 10:00:00 GMT'
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(dict(self.headers))
+        first, last = 0, len(BODY) - 1
+        match = re.match(r'^bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        partial = match and (if_range is None or if_range in (
+            server.etag, LAST_MODIFIED
+        ))
+        if partial:
+            first = int(match.group(1))
+            if match.group(2):
+                last = min(int(match.group(2)), last)
+            if first in server.fail_at:
+                server.fail_at.remove(first)
+                self.send_response(500)
+                self.end_headers()
+                return
+        self.send_response(206 if partial else 200)
+        if partial:
+            self.send_header(
+                'Content-Range', f'bytes {first}-{last}/{len(BODY)}')
+        self.send_header('Content-Length', str(last - first + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        if server.etag:
+            self.send_header('ETag', server.etag)
+        if server.last_modified:
+            self.send_header('Last-Modified', LAST_MODIFIED)
+        self.end_headers()
+        body = BODY[first:last + 1]
+        with server.lock:
+            drop = partial and first in server.drop_at
+            server.drop_at.discard(first)
+        if drop:
+            # The connection goes away in the middle of the piece.
+            body = body[:len(body) // 2]
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.etag = '"v1"'
+    server.last_modified = True
+    server.drop_at = set()
+    server.fail_at = set()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/file'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(ranged_downloads, 'MIN_SEGMENT_SIZE', SEGMENT_SIZE)
+    monkeypatch.setattr(ranged_downloads, 'CHUNK_SIZE', SEGMENT_SIZE // 4)
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def make_send(session):
+    def send(request):
+        return session.send(request, stream=True)
+    return send
+
+
+def download(session, url, output_file, headers=None, **kwargs):
+    """Like `--download`: the body, or the rest of it, goes to `output_file`
+    in ranges, `False` when it isn't downloadable in ranges."""
+    send = make_send(session)
+    final_response = send(
+        requests.Request('GET', url, headers=headers).prepare())
+    ranged_body = get_ranged_body(
+        response=final_response,
+        output_file=output_file,
+        min_size=SEGMENT_SIZE,
+    )
+    if not ranged_body:
+        final_response.close()
+        return False
+    start, total_size = ranged_body
+    output_file.flush()
+    RangedDownload(
+        final_response=final_response,
+        send=send,
+        filename=output_file.name,
+        start=start,
+        total_size=total_size,
+        segment_size=SEGMENT_SIZE,
+        **kwargs
+    ).run()
+    return True
+
+
+def range_requests(server):
+    return [headers for headers in server.requests if 'Range' in headers]
+
+
+def test_download_split_into_ranges(server, session, tmp_path):
+    path = tmp_path / 'file'
+    with open(path, 'wb') as f:
+        assert download(session, server.url, f, segments=3)
+    assert path.read_bytes() == BODY
+    assert not os.path.exists(parts_filename(str(path)))
+    ranges = sorted(
+        int(headers['Range'][len('bytes='):].split('-')[0])
+        for headers in range_requests(server)
+    )
+    # The first piece is the body of the response to the download request.
+    assert ranges == list(range(SEGMENT_SIZE, len(BODY), SEGMENT_SIZE))
+    assert all(
+        headers['If-Range'] == '"v1"' for headers in range_requests(server))
+
+
+def test_parts_recorded_before_file_is_extended(
+    server, session, tmp_path, monkeypatch
+):
+    path = tmp_path / 'file'
+    recorded = []
+    ftruncate = os.ftruncate
+
+    def record_parts(fd, length):
+        if length == len(BODY):
+            with open(parts_filename(str(path))) as parts:
+                recorded.append(json.load(parts))
+        ftruncate(fd, length)
+
+    monkeypatch.setattr(ranged_downloads.os, 'ftruncate', record_parts)
+    with open(path, 'wb') as f:
+        assert download(session, server.url, f)
+    assert recorded == [{'total_size': len(BODY), 'prefix': 0}]
+    assert path.read_bytes() == BODY
+
+
+def test_piece_retried_from_where_it_stopped(server, session, tmp_path):
+    server.drop_at.add(2 * SEGMENT_SIZE)
+    path = tmp_path / 'file'
+    with open(path, 'wb') as f:
+        assert download(session, server.url, f, retries=1)
+    assert path.read_bytes() == BODY
+    piece_ranges = [
+        headers['Range'] for headers in range_requests(server)
+        if headers['Range'].endswith(f'-{3 * SEGMENT_SIZE - 1}')
+    ]
+    assert piece_ranges == [
+        f'bytes={2 * SEGMENT_SIZE}-{3 * SEGMENT_SIZE - 1}',
+        f'bytes={2 * SEGMENT_SIZE + 512}-{3 * SEGMENT_SIZE - 1}',
+    ]
+
+
+def test_resume_after_failed_download(server, session, tmp_path):
+    server.fail_at.add(4 * SEGMENT_SIZE)
+    path = tmp_path / 'file'
+    with open(path, 'wb') as f:
+        with pytest.raises(DownloadError):
+            download(session, server.url, f, segments=1)
+    # Cut back to the complete prefix, resumable with --continue.
+    assert path.read_bytes() == BODY[:4 * SEGMENT_SIZE]
+    assert not os.path.exists(parts_filename(str(path)))
+
+    server.requests.clear()
+    with open(path, 'ab') as f:
+        recover_partial_download(f)
+        start = os.path.getsize(path)
+        assert download(
+            session, server.url, f, headers={'Range': f'bytes={start}-'})
+    assert path.read_bytes() == BODY
+    assert server.requests[0]['Range'] == f'bytes={4 * SEGMENT_SIZE}-'
+
+
+def test_recover_killed_download(tmp_path):
+    path = tmp_path / 'file'
+    path.write_bytes(BODY[:3000] + bytes(len(BODY) - 3000))
+    with open(parts_filename(str(path)), 'w') as parts:
+        json.dump({'total_size': len(BODY), 'prefix': 2048}, parts)
+    with open(path, 'ab') as f:
+        recover_partial_download(f)
+    assert path.read_bytes() == BODY[:2048]
+    assert not os.path.exists(parts_filename(str(path)))
+
+
+def test_verify_checksum(server, session, tmp_path):
+    path = tmp_path / 'file'
+    with open(path, 'wb') as f:
+        assert download(session, server.url, f)
+    verify_checksum(str(path), ('sha256', hashlib.sha256(BODY).hexdigest()))
+    with pytest.raises(DownloadError, match='sha256 checksum mismatch'):
+        verify_checksum(str(path), ('sha256', hashlib.sha256(b'').hexdigest()))
+
+
+def test_weak_etag_not_used_as_if_range(server, session, tmp_path):
+    server.etag = 'W/"v1"'
+    path = tmp_path / 'file'
+    with open(path, 'wb') as f:
+        assert download(session, server.url, f)
+    assert path.read_bytes() == BODY
+    assert range_requests(server)
+    assert all(
+        headers['If-Range'] == LAST_MODIFIED
+        for headers in range_requests(server)
+    )
+
+
+def test_single_stream_without_strong_validator(server, session, tmp_path):
+    server.etag = 'W/"v1"'
+    server.last_modified = False
+    response = session.get(server.url, stream=True)
+    assert range_validator(response) is None
+    with open(tmp_path / 'file', 'wb') as f:
+        assert get_ranged_body(response, f, min_size=SEGMENT_SIZE) is None
+    response.close()
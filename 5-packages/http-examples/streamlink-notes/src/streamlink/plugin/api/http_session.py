@@ -1,5 +1,214 @@
+import copy
+import io
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from xml.etree import ElementTree as ET
+
 from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError, HTTPError, Timeout
+
+# ijson is only needed for HTTPSession.json_stream, without it the whole body is parsed at once
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from streamlink.compat import urlparse
+from streamlink.exceptions import PluginError
 from streamlink.plugin.api import useragents
+from streamlink.plugin.api.validate import Schema, items
+
+
+def _build_json(events, projection):
+    """Builds a document from ijson basic_parse events, skipping what the projection leaves out"""
+    root = []
+    # [container, projection, current key] of every open object / array
+    stack = []
+    skip = 0
+
+    for event, value in events:
+        if skip:
+            # inside a skipped value, only track how deep
+            if event in ("start_map", "start_array"):
+                skip += 1
+            elif event in ("end_map", "end_array"):
+                skip -= 1
+            continue
+
+        if event == "map_key":
+            stack[-1][2] = value
+            continue
+
+        if event in ("end_map", "end_array"):
+            value = stack.pop()[0]
+        else:
+            projection_ = projection
+            if stack:
+                parent, parent_projection, key = stack[-1]
+                if isinstance(parent, dict):
+                    if isinstance(parent_projection, dict):
+                        if key not in parent_projection:
+                            skip = 1 if event in ("start_map", "start_array") else 0
+                            continue
+                        projection_ = parent_projection[key]
+                    else:
+                        projection_ = None
+                else:
+                    projection_ = parent_projection.projection if isinstance(parent_projection, items) else None
+
+            if event == "start_map":
+                stack.append([{}, projection_ if isinstance(projection_, dict) else None, None])
+                continue
+            if event == "start_array":
+                stack.append([[], projection_ if isinstance(projection_, items) else None, None])
+                continue
+
+        if stack:
+            parent, _, key = stack[-1]
+            if isinstance(parent, dict):
+                parent[key] = value
+            else:
+                parent.append(value)
+        else:
+            root.append(value)
+
+    if not root:
+        raise ValueError("empty document")
+    return root[0]
+
+
+_DROP = object()
+
+
+def _xml_projection(projection):
+    # a list projection means the same for each of the found elements
+    return projection.projection if isinstance(projection, items) else projection
+
+
+def _build_xml(fd, projection):
+    """Parses XML with iterparse, dropping the elements the projection leaves out as soon as they end"""
+    root = None
+    # (element, projection) of every open element, _DROP for the ones that won't be kept
+    stack = []
+
+    for event, elem in ET.iterparse(fd, events=("start", "end")):
+        if event == "start":
+            if not stack:
+                root = elem
+                elem_projection = _xml_projection(projection)
+            else:
+                parent_projection = stack[-1][1]
+                if parent_projection is _DROP:
+                    elem_projection = _DROP
+                elif isinstance(parent_projection, dict):
+                    elem_projection = _xml_projection(parent_projection.get(elem.tag, _DROP))
+                else:
+                    elem_projection = None
+            stack.append((elem, elem_projection))
+        else:
+            elem, elem_projection = stack.pop()
+            if elem_projection is _DROP:
+                elem.clear()
+                if stack and stack[-1][1] is not _DROP:
+                    stack[-1][0].remove(elem)
+
+    return root
+
+
+# worth another attempt, any other 4xx will fail the same way again
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+# longest Retry-After we are willing to sleep through
+RETRY_AFTER_MAX = 60.0
+# adaptive timeouts never go below this
+MIN_TIMEOUT = 3.0
+# responses kept for conditional requests
+CONDITIONAL_CACHE_SIZE = 64
+
+
+def _retry_after(err):
+    """Seconds from the Retry-After header of a failed response, None without one"""
+    res = getattr(err, "response", None)
+    value = res is not None and res.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(err):
+    """Transport errors and the HTTP errors worth another try, not e.g. an InvalidURL"""
+    if isinstance(err, HTTPError):
+        return err.response is not None and \
+            (err.response.status_code in RETRY_STATUSES or err.response.status_code >= 500)
+    return isinstance(err, (ConnectionError, Timeout, ChunkedEncodingError))
+
+
+def _backoff_delay(retries, retry_backoff, retry_max_backoff, retry_after=None):
+    """Full jitter exponential backoff, or the server's Retry-After when it sent one"""
+    if retry_after is not None:
+        return min(retry_after, RETRY_AFTER_MAX)
+    return random.uniform(0, min(retry_max_backoff, retry_backoff * (2 ** (retries - 1))))
+
+
+class HostStats(object):
+    """Latency and error stats of one host
+
+    The latency estimate works like TCP's retransmission timeout (RFC 6298):
+    a smoothed latency plus four times its variation, doubled after each timeout.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.not_modified = 0
+        self.latency = None
+        self.latency_var = None
+        self.consecutive_timeouts = 0
+
+    def add_response(self, latency):
+        self.requests += 1
+        self.consecutive_timeouts = 0
+        if self.latency is None:
+            self.latency = latency
+            self.latency_var = latency / 2
+        else:
+            self.latency_var = 0.75 * self.latency_var + 0.25 * abs(self.latency - latency)
+            self.latency = 0.875 * self.latency + 0.125 * latency
+
+    def add_error(self, err, responded=False):
+        # an error status response has been counted by add_response() already
+        if not responded:
+            self.requests += 1
+        self.errors += 1
+        if isinstance(err, Timeout):
+            self.timeouts += 1
+            self.consecutive_timeouts += 1
+
+    def timeout(self, default):
+        # not enough samples yet to trust the estimate
+        if self.latency is None or self.requests - self.errors < 5:
+            return default
+        timeout = max(MIN_TIMEOUT, self.latency + 4 * self.latency_var)
+        return min(default, timeout * (2 ** self.consecutive_timeouts))
+
+    def as_dict(self):
+        return dict(requests=self.requests, errors=self.errors, timeouts=self.timeouts,
+                    retries=self.retries, not_modified=self.not_modified,
+                    latency=self.latency, latency_var=self.latency_var)
 
 
 def _parse_keyvalue_list(val):
@@ -13,6 +222,8 @@ def _parse_keyvalue_list(val):
 
 class HTTPSession(Session):
     def __init__(self, *args, **kwargs):
+        pool_connections = kwargs.pop("pool_connections", 10)
+        pool_maxsize = kwargs.pop("pool_maxsize", 10)
         Session.__init__(self, *args, **kwargs)
 
         if self.headers['User-Agent'].startswith('python-requests'):
@@ -20,6 +231,59 @@ class HTTPSession(Session):
         
         self.timeout = 20.0 
 
+        self.set_pool_size(pool_connections, pool_maxsize)
+
+        self._stats_lock = threading.Lock()
+        self._host_stats = {}
+        # (url, params, headers) -> last 200 response with an ETag or Last-Modified, least recently used first
+        self._conditional_cache = OrderedDict()
+        self._local = threading.local()
+
+    def set_pool_size(self, pool_connections, pool_maxsize):
+        """Keeps up to pool_connections hosts with up to pool_maxsize connections each"""
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        for prefix in ("http://", "https://"):
+            old = self.adapters.get(prefix)
+            self.mount(prefix, HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+            if old is not None:
+                old.close()
+
+    def set_host_pool_size(self, host, maxsize):
+        """Keeps up to maxsize connections to host (e.g. a CDN serving segments to several threads)"""
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+        # requests picks the adapter with the longest matching prefix
+        self.mount("http://{0}/".format(host), adapter)
+        self.mount("https://{0}/".format(host), adapter)
+
+    @contextmanager
+    def conditional_requests(self):
+        """
+        Makes the GET requests of this thread conditional by default while in the block,
+        for code that doesn't know about it (e.g. a plugin's stream extraction being polled)
+        """
+        previous = getattr(self._local, "conditional", False)
+        self._local.conditional = True
+        try:
+            yield
+        finally:
+            self._local.conditional = previous
+
+    def host_stats(self, host=None):
+        """Returns the stats of host as a dict, or of every host as a dict of dicts"""
+        with self._stats_lock:
+            if host is not None:
+                stats = self._host_stats.get(host)
+                return stats.as_dict() if stats else None
+            return dict((host, stats.as_dict()) for host, stats in self._host_stats.items())
+
+    def _get_host_stats(self, host):
+        with self._stats_lock:
+            stats = self._host_stats.get(host)
+            if stats is None:
+                stats = self._host_stats[host] = HostStats()
+            return stats
+
     @classmethod 
     def determine_json_encoding(cls, sample):
         nulls_at = [i for i, j in enumerate(bytearray(sample[:4])) if j == 0]
@@ -46,6 +310,56 @@ class HTTPSession(Session):
     @classmethod 
     def xml(cls, res, *args, **kwargs):
         return parse_xml(res.text, *args, **kwargs)
+
+    # incremental versions of the above, for responses requested with stream=True
+    # with a schema, the parts of the document it doesn't reference are parsed but never built
+
+    @classmethod
+    def json_stream(cls, res, schema=None, name="JSON", exception=PluginError):
+        """Parses JSON from a streamed response while it downloads, then validates it against schema
+
+        Falls back to parsing the whole body without ijson, or when the body isn't UTF-8.
+        """
+        if schema is not None and not isinstance(schema, Schema):
+            schema = Schema(schema)
+
+        res.raw.decode_content = True
+        # buffered for peek(), urllib3 mustn't close the raw stream under the buffer at EOF
+        res.raw.auto_close = False
+        fd = io.BufferedReader(res.raw)
+        try:
+            encoding = res.encoding or cls.determine_json_encoding(fd.peek(4)[:4])
+            if ijson is not None and encoding.upper().replace("-", "") == "UTF8":
+                value = _build_json(ijson.basic_parse(fd, use_float=True),
+                                    schema.projection() if schema else None)
+            else:
+                value = json.loads(fd.read().decode(encoding))
+        except (ValueError, ijson.JSONError if ijson else ValueError) as err:
+            raise exception("Unable to parse {0}: {1}".format(name, err))
+        finally:
+            res.close()
+
+        if schema is not None:
+            value = schema.validate(value, name=name, exception=exception)
+        return value
+
+    @classmethod
+    def xml_stream(cls, res, schema=None, name="XML", exception=PluginError):
+        """Parses XML from a streamed response while it downloads, then validates it against schema"""
+        if schema is not None and not isinstance(schema, Schema):
+            schema = Schema(schema)
+
+        res.raw.decode_content = True
+        try:
+            value = _build_xml(res.raw, schema.projection() if schema else None)
+        except ET.ParseError as err:
+            raise exception("Unable to parse {0}: {1}".format(name, err))
+        finally:
+            res.close()
+
+        if schema is not None:
+            value = schema.validate(value, name=name, exception=exception)
+        return value
     
     def parse_cookies(self, cookies, **kwargs):
         for name, value in _parse_keyvalue_list(cookies):
@@ -71,42 +385,94 @@ class HTTPSession(Session):
         """Resolves any redirects and returns the final URL."""
         return self.get(url, stream=True).url    
 
-    def request(self, mthod, url, *args, **kwargs):
-        headers = kwargs.pop("headers", {})
+    def request(self, method, url, *args, **kwargs):
+        acceptable_status = kwargs.pop("acceptable_status", [])
         exception = kwargs.pop("exception", PluginError)
-        params = kwargs.pop("params", {})
+        headers = kwargs.pop("headers", None) or {}
+        params = kwargs.pop("params", None) or {}
+        proxies = kwargs.pop("proxies", self.proxies)
         raise_for_status = kwargs.pop("raise_for_status", True)
-
+        schema = kwargs.pop("schema", None)
+        session = kwargs.pop("session", None)
+        timeout = kwargs.pop("timeout", None)
+        total_retries = kwargs.pop("retries", 0)
+        retry_backoff = kwargs.pop("retry_backoff", 0.3)
+        retry_max_backoff = kwargs.pop("retry_max_backoff", 10.0)
+        # send If-None-Match / If-Modified-Since, e.g. when polling a live playlist
+        conditional = kwargs.pop("conditional", getattr(self._local, "conditional", False))
+        retries = 0
 
         if session:
             headers.update(session.headers)
             params.update(session.params)
 
+        stats = self._get_host_stats(urlparse(url).netloc)
+
+        cache_key = cached = None
+        not_modified = False
+        if conditional and method.upper() == "GET" and not kwargs.get("stream"):
+            # the headers are part of the key, a response for one Authorization or Client-ID
+            # must not be handed to a request made with another
+            request_headers = dict((k.lower(), v) for k, v in self.headers.items())
+            request_headers.update((k.lower(), v) for k, v in headers.items())
+            cache_key = (url, tuple(sorted(params.items())), tuple(sorted(request_headers.items())))
+            with self._stats_lock:
+                cached = self._conditional_cache.get(cache_key)
+                if cached is not None:
+                    self._conditional_cache.move_to_end(cache_key)
+            if cached is not None:
+                headers = dict(headers)
+                if cached.headers.get("ETag"):
+                    headers["If-None-Match"] = cached.headers["ETag"]
+                if cached.headers.get("Last-Modified"):
+                    headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
         while True:
+            res = None
             try:
-                res = Session.request(self, method, url, 
+                res = Session.request(self, method, url,
                                       headers=headers,
                                       params=params,
-                                      timeout=timeout,
+                                      # an explicit timeout wins, otherwise it follows the host's latency
+                                      timeout=timeout or stats.timeout(self.timeout),
                                       proxies=proxies,
                                       *args, **kwargs)
-                if raise_for_status and res.status_cide not in acceptable_status:
+                with self._stats_lock:
+                    stats.add_response(res.elapsed.total_seconds())
+                if res.status_code == 304 and cached is not None:
+                    with self._stats_lock:
+                        stats.not_modified += 1
+                    # a copy, callers may change theirs (e.g. set encoding)
+                    res = copy.copy(cached)
+                    not_modified = True
+                    break
+                if raise_for_status and res.status_code not in acceptable_status:
                     res.raise_for_status()
                 break 
             except KeyboardInterrupt:
                 raise 
-            except Exception as err: 
-                if retries >= total_retries:
+            except Exception as rerr: 
+                with self._stats_lock:
+                    stats.add_error(rerr, responded=res is not None)
+                if retries >= total_retries or not _is_retryable(rerr):
                     err = exception("Unable to open URL: {url} ({err})".format(url=url,
                                                                                err=rerr))
                     err.err = rerr
                     raise err
-                retries +=1
-                delay = min(retry_max_backoff,
-                            retry_backoff * (2 ** (retries - 1)))
-                time.sleep(delay)
+                retries += 1
+                with self._stats_lock:
+                    stats.retries += 1
+                time.sleep(_backoff_delay(retries, retry_backoff, retry_max_backoff, _retry_after(rerr)))
+
+        if cache_key and not not_modified and res.status_code == 200 and \
+                (res.headers.get("ETag") or res.headers.get("Last-Modified")):
+            with self._stats_lock:
+                self._conditional_cache[cache_key] = res
+                self._conditional_cache.move_to_end(cache_key)
+                while len(self._conditional_cache) > CONDITIONAL_CACHE_SIZE:
+                    self._conditional_cache.popitem(last=False)
         
         if schema:
             res = schema.validate(res.text, name="response text", exception=PluginError)
 
-        return res 
\ No newline at end of file
+        return res
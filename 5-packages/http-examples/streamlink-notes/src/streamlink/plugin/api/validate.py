@@ -31,7 +31,7 @@ __all__ = [
     "any", "all", "filter", "get", "getattr", "hasattr", "length", "optional",
     "transform", "text", "union", "url", "startswith", "endswith", "contains",
     "xml_element", "xml_find", "xml_findall", "xml_findtext",
-    "validate", "Schema", "SchemaContainer"
+    "validate", "compile_schema", "schema_projection", "Schema", "SchemaContainer"
 ]
 
 #: Alias for text type on each Python version
@@ -174,7 +174,10 @@ def get(item, default=None):
         except (TypeError, AttributeError) as err:
             raise ValueError(err)
 
-    return transform(getter)
+    getter = transform(getter)
+    # lets schema_projection() see which item is used
+    getter.item = item
+    return getter
 
 
 def getattr(attr, default=None):
@@ -281,7 +284,9 @@ def xml_find(xpath):
 
         return validate(ET.iselement, value)
 
-    return transform(xpath_find)
+    xpath_find = transform(xpath_find)
+    xpath_find.xpath = xpath
+    return xpath_find
 
 
 def xml_findall(xpath):
@@ -290,7 +295,9 @@ def xml_findall(xpath):
         validate(ET.iselement, value)
         return value.findall(xpath)
 
-    return transform(xpath_findall)
+    xpath_findall = transform(xpath_findall)
+    xpath_findall.xpath = xpath
+    return xpath_findall
 
 
 def xml_findtext(xpath):
@@ -471,15 +478,416 @@ def validate_unions(schema, value):
     return validate_union(schema.schema, value)
 
 
+# Compiled schemas
+#
+# validate() interprets the schema on every call: singledispatch on each node,
+# any(*schema) rebuilt for every list element, dict keys re-inspected for every value.
+# compile_schema() does all of that once and returns a tree of closures that only
+# do the checks themselves. Errors (and their messages) are the same as validate()'s
+# and are only built when a check fails.
+
+def _type_error(schema, value):
+    return ValueError(
+        "Type of {0!r} should be '{1}' but is '{2}'".format(
+            value, schema.__name__, type(value).__name__
+        )
+    )
+
+
+@singledispatch
+def _compile(schema):
+    if callable(schema):
+        def check_callable(value):
+            if schema(value):
+                return value
+            raise ValueError("{0}({1!r}) is not true".format(schema.__name__, value))
+
+        return check_callable
+
+    def check_equal(value):
+        if schema == value:
+            return value
+        raise ValueError("{0!r} does not equal {1!r}".format(value, schema))
+
+    return check_equal
+
+
+@_compile.register(type)
+def _compile_type(schema):
+    def check_type(value):
+        if isinstance(value, schema):
+            return value
+        raise _type_error(schema, value)
+
+    return check_type
+
+
+@_compile.register(any)
+def _compile_any(schema):
+    checks = [_compile(subschema) for subschema in schema]
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_any(value):
+        errors = []
+        for check in checks:
+            try:
+                return check(value)
+            except ValueError as err:
+                errors.append(err)
+        raise ValueError(" or ".join(_map(str, errors)))
+
+    return check_any
+
+
+@_compile.register(all)
+def _compile_all(schema):
+    checks = [_compile(subschema) for subschema in schema]
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value):
+        for check in checks:
+            value = check(value)
+        return value
+
+    return check_all
+
+
+@_compile.register(transform)
+def _compile_transform(schema):
+    validate(callable, schema.func)
+    return schema.func
+
+
+@_compile.register(list)
+@_compile.register(tuple)
+@_compile.register(set)
+@_compile.register(frozenset)
+def _compile_sequence(schema):
+    cls = type(schema)
+    check_item = _compile(any(*schema))
+
+    if cls is list:
+        def check_list(value):
+            if not isinstance(value, list):
+                raise _type_error(list, value)
+            return [check_item(item) for item in value]
+
+        return check_list
+
+    def check_sequence(value):
+        if not isinstance(value, cls):
+            raise _type_error(cls, value)
+        return cls(check_item(item) for item in value)
+
+    return check_sequence
+
+
+@_compile.register(dict)
+def _compile_dict(schema):
+    cls = type(schema)
+    # (key, check, is optional, wildcard key check) in schema order, the key check is
+    # only set for type-like keys, which apply to every item of the value
+    steps = []
+
+    for key, subschema in schema.items():
+        optional_ = isinstance(key, optional)
+        if optional_:
+            key = key.key
+
+        if type(key) in (type, transform, any, all, union):
+            steps.append((key, _compile(subschema), optional_, _compile(key)))
+            # validate() stops at a wildcard, unless it is an optional one it skips
+            if not optional_:
+                break
+        else:
+            steps.append((key, _compile(subschema), optional_, None))
+
+    def check_dict(value):
+        if not isinstance(value, cls):
+            raise _type_error(cls, value)
+        new = cls()
+
+        for key, check, optional_, check_key in steps:
+            if key not in value:
+                if optional_:
+                    continue
+                if check_key is None:
+                    raise ValueError("Key '{0}' not found in {1!r}".format(key, value))
+
+            if check_key is not None:
+                for subkey, subvalue in value.items():
+                    new[check_key(subkey)] = check(subvalue)
+                break
+
+            try:
+                new[key] = check(value[key])
+            except ValueError as err:
+                raise ValueError("Unable to validate key '{0}': {1}".format(key, err))
+
+        return new
+
+    return check_dict
+
+
+@_compile.register(xml_element)
+def _compile_xml_element(schema):
+    check_attrib = schema.attrib is not None and _compile(schema.attrib)
+    check_tag = schema.tag is not None and _compile(schema.tag)
+    check_text = schema.text is not None and _compile(schema.text)
+
+    def check_xml_element(value):
+        validate(ET.iselement, value)
+        new = ET.Element(value.tag, attrib=value.attrib)
+
+        if check_attrib:
+            try:
+                new.attrib = check_attrib(value.attrib)
+            except ValueError as err:
+                raise ValueError("Unable to validate XML attributes: {0}".format(err))
+
+        if check_tag:
+            try:
+                new.tag = check_tag(value.tag)
+            except ValueError as err:
+                raise ValueError("Unable to validate XML tag: {0}".format(err))
+
+        if check_text:
+            try:
+                new.text = check_text(value.text)
+            except ValueError as err:
+                raise ValueError("Unable to validate XML text: {0}".format(err))
+
+        for child in value:
+            new.append(child)
+
+        return new
+
+    return check_xml_element
+
+
+@_compile.register(attr)
+def _compile_attr(schema):
+    checks = [(name, _compile(subschema)) for name, subschema in schema.schema.items()]
+
+    def check_attr(value):
+        new = copy_obj(value)
+        for name, check in checks:
+            if not _hasattr(value, name):
+                raise ValueError("Attribute '{0}' not found on object '{1}'".format(
+                    name, value
+                ))
+            setattr(new, name, check(_getattr(value, name)))
+        return new
+
+    return check_attr
+
+
+@_compile.register(union)
+def _compile_union(schema):
+    schemas = schema.schema
+
+    if isinstance(schemas, dict):
+        cls = type(schemas)
+        checks = [(key.key if isinstance(key, optional) else key,
+                   _compile(subschema), isinstance(key, optional))
+                  for key, subschema in schemas.items()]
+
+        def check_union_dict(value):
+            new = cls()
+            for key, check, optional_ in checks:
+                try:
+                    new[key] = check(value)
+                except ValueError as err:
+                    if optional_:
+                        continue
+                    raise ValueError("Unable to validate union '{0}': {1}".format(key, err))
+            return new
+
+        return check_union_dict
+
+    if isinstance(schemas, (list, tuple, set, frozenset)):
+        cls = type(schemas)
+        checks = [_compile(subschema) for subschema in schemas]
+
+        def check_union_sequence(value):
+            return cls(check(value) for check in checks)
+
+        return check_union_sequence
+
+    def check_union_invalid(value):
+        raise ValueError("Invalid union type: {0}".format(type(schemas).__name__))
+
+    return check_union_invalid
+
+
+def compile_schema(schema):
+    """Compiles a schema into a function that validates a value the way
+    validate(schema, value) does, without walking the schema every time.
+
+    >>> check = compile_schema({'foo': transform(int)})
+    >>> check({'foo': '1'})
+    {'foo': 1}
+    """
+    return _compile(schema)
+
+
+# Schema projections
+#
+# Which parts of a document a schema can actually look at, so a streaming parser
+# can skip the rest instead of building it. A projection is either None (everything),
+# a dict of key (or XML child tag) -> projection, or items(projection) for the items
+# of a list. Anything the schema passes to an opaque callable is kept whole.
+
+class items(object):
+    """The projection of every item of a list."""
+
+    def __init__(self, projection):
+        self.projection = projection
+
+    def __repr__(self):
+        return "<items {0!r}>".format(self.projection)
+
+
+def _merge_projections(projections):
+    merged = {}
+    for projection in projections:
+        if projection is None:
+            return None
+        if isinstance(projection, items):
+            if merged and not isinstance(merged, items):
+                return None
+            merged = items(_merge_projections([merged.projection, projection.projection])
+                           if isinstance(merged, items) else projection.projection)
+        else:
+            if isinstance(merged, items):
+                return None
+            for key, subprojection in projection.items():
+                merged[key] = (_merge_projections([merged[key], subprojection])
+                               if key in merged else subprojection)
+    return merged
+
+
+def _simple_xpath(xpath):
+    """Returns the tags of a plain child path ("./a/b", "a/b"), None for anything fancier."""
+    tags = xpath.split("/")
+    if tags and tags[0] == ".":
+        tags = tags[1:]
+    if not tags or not _all(tags) or [t for t in tags if set(t) & set(".*[]@:{}()")]:
+        return None
+    return tags
+
+
+@singledispatch
+def _projection(schema):
+    return None
+
+
+@_projection.register(dict)
+def _projection_dict(schema):
+    projection = {}
+    for key, subschema in schema.items():
+        if isinstance(key, optional):
+            key = key.key
+        if type(key) in (type, transform, any, all, union):
+            return None
+        projection[key] = _projection(subschema)
+    return projection
+
+
+@_projection.register(list)
+@_projection.register(tuple)
+@_projection.register(set)
+@_projection.register(frozenset)
+def _projection_sequence(schema):
+    return items(_merge_projections([_projection(subschema) for subschema in schema]))
+
+
+@_projection.register(any)
+def _projection_any(schema):
+    return _merge_projections([_projection(subschema) for subschema in schema])
+
+
+@_projection.register(union)
+def _projection_union(schema):
+    schemas = schema.schema
+    if isinstance(schemas, dict):
+        schemas = schemas.values()
+    return _merge_projections([_projection(subschema) for subschema in schemas])
+
+
+@_projection.register(all)
+def _projection_all(schema):
+    schemas = list(schema)
+    # type checks pass the value on unchanged, and pruning never changes a value's type
+    while schemas and isinstance(schemas[0], type):
+        schemas.pop(0)
+    if not schemas:
+        return None
+
+    first, rest = schemas[0], all(*schemas[1:])
+    item = _getattr(first, "item", None) if isinstance(first, transform) else None
+    xpath = _getattr(first, "xpath", None) if isinstance(first, transform) else None
+
+    if item is not None and not isinstance(item, int):
+        return {item: _projection(rest) if rest else None}
+    if xpath is not None:
+        tags = _simple_xpath(xpath)
+        if tags is None:
+            return None
+        projection = _projection(rest) if rest else None
+        if isinstance(projection, items):
+            # xml_findall followed by a list schema, the items are the found elements
+            projection = projection.projection
+        for tag in reversed(tags):
+            projection = {tag: projection}
+        return projection
+
+    projection = _projection(first)
+    # a validated dict or list only holds what its schema projects, whatever comes next can't see more
+    if rest and not isinstance(projection, (dict, items)):
+        return None
+    return projection
+
+
+def schema_projection(schema):
+    """Returns the parts of a document the schema can reference, see above.
+
+    >>> schema_projection({'data': [{'id': int}], optional('next'): text})
+    {'data': <items {'id': None}>, 'next': None}
+    """
+    if isinstance(schema, Schema):
+        schema = schema.schema
+    return _projection(schema)
+
+
+_NOT_COMPUTED = object()
+
+
 class Schema(object):
     """Wraps a validator schema into a object."""
 
     def __init__(self, *schemas):
         self.schema = all(*schemas)
+        self._check = None
+        self._projection = _NOT_COMPUTED
+
+    def compiled(self):
+        """Returns the schema compiled with compile_schema(), compiling it on first use"""
+        if self._check is None:
+            self._check = compile_schema(self.schema)
+        return self._check
+
+    def projection(self):
+        """Returns schema_projection(self), computing it on first use"""
+        if self._projection is _NOT_COMPUTED:
+            self._projection = schema_projection(self.schema)
+        return self._projection
 
     def validate(self, value, name="result", exception=PluginError):
         try:
-            return validate(self.schema, value)
+            return self.compiled()(value)
         except ValueError as err:
             raise exception("Unable to validate {0}: {1}".format(name, err))
 
@@ -487,3 +895,16 @@ class Schema(object):
 @validate.register(Schema)
 def validate_schema(schema, value):
     return schema.validate(value, exception=ValueError)
+
+
+@_projection.register(Schema)
+def _projection_schema(schema):
+    return schema.projection()
+
+
+@_compile.register(Schema)
+def _compile_schema(schema):
+    def check_schema(value):
+        return schema.validate(value, exception=ValueError)
+
+    return check_schema
@@ -338,6 +338,8 @@ class Plugin(object):
                                             stream_types))
 
         streams = {}
+        # number of alts taken per "<name>_alt" base name
+        alts = {}
         for name, stream in sorted_streams:
             stream_type = type(stream).shortname()
 
@@ -349,6 +351,7 @@ class Plugin(object):
             if name.endswith("_alt"):
                 name = name[:-len("_alt")]
 
+            alt_name = None
             existing = streams.get(name)
             if existing:
                 existing_stream_type = type(existing).shortname()
@@ -356,8 +359,8 @@ class Plugin(object):
                     name = "{0}_{1}".format(name, stream_type)
 
                 if name in streams:
-                    name = "{0}_alt".format(name)
-                    num_alts = len(list(filter(lambda n: n.startswith(name), streams.keys())))
+                    alt_name = name = "{0}_alt".format(name)
+                    num_alts = alts.get(alt_name, 0)
 
                     # We shouldn't need more than 2 alt streams
                     if num_alts >= 2:
@@ -376,25 +379,39 @@ class Plugin(object):
 
             # Force lowercase name and replace space with underscore.
             streams[name.lower()] = stream
+            if alt_name:
+                alts[alt_name] = alts.get(alt_name, 0) + 1
 
         # Create the best/worst synonmys
+        # Every name is parsed by stream_weight only once, the filters
+        # below and the final ordering all use these records.
+        weights = {}
+
+        def cached_stream_weight(s):
+            weight = weights.get(s)
+            if weight is None:
+                weight = weights[s] = self.stream_weight(s)
+            return weight
+
         def stream_weight_only(s):
-            return (self.stream_weight(s)[0] or (len(streams) == 1 and 1))
+            return (cached_stream_weight(s)[0] or (len(streams) == 1 and 1))
 
-        stream_names = filter(stream_weight_only, streams.keys())
-        sorted_streams = sorted(stream_names, key=stream_weight_only)
+        # A single sort, the ranked names are the ones with a weight
+        # (in the same order) and the filters keep that order too.
+        ordered_names = sorted(streams, key=stream_weight_only)
+        sorted_streams = [name for name in ordered_names if stream_weight_only(name)]
         unfiltered_sorted_streams = sorted_streams
 
         if isinstance(sorting_excludes, list):
             for expr in sorting_excludes:
-                filter_func = stream_sorting_filter(expr, self.stream_weight)
+                filter_func = stream_sorting_filter(expr, cached_stream_weight)
                 sorted_streams = list(filter(filter_func, sorted_streams))
         elif callable(sorting_excludes):
             sorted_streams = list(filter(sorting_excludes, sorted_streams))
 
         final_sorted_streams = OrderedDict()
 
-        for stream_name in sorted(streams, key=stream_weight_only):
+        for stream_name in ordered_names:
             final_sorted_streams[stream_name] = streams[stream_name]
 
         if len(sorted_streams) > 0:
@@ -0,0 +1,354 @@
+"""
+Cached plugin registry, lets the CLI start without importing every plugin
+
+Loading all plugins (100+ modules, each pulling in its own dependencies) is most of
+streamlink's startup time, and all of it is only needed to answer two questions:
+which plugins can handle the URL, and which --<plugin>-<name> arguments exist.
+
+The registry answers both from a JSON file holding, per plugin module, the URL
+patterns its can_handle_url is built from and the specs of its arguments. An entry
+is invalidated by the module's mtime/size, and only then is that module imported
+again to rebuild it. Anything that can't be described safely (can_handle_url doing
+more than matching regexes, argument options that don't survive JSON) is marked as
+such and that plugin is simply always loaded, like before.
+"""
+
+import json
+import logging
+import os
+import pkgutil
+import re
+import sys
+import types
+from collections import OrderedDict
+from importlib import import_module
+from importlib.machinery import PathFinder
+from importlib.util import module_from_spec, spec_from_file_location
+
+from streamlink import __version__ as streamlink_version
+from streamlink.options import Argument
+
+log = logging.getLogger("streamlink.plugin.registry")
+
+REGISTRY_VERSION = 1
+
+# type=... of an argument that can't be imported by name (closures from num(), comma_list_filter() ...),
+# it is added to the parser without a type and the plugin's own type is applied once it is loaded
+DEFERRED_TYPE = "deferred"
+
+# names can_handle_url may use besides the regexes themselves, anything else means
+# it does more than matching and the plugin can't be resolved from the patterns
+_MATCH_NAMES = {"match", "search", "fullmatch", "any", "all", "bool", "url", "cls", "self"}
+
+_regex_type = type(re.compile(""))
+
+_BUILTIN_TYPES = {"int": int, "float": float, "str": str}
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _code_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        # generator expressions / lambdas in can_handle_url have their own code objects
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def url_patterns(plugin):
+    """
+    The regexes plugin.can_handle_url is made of, as [[pattern, flags], ...]
+
+    None when can_handle_url uses anything besides regex match/search, then the
+    patterns alone can't tell which URLs the plugin handles.
+    """
+    func = getattr(plugin.can_handle_url, "__func__", plugin.can_handle_url)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return None
+
+    patterns = []
+    for name in _code_names(code):
+        if name in _MATCH_NAMES:
+            continue
+        value = getattr(plugin, name, func.__globals__.get(name))
+        values = value if isinstance(value, (list, tuple)) else [value]
+        if not values or not all(isinstance(v, _regex_type) for v in values):
+            return None
+        patterns.extend([v.pattern, v.flags] for v in values)
+
+    if not patterns:
+        return None
+
+    return patterns
+
+
+def _type_name(func):
+    if func is None:
+        return None
+    for name, builtin in _BUILTIN_TYPES.items():
+        if func is builtin:
+            return name
+    module = getattr(func, "__module__", None)
+    name = getattr(func, "__name__", None)
+    # only types importable without loading the plugin itself
+    if module and name and not module.startswith("streamlink.plugin"):
+        try:
+            if getattr(import_module(module), name) is func:
+                return "{0}:{1}".format(module, name)
+        except (ImportError, AttributeError):
+            pass
+    return DEFERRED_TYPE
+
+
+def _resolve_type(name):
+    if name is None or name == DEFERRED_TYPE:
+        return None
+    if name in _BUILTIN_TYPES:
+        return _BUILTIN_TYPES[name]
+    module, name = name.split(":", 1)
+    return getattr(import_module(module), name)
+
+
+def argument_spec(parg):
+    options = dict(parg.options)
+    type_name = _type_name(options.pop("type", None))
+    if isinstance(options.get("choices"), tuple):
+        options["choices"] = list(options["choices"])
+    if type_name == DEFERRED_TYPE and "choices" in options:
+        # argparse compares choices with the converted value
+        raise _Uncacheable("choices with type {0}".format(parg.options["type"]))
+    try:
+        if json.loads(json.dumps(options)) != options:
+            raise _Uncacheable("options of {0}".format(parg.name))
+    except (TypeError, ValueError):
+        raise _Uncacheable("options of {0}".format(parg.name))
+
+    return dict(name=parg.name, required=parg.required, requires=parg.requires, prompt=parg.prompt,
+                sensitive=parg.sensitive, argument_name=parg._argument_name, dest=parg._dest,
+                type=type_name, options=options)
+
+
+def argument_from_spec(spec):
+    options = dict(spec["options"])
+    type_ = _resolve_type(spec["type"])
+    if type_ is not None:
+        options["type"] = type_
+    return Argument(spec["name"], required=spec["required"], requires=spec["requires"],
+                    prompt=spec["prompt"], sensitive=spec["sensitive"],
+                    argument_name=spec["argument_name"], dest=spec["dest"], **options)
+
+
+def describe_plugin(plugin):
+    """The registry entry of a loaded plugin class"""
+    try:
+        arguments = [argument_spec(parg) for parg in plugin.arguments]
+    except _Uncacheable as err:
+        log.debug("Plugin {0} arguments can't be cached: {1}".format(plugin.module, err))
+        arguments = None
+    return dict(plugin=True, patterns=url_patterns(plugin), arguments=arguments)
+
+
+class PluginRegistry(object):
+    """
+    Plugin modules of the given directories, later directories override earlier ones
+    (the same as repeated Streamlink.load_plugins calls)
+
+    :param directories: plugin directories, the builtin plugins first
+    :param filename: the JSON cache file
+    """
+
+    def __init__(self, directories, filename):
+        self.directories = [os.path.abspath(os.path.expanduser(d)) for d in directories]
+        self.filename = filename
+        self.entries = OrderedDict()  # name -> (directory, entry), after overrides
+        self.loaded = {}  # name -> directory of the module in session.plugins
+        self.changed = False
+        self._scanned = {}
+        self._patterns = {}
+
+    def _read(self):
+        try:
+            with open(self.filename) as fd:
+                data = json.load(fd)
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get("version") != REGISTRY_VERSION or data.get("streamlink") != streamlink_version:
+            return {}
+        return data.get("directories", {})
+
+    def save(self):
+        if not self.changed:
+            return
+        directories = OrderedDict()
+        for directory in self.directories:
+            directories[directory] = self._scanned.get(directory, {})
+        data = dict(version=REGISTRY_VERSION, streamlink=streamlink_version, directories=directories)
+        try:
+            dirname = os.path.dirname(self.filename)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            tmp = "{0}.{1}.tmp".format(self.filename, os.getpid())
+            with open(tmp, "w") as fd:
+                json.dump(data, fd)
+            # no atomic replace on windows
+            if os.name == "nt" and os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+            self.changed = False
+        except (IOError, OSError) as err:
+            log.debug("Failed to save the plugin registry: {0}".format(err))
+
+    @staticmethod
+    def _module_stat(directory, name, ispkg):
+        path = os.path.join(directory, name, "__init__.py") if ispkg else os.path.join(directory, name + ".py")
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_mtime, st.st_size]
+
+    def refresh(self, session):
+        """
+        Checks the cached entries against the plugin modules on disk, modules that
+        are new or changed are loaded into the session to describe them.
+        Afterwards every plugin that can't be resolved lazily is loaded too.
+        """
+        cached = self._read()
+        self._scanned = {}
+        self.entries.clear()
+
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                continue
+            cached_dir = cached.get(directory, {})
+            scanned = self._scanned[directory] = OrderedDict()
+            for _, name, ispkg in pkgutil.iter_modules([directory]):
+                stat = self._module_stat(directory, name, ispkg)
+                entry = cached_dir.get(name)
+                if stat is None or entry is None or entry.get("stat") != stat:
+                    self.changed = True
+                    entry = self._describe(session, directory, name)
+                    entry["stat"] = stat
+                if stat is not None:
+                    scanned[name] = entry
+                if entry.get("plugin"):
+                    self.entries[name] = (directory, entry)
+
+        # a changed module that was described but is overridden by a cached one of a later directory
+        for name, directory in list(self.loaded.items()):
+            if name in self.entries and self.entries[name][0] != directory:
+                session.plugins.pop(name, None)
+                del self.loaded[name]
+
+        for name, (directory, entry) in self.entries.items():
+            if entry["patterns"] is None or entry["arguments"] is None:
+                self.load(session, name)
+
+        self.save()
+        return self
+
+    def _describe(self, session, directory, name):
+        if not self._load_module(session, directory, name):
+            return dict(plugin=False)
+        plugin = session.plugins.get(name)
+        if plugin is None:
+            # not a plugin module, e.g. a helper shared by plugins
+            return dict(plugin=False)
+        return describe_plugin(plugin)
+
+    def _load_module(self, session, directory, name):
+        try:
+            self._exec_plugin(session, directory, name)
+        except Exception:
+            log.exception("Failed to load plugin {0}".format(name))
+            return False
+        self.loaded[name] = directory
+        return True
+
+    @staticmethod
+    def _exec_plugin(session, directory, name):
+        """What Streamlink.load_plugin() does, with importlib instead of the imp module"""
+        module_name = "streamlink.plugin.{0}".format(name)
+        found = PathFinder.find_spec(name, [directory])
+        if found is None:
+            raise ImportError("No module named {0} in {1}".format(name, directory))
+        spec = spec_from_file_location(module_name, found.origin,
+                                       submodule_search_locations=found.submodule_search_locations)
+        module = module_from_spec(spec)
+
+        # the plugins use the session's http session through streamlink.plugin.api.http
+        from streamlink.plugin import api
+        api.http = session.http
+        # registered before it runs, like imp.load_module(), for its own relative imports
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[module_name]
+            raise
+
+        plugin = getattr(module, "__plugin__", None)
+        if plugin is None:
+            return
+        plugin.bind(session, name, session.get_option("user-input-requester"))
+        if plugin.module in session.plugins:
+            log.debug("Plugin {0} is being overridden by {1}".format(plugin.module, spec.origin))
+        session.plugins[plugin.module] = plugin
+
+    def load(self, session, name):
+        """Loads the named plugin into the session (unless it already is), returns the plugin class"""
+        directory, entry = self.entries[name]
+        if self.loaded.get(name) != directory:
+            self._load_module(session, directory, name)
+        return session.plugins.get(name)
+
+    def load_all(self, session):
+        for name in self.entries:
+            self.load(session, name)
+
+    def candidates(self, url):
+        """Names of the plugins whose URL patterns match, these still have to be checked with can_handle_url"""
+        names = []
+        for name, (directory, entry) in self.entries.items():
+            patterns = entry["patterns"]
+            if patterns is None:
+                continue
+            regexes = self._patterns.get(name)
+            if regexes is None:
+                regexes = self._patterns[name] = [re.compile(p, f) for p, f in patterns]
+            # search, can_handle_url may match or fullmatch, loading one plugin too many is harmless
+            if any(regex.search(url) for regex in regexes):
+                names.append(name)
+        return names
+
+    def load_matching(self, session, url):
+        """Loads the plugins that may handle url, returns their names"""
+        names = self.candidates(url)
+        for name in names:
+            self.load(session, name)
+        return names
+
+    def arguments(self, session):
+        """
+        Yields (name, arguments) for every plugin, rebuilt from the cache or, for
+        the plugins whose arguments can't be cached, the loaded plugin's own
+        """
+        for name, (directory, entry) in self.entries.items():
+            if entry["arguments"] is None:
+                plugin = session.plugins.get(name)
+                if plugin is not None:
+                    yield name, plugin.arguments
+                continue
+            yield name, [argument_from_spec(spec) for spec in entry["arguments"]]
+
+    def deferred(self, name):
+        """Names of the plugin's arguments which were added to the parser without their type"""
+        directory, entry = self.entries.get(name, (None, {}))
+        return set(spec["name"] for spec in entry.get("arguments") or [] if spec["type"] == DEFERRED_TYPE)
+
+
+__all__ = ["PluginRegistry"]
@@ -0,0 +1,191 @@
+"""
+Throughput and latency counters of the streams of a session
+
+One StreamMetrics is shared through the "stream-metrics" session option. The
+segment prefetcher reports every segment download (size, time, attempts) and every
+time the output had to wait for a segment, the output writer reports its writes
+and every time the stream had to wait for the output, and both register their
+buffers as gauges, sampled when a snapshot is taken.
+
+A snapshot is a plain dict, for the console (or JSON) and for dumping at exit,
+meant for tuning hls-live-edge, hls-segment-threads and ringbuffer-size.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class LatencyStats(object):
+    """Count, mean and max of all values, percentiles of the most recent ones"""
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, p):
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(math.ceil(p / 100.0 * len(values))) - 1)]
+
+    def as_dict(self):
+        return dict(count=self.count,
+                    mean=self.total / self.count if self.count else None,
+                    max=self.max,
+                    p50=self.percentile(50),
+                    p90=self.percentile(90),
+                    p99=self.percentile(99))
+
+
+class StreamMetrics(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = OrderedDict([
+            ("segments", 0),
+            ("segment_bytes", 0),
+            ("segment_retries", 0),
+            ("segments_skipped", 0),
+            ("segment_stalls", 0),
+            ("segment_stall_time", 0.0),
+            ("bytes_read", 0),
+            ("bytes_out", 0),
+            ("output_writes", 0),
+            ("output_stalls", 0),
+            ("output_stall_time", 0.0),
+        ])
+        self.segment_latency = LatencyStats()
+        self.write_latency = LatencyStats()
+        # name -> list of callables returning a buffer's fill level (0 - 1)
+        self.gauges = OrderedDict()
+        self.gauge_max = {}
+        self._last = None
+
+    def segment(self, size, elapsed, attempts=1):
+        """A segment of size bytes was downloaded in elapsed seconds"""
+        with self.lock:
+            self.counters["segments"] += 1
+            self.counters["segment_bytes"] += size
+            self.counters["segment_retries"] += attempts - 1
+            self.segment_latency.add(elapsed)
+
+    def segment_skipped(self, attempts):
+        with self.lock:
+            self.counters["segments_skipped"] += 1
+            self.counters["segment_retries"] += attempts - 1
+
+    def read(self, size):
+        """size bytes were read from a stream by the output loop"""
+        with self.lock:
+            self.counters["bytes_read"] += size
+
+    def write(self, size, elapsed):
+        """size bytes were written to the output in elapsed seconds"""
+        with self.lock:
+            self.counters["bytes_out"] += size
+            self.counters["output_writes"] += 1
+            self.write_latency.add(elapsed)
+
+    def stall(self, kind, elapsed):
+        """
+        Something had to wait: "segment" when the output waited for the next segment,
+        "output" when the stream waited for the output to make room in its buffer
+        """
+        with self.lock:
+            self.counters["{0}_stalls".format(kind)] += 1
+            self.counters["{0}_stall_time".format(kind)] += elapsed
+
+    def add_gauge(self, name, func):
+        with self.lock:
+            self.gauges.setdefault(name, []).append(func)
+
+    def remove_gauge(self, name, func):
+        with self.lock:
+            funcs = self.gauges.get(name, [])
+            if func in funcs:
+                funcs.remove(func)
+
+    def snapshot(self):
+        """The counters, latencies, rates since the previous snapshot and gauges as a dict"""
+        with self.lock:
+            funcs = [(name, list(funcs)) for name, funcs in self.gauges.items()]
+        # sampled without holding the lock, a gauge takes its buffer's own lock
+        # and the buffer's owner may be reporting to us while holding it
+        values = [(name, max([func() for func in funcs] or [0.0])) for name, funcs in funcs]
+
+        now = time.time()
+        with self.lock:
+            counters = OrderedDict(self.counters)
+            segment_latency = self.segment_latency.as_dict()
+            write_latency = self.write_latency.as_dict()
+            gauges = OrderedDict()
+            # with several streams the fullest buffer is the interesting one
+            for name, value in values:
+                self.gauge_max[name] = max(self.gauge_max.get(name, 0.0), value)
+                gauges[name] = dict(current=value, max=self.gauge_max[name])
+            last, self._last = self._last, (now, counters)
+
+        uptime = now - self.started
+        since, previous = last if last else (self.started, dict((k, 0) for k in counters))
+        elapsed = max(now - since, 1e-9)
+
+        rates = OrderedDict()
+        for key in ("segment_bytes", "bytes_read", "bytes_out"):
+            rates[key] = dict(current=(counters[key] - previous[key]) / elapsed,
+                              average=counters[key] / uptime if uptime else 0.0)
+
+        return OrderedDict([
+            ("uptime", uptime),
+            ("counters", counters),
+            ("rates", rates),
+            ("segment_latency", segment_latency),
+            ("write_latency", write_latency),
+            ("buffers", gauges),
+        ])
+
+    def dump(self, path):
+        """Writes a snapshot as JSON to path, atomically"""
+        data = self.snapshot()
+        tmp = "{0}.{1}.tmp".format(path, os.getpid())
+        with open(tmp, "w") as fd:
+            json.dump(data, fd, indent=2)
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+
+
+def format_metrics(snapshot, filesize=None):
+    """A short human readable summary of a snapshot, filesize formats byte counts"""
+    filesize = filesize or (lambda n: "{0:.0f} B".format(n))
+    counters, rates = snapshot["counters"], snapshot["rates"]
+    parts = [
+        "in {0}/s".format(filesize(rates["segment_bytes"]["current"] or rates["bytes_read"]["current"])),
+        "out {0}/s".format(filesize(rates["bytes_out"]["current"])),
+    ]
+    latency = snapshot["segment_latency"]
+    if latency["count"]:
+        parts.append("segments {0} (p50 {1:.2f}s, p90 {2:.2f}s, {3} retries, {4} skipped)".format(
+            counters["segments"], latency["p50"], latency["p90"],
+            counters["segment_retries"], counters["segments_skipped"]))
+    for name, gauge in snapshot["buffers"].items():
+        parts.append("{0} {1:.0%} (max {2:.0%})".format(name.replace("_", " "), gauge["current"], gauge["max"]))
+    if counters["segment_stalls"] or counters["output_stalls"]:
+        parts.append("stalls: waited for segments {0}x ({1:.1f}s), for the output {2}x ({3:.1f}s)".format(
+            counters["segment_stalls"], counters["segment_stall_time"],
+            counters["output_stalls"], counters["output_stall_time"]))
+    return ", ".join(parts)
+
+
+__all__ = ["StreamMetrics", "format_metrics"]
@@ -0,0 +1,582 @@
+"""
+Segment fetch engine for segmented (HLS) streams
+
+Upstream's SegmentedStreamWriter downloads one segment at a time and copies it into
+the RingBuffer, so on a high bitrate stream the next download only starts once the
+previous one has finished and the output stalls whenever a segment is slow.
+
+Here up to hls-segment-threads segments download at the same time over the pooled
+HTTPSession, straight into a fixed set of preallocated buffers (readinto, no
+intermediate bytes objects), and are handed to the output strictly in playlist order.
+
+SegmentedStreamWorker, SegmentedStreamWriter and SegmentedStreamReader keep upstream's
+interface for the HLS, DASH and HDS streams, but the writer downloads through a
+SegmentPrefetcher: the subclasses' fetch() opens each request and their write() gets
+the prefetched segment.
+"""
+
+import concurrent.futures.thread
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from contextlib import closing
+from threading import Thread, Event
+
+from requests.exceptions import RequestException
+
+from streamlink.exceptions import StreamError
+from .stream import StreamIO
+from ..buffers import RingBuffer
+from ..compat import queue
+
+log = logging.getLogger("streamlink.stream.segmented")
+
+
+class SegmentBuffer(object):
+    """One preallocated slot of the SegmentRingBuffer, holds a whole segment"""
+
+    def __init__(self, size):
+        self.data = bytearray(size)
+        self.length = 0
+
+    def view(self):
+        return memoryview(self.data)[:self.length]
+
+    def fill(self, fd, chunk_size):
+        """Reads fd until EOF into the slot, growing it if the segment doesn't fit"""
+        self.length = 0
+        while True:
+            if self.length == len(self.data):
+                self._grow(self.length + max(self.length, chunk_size))
+            view = memoryview(self.data)[self.length:self.length + chunk_size]
+            try:
+                read = fd.readinto(view)
+            finally:
+                view.release()
+            if not read:
+                return self.length
+            self.length += read
+
+    def _grow(self, size):
+        # a new bytearray rather than extend(), the output may still hold a view of the old one
+        # grown slots stay grown, the next segments are likely just as big
+        data = bytearray(size)
+        data[:self.length] = self.data[:self.length]
+        self.data = data
+
+    def fill_from_iter(self, chunks):
+        # content-encoded responses have to be decoded by requests first, one copy is unavoidable
+        self.length = 0
+        for chunk in chunks:
+            end = self.length + len(chunk)
+            if end > len(self.data):
+                self._grow(max(end, 2 * len(self.data)))
+            self.data[self.length:end] = chunk
+            self.length = end
+        return self.length
+
+
+class SegmentRingBuffer(object):
+    """
+    A fixed number of preallocated SegmentBuffers
+
+    acquire() blocks until a slot is free and fewer than limit() slots are in use,
+    that is what stops prefetching from running away from a slow output.
+    """
+
+    def __init__(self, slots, slot_size):
+        self.free = deque(SegmentBuffer(slot_size) for _ in range(slots))
+        self.in_use = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def acquire(self, limit=None):
+        with self.cond:
+            while not self.closed and (not self.free or (limit is not None and self.in_use >= limit())):
+                self.cond.wait()
+            if self.closed:
+                return None
+            self.in_use += 1
+            return self.free.popleft()
+
+    def release(self, buf):
+        with self.cond:
+            self.in_use -= 1
+            self.free.append(buf)
+            self.cond.notify_all()
+
+    def wakeup(self):
+        # the limit changed, let a waiting acquire() check it again
+        with self.cond:
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class SegmentPrefetcher(object):
+    """
+    Downloads upcoming segments concurrently and delivers them in order
+
+    A feeder thread pulls segments (anything with an ``uri`` attribute and optionally a
+    ``duration``, or plain URLs) from the segments iterable, which may block while
+    waiting for the next playlist reload, and queues their downloads.
+
+    The prefetch depth starts at 1 and adapts to the measured download time:
+    when segment durations are known it is ceil(download time / duration) + 1,
+    and every time the output had to wait for the next segment it goes up by one,
+    never beyond `threads`.
+
+    :param http: the HTTPSession, its connection pool (10 per host) is shared by the downloads
+    :param segments: iterable of segments in playlist order
+    :param threads: max number of segments downloading at once
+    :param attempts: how many times a segment is requested before it is skipped
+    :param timeout: timeout of each segment request
+    :param ringbuffer_size: total size of the preallocated buffers, split into threads + 1 slots
+    :param executor: a ThreadPoolExecutor shared with other prefetchers (e.g. when recording
+                     many streams in one process), by default each prefetcher has its own
+    :param metrics: a StreamMetrics the downloads, stalls and buffer fill level are reported to
+    :param fetch: opens the request of a segment and returns the response, or None to skip
+                  the segment, by default a plain GET of its uri
+    """
+
+    def __init__(self, http, segments, threads=3, attempts=3, timeout=10.0,
+                 ringbuffer_size=1024 * 1024 * 16, chunk_size=1024 * 64, executor=None,
+                 metrics=None, fetch=None):
+        self.http = http
+        self.segments = segments
+        self.threads = max(1, threads)
+        self.attempts = attempts
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.metrics = metrics
+        self.fetch = fetch or self._request
+
+        # one extra slot for the segment the output is working through
+        self.ring = SegmentRingBuffer(self.threads + 1, ringbuffer_size // (self.threads + 1))
+        # `threads` still limits this stream's downloads on a shared executor, through `depth`
+        self.shared_executor = executor is not None
+        self.executor = executor or ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.pending_cond = threading.Condition()
+        self.closed = threading.Event()
+        self.feeder = threading.Thread(target=self._feed, name="SegmentPrefetcher-feeder")
+        self.feeder.daemon = True
+
+        self.depth = 1
+        self.download_time = None
+        self.segment_duration = None
+        self.stats = dict(segments=0, skipped=0, bytes=0, stalls=0, stall_time=0.0, depth=self.depth)
+
+        self._current = None
+        self._offset = 0
+
+    @classmethod
+    def from_session(cls, session, segments, **kwargs):
+        """Creates a prefetcher configured from the Streamlink session options, kwargs override them"""
+        options = dict(
+            threads=session.get_option("hls-segment-threads"),
+            attempts=session.get_option("hls-segment-attempts"),
+            timeout=session.get_option("hls-segment-timeout"),
+            ringbuffer_size=session.get_option("ringbuffer-size"),
+            executor=session.get_option("segment-executor"),
+            metrics=session.get_option("stream-metrics"),
+        )
+        options.update(kwargs)
+        return cls(session.http, segments, **{k: v for k, v in options.items() if v})
+
+    def start(self):
+        if self.metrics:
+            self.metrics.add_gauge("segment_buffer", self._buffer_level)
+        self.feeder.start()
+        return self
+
+    def _buffer_level(self):
+        # segments downloading or downloaded and not yet written out, of what the ring can hold
+        with self.ring.cond:
+            return float(self.ring.in_use) / (self.ring.in_use + len(self.ring.free))
+
+    def _feed(self):
+        try:
+            for segment in self.segments:
+                # blocks while `depth` segments are downloaded or waiting for the output
+                buf = self.ring.acquire(limit=lambda: self.depth + 1)
+                if buf is None:
+                    break
+                future = self.executor.submit(self._fetch, segment, buf)
+                with self.pending_cond:
+                    self.pending.append((segment, buf, future))
+                    self.pending_cond.notify()
+        except Exception as err:
+            log.error("Failed to get the next segment: {0}".format(err))
+        finally:
+            with self.pending_cond:
+                self.pending.append(None)
+                self.pending_cond.notify()
+
+    def _request(self, segment):
+        uri = getattr(segment, "uri", segment)
+        return self.http.get(uri, stream=True, timeout=self.timeout, exception=StreamError)
+
+    def _fetch(self, segment, buf):
+        uri = getattr(segment, "uri", segment)
+        for attempt in range(1, self.attempts + 1):
+            if self.closed.is_set():
+                return None
+            start = time.time()
+            try:
+                res = self.fetch(segment)
+                if res is None:
+                    # skipped by the fetch callback, which logs why
+                    return False
+                with closing(res):
+                    # a response requested without stream=True has been read already
+                    if res.headers.get("Content-Encoding") or getattr(res, "_content_consumed", False):
+                        buf.fill_from_iter(res.iter_content(self.chunk_size))
+                    else:
+                        buf.fill(res.raw, self.chunk_size)
+                elapsed = time.time() - start
+                if self.metrics:
+                    self.metrics.segment(buf.length, elapsed, attempt)
+                return elapsed
+            except (StreamError, RequestException, IOError) as err:
+                log.error("Failed to fetch segment {0}: {1} (attempt {2}/{3})".format(
+                    uri, err, attempt, self.attempts))
+        if self.metrics:
+            self.metrics.segment_skipped(self.attempts)
+        return None
+
+    def _adapt(self, download_time, duration, stalled):
+        # exponential moving averages, recent segments count the most
+        self.download_time = download_time if self.download_time is None else \
+            0.7 * self.download_time + 0.3 * download_time
+        depth = self.depth
+        if duration:
+            self.segment_duration = duration if self.segment_duration is None else \
+                0.7 * self.segment_duration + 0.3 * duration
+            depth = int(math.ceil(self.download_time / self.segment_duration)) + 1
+        if stalled:
+            depth = max(depth, self.depth + 1)
+        depth = max(1, min(self.threads, depth))
+        if depth != self.depth:
+            log.debug("Segment prefetch depth {0} -> {1}".format(self.depth, depth))
+            self.depth = self.stats["depth"] = depth
+            self.ring.wakeup()
+
+    def next_segment(self):
+        """
+        Returns a memoryview of the next segment in playlist order, None at the end of the stream
+        The view is only valid until the next call, its slot is then reused for another download
+        """
+        item = self._next()
+        return item and item[1]
+
+    def _next(self):
+        if self._current is not None:
+            self.ring.release(self._current)
+            self._current = None
+
+        while True:
+            with self.pending_cond:
+                while not self.pending:
+                    self.pending_cond.wait()
+                item = self.pending.popleft()
+                if item is None:
+                    # leave the end marker for any later call
+                    self.pending.append(None)
+                    return None
+
+            segment, buf, future = item
+            stalled = not future.done()
+            start = time.time()
+            try:
+                download_time = future.result()
+            except CancelledError:
+                # closed
+                return None
+            if stalled:
+                waited = time.time() - start
+                self.stats["stalls"] += 1
+                self.stats["stall_time"] += waited
+                if self.metrics:
+                    self.metrics.stall("segment", waited)
+
+            if download_time is None or download_time is False:
+                if download_time is None:
+                    uri = getattr(segment, "uri", segment)
+                    log.error("Skipping segment {0}".format(uri))
+                self.stats["skipped"] += 1
+                self.ring.release(buf)
+                continue
+
+            self._adapt(download_time, getattr(segment, "duration", None), stalled)
+            self.stats["segments"] += 1
+            self.stats["bytes"] += buf.length
+            self._current = buf
+            return segment, buf.view()
+
+    def __iter__(self):
+        while True:
+            view = self.next_segment()
+            if view is None:
+                return
+            yield view
+
+    def iter_segments(self):
+        """Yields (segment, memoryview) pairs in playlist order, the views as next_segment()'s"""
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            yield item
+
+    def read(self, size=-1):
+        """
+        File like read, returns bytes copied out of the current segment, an empty bytes
+        object at the end of the stream. The segment's slot is reused once it has been read,
+        so callers can keep what they get; use iter_segments() for the views without copies
+        """
+        while True:
+            if self._current is not None and self._offset < self._current.length:
+                end = self._current.length if size < 0 else min(self._offset + size, self._current.length)
+                chunk = memoryview(self._current.data)[self._offset:end].tobytes()
+                self._offset = end
+                return chunk
+            self._offset = 0
+            if self.next_segment() is None:
+                return b""
+
+    def close(self):
+        if self.metrics:
+            self.metrics.remove_gauge("segment_buffer", self._buffer_level)
+        self.closed.set()
+        self.ring.close()
+        with self.pending_cond:
+            for item in self.pending:
+                if item is not None:
+                    item[2].cancel()
+        if not self.shared_executor:
+            self.executor.shutdown(wait=False)
+
+
+class FetchedSegment(object):
+    """
+    What SegmentedStreamWriter.write() gets for a segment instead of the response
+
+    It has the two parts of the requests.Response interface the writers use,
+    both backed by the prefetcher's slot.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def content(self):
+        return self.data.tobytes()
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+class SegmentedStreamWorker(Thread):
+    """The general worker thread.
+
+    This thread is responsible for queueing up segments in the
+    writer thread.
+    """
+
+    def __init__(self, reader, **kwargs):
+        self.closed = False
+        self.reader = reader
+        self.writer = reader.writer
+        self.stream = reader.stream
+        self.session = reader.stream.session
+
+        self._wait = None
+
+        Thread.__init__(self, name="Thread-{0}".format(self.__class__.__name__))
+        self.daemon = True
+
+    def close(self):
+        """Shuts down the thread."""
+        if not self.closed:
+            log.debug("Closing worker thread")
+
+        self.closed = True
+        if self._wait:
+            self._wait.set()
+
+    def wait(self, time):
+        """Pauses the thread for a specified time.
+
+        Returns False if interrupted by another thread and True if the
+        time runs out normally.
+        """
+        self._wait = Event()
+        return not self._wait.wait(time)
+
+    def iter_segments(self):
+        """The iterator that generates segments for the worker thread.
+
+        Should be overridden by the inheriting class.
+        """
+        return
+        yield
+
+    def run(self):
+        for segment in self.iter_segments():
+            if self.closed:
+                break
+            self.writer.put(segment)
+
+        # End of stream, tells the writer to exit
+        self.writer.put(None)
+        self.close()
+
+
+class SegmentedStreamWriter(Thread):
+    """The writer thread.
+
+    This thread is responsible for fetching segments, processing them
+    and finally writing the data to the buffer.
+
+    The segments put() here are downloaded by a SegmentPrefetcher, up to `threads`
+    at once, and written in order. fetch() only opens the request, the prefetcher
+    reads the response into one of its slots and write() gets a FetchedSegment.
+    """
+
+    def __init__(self, reader, size=20, retries=None, threads=None, timeout=None, ignore_names=None):
+        self.closed = False
+        self.reader = reader
+        self.stream = reader.stream
+        self.session = reader.stream.session
+
+        if not retries:
+            retries = self.session.options.get("stream-segment-attempts")
+
+        if not threads:
+            threads = self.session.options.get("stream-segment-threads")
+
+        if not timeout:
+            timeout = self.session.options.get("stream-segment-timeout")
+
+        self.retries = retries
+        self.timeout = timeout
+        self.ignore_names = ignore_names
+        self.segments = queue.Queue(size)
+        # fetch() retries the request itself, a segment is read once
+        self.prefetcher = SegmentPrefetcher.from_session(self.session, self._iter_queued(),
+                                                         threads=threads, attempts=1, timeout=timeout,
+                                                         fetch=self._fetch)
+
+        Thread.__init__(self, name="Thread-{0}".format(self.__class__.__name__))
+        self.daemon = True
+
+    def close(self):
+        """Shuts down the thread."""
+        if not self.closed:
+            log.debug("Closing writer thread")
+
+        self.closed = True
+        self.reader.buffer.close()
+        self.prefetcher.close()
+        if concurrent.futures.thread._threads_queues:
+            concurrent.futures.thread._threads_queues.clear()
+
+    def put(self, segment):
+        """Adds a segment to the download queue, None ends the stream."""
+        if self.closed:
+            return
+
+        self.queue(self.segments, segment)
+
+    def queue(self, queue_, value):
+        """Puts a value into a queue but aborts if this thread is closed."""
+        while not self.closed:
+            try:
+                queue_.put(value, block=True, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _iter_queued(self):
+        while not self.closed:
+            try:
+                segment = self.segments.get(block=True, timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # End of stream
+            if segment is None:
+                return
+
+            yield segment
+
+    def _fetch(self, segment):
+        return self.fetch(segment, retries=self.retries)
+
+    def fetch(self, segment):
+        """Fetches a segment.
+
+        Should be overridden by the inheriting class.
+        """
+        pass
+
+    def write(self, segment, result):
+        """Writes a segment to the buffer.
+
+        Should be overridden by the inheriting class.
+        """
+        pass
+
+    def run(self):
+        self.prefetcher.start()
+        for segment, data in self.prefetcher.iter_segments():
+            if self.closed:
+                break
+
+            self.write(segment, FetchedSegment(data))
+
+        self.close()
+
+
+class SegmentedStreamReader(StreamIO):
+    __worker__ = SegmentedStreamWorker
+    __writer__ = SegmentedStreamWriter
+
+    def __init__(self, stream, timeout=None):
+        StreamIO.__init__(self)
+        self.session = stream.session
+        self.stream = stream
+
+        if not timeout:
+            timeout = self.session.options.get("stream-timeout")
+
+        self.timeout = timeout
+
+    def open(self):
+        buffer_size = self.session.get_option("ringbuffer-size")
+        self.buffer = RingBuffer(buffer_size)
+        self.writer = self.__writer__(self)
+        self.worker = self.__worker__(self)
+
+        self.writer.start()
+        self.worker.start()
+
+    def close(self):
+        self.worker.close()
+        self.writer.close()
+        self.buffer.close()
+
+    def read(self, size):
+        if not self.buffer:
+            return b""
+
+        return self.buffer.read(size, block=self.writer.is_alive(),
+                                timeout=self.timeout)
@@ -1,5 +1,6 @@
 
 import argparse
+import atexit
 import errno
 import logging
 import os
@@ -10,10 +11,11 @@ from gettext import gettext
 import requests
 import sys
 import signal
+import threading
+import time
 import webbrowser
 
 from contextlib import closing
-from distutils.version import StrictVersion
 from functools import partial
 from itertools import chain
 from socks import __version__ as socks_version
@@ -23,21 +25,27 @@ from websocket import __version__ as websocket_version
 from streamlink import __version__ as streamlink_version
 from streamlink import (Streamlink, StreamError, PluginError,
                         NoPluginError)
-from streamlink.cache import Cache
+from streamlink import plugins
+from streamlink.cache import Cache, cache_dir
 from streamlink.exceptions import FatalPluginError
 from streamlink.stream import StreamProcess
+from streamlink.stream.metrics import StreamMetrics, format_metrics
 from streamlink.plugins.twitch import TWITCH_CLIENT_ID
 from streamlink.plugin import PluginOptions
+from streamlink.plugin.registry import PluginRegistry
 from streamlink.utils import LazyFormatter
 
 import streamlink.logger as logger
 from .argparser import build_parser
 from .compat import stdout, is_win32
-from streamlink.utils.encoding import maybe_encode
+from streamlink.utils.encoding import maybe_decode, maybe_encode, get_filesystem_encoding
 from .console import ConsoleOutput, ConsoleUserInputRequester
 from .constants import CONFIG_FILES, PLUGINS_DIR, STREAM_SYNONYMS, DEFAULT_STREAM_METADATA
 from .output import FileOutput, PlayerOutput
+from .recorder import MultiStreamRecorder, read_record_list
+from .watcher import StreamWatcher
 from .utils import NamedPipe, HTTPServer, ignored, progress, stream_to_url
+from .utils.progress import format_filesize
 
 ACCEPTABLE_ERRNO = (errno.EPIPE, errno.EINVAL, errno.ECONNRESET)
 try:
@@ -45,12 +53,371 @@ try:
 except AttributeError:
     pass  # Not windows
 QUIET_OPTIONS = ("json", "stream_url", "subprocess_cmdline", "quiet")
+PLUGIN_REGISTRY_FILE = os.path.join(cache_dir, "plugin-registry.json")
 
-args = console = streamlink = plugin = stream_fd = output = None
+args = console = streamlink = plugin = stream_fd = output = registry = None
 
 log = logging.getLogger("streamlink.cli")
 
 
+def check_file_output(filename, force, metrics=None):
+    """Checks if file already exists and ask the user if it should
+    be overwritten if it does."""
+
+    log.debug("Checking file output")
+
+    if os.path.isfile(filename) and not force:
+        if sys.stdin.isatty():
+            answer = console.ask("File {0} already exists! Overwrite it? [y/N] ",
+                                 filename)
+
+            if answer.lower() != "y":
+                sys.exit()
+        else:
+            log.error("File {0} already exists, use --force to overwrite it.".format(filename))
+            sys.exit()
+
+    return FileOutput(filename, metrics=metrics)
+
+
+def create_output(plugin):
+    """Decides where to write the stream.
+
+    Depending on arguments it can be one of these:
+     - The stdout pipe
+     - A subprocess' stdin pipe
+     - A named pipe that the subprocess reads from
+     - A regular file
+
+    """
+
+    if (args.output or args.stdout) and (args.record or args.record_and_pipe):
+        console.exit("Cannot use record options with other file output options.")
+
+    # the FileOutputs report their writes and buffer to the --stream-metrics
+    metrics = streamlink.get_option("stream-metrics")
+
+    if args.output:
+        if args.output == "-":
+            out = FileOutput(fd=stdout, metrics=metrics)
+        else:
+            out = check_file_output(args.output, args.force, metrics=metrics)
+    elif args.stdout:
+        out = FileOutput(fd=stdout, metrics=metrics)
+    elif args.record_and_pipe:
+        record = check_file_output(args.record_and_pipe, args.force)
+        out = FileOutput(fd=stdout, record=record, metrics=metrics)
+    else:
+        http = namedpipe = record = None
+
+        if not args.player:
+            console.exit("The default player (VLC) does not seem to be "
+                         "installed. You must specify the path to a player "
+                         "executable with --player.")
+
+        if args.player_fifo:
+            pipename = "streamlinkpipe-{0}".format(os.getpid())
+            log.info("Creating pipe {0}".format(pipename))
+
+            try:
+                namedpipe = NamedPipe(pipename)
+            except IOError as err:
+                console.exit("Failed to create pipe: {0}", err)
+        elif args.player_http:
+            http = create_http_server()
+
+        title = create_title(plugin)
+
+        if args.record:
+            record = check_file_output(args.record, args.force)
+
+        log.info("Starting player: {0}".format(args.player))
+
+        out = PlayerOutput(args.player, args=args.player_args,
+                           quiet=not args.verbose_player,
+                           kill=not args.player_no_close,
+                           namedpipe=namedpipe, http=http,
+                           record=record, title=title)
+
+    return out
+
+
+def create_http_server(host=None, port=0):
+    """Creates a HTTP server listening on a given host and port.
+
+    If host is empty, listen on all available interfaces, and if port is 0,
+    listen on a random high port.
+    """
+
+    try:
+        http = HTTPServer()
+        http.bind(host=host, port=port)
+    except OSError as err:
+        console.exit("Failed to create HTTP server: {0}", err)
+
+    return http
+
+
+def create_title(plugin=None):
+    if args.title and plugin:
+        title = LazyFormatter.format(
+            maybe_decode(args.title, get_filesystem_encoding()),
+            title=lambda: plugin.get_title() or DEFAULT_STREAM_METADATA["title"],
+            author=lambda: plugin.get_author() or DEFAULT_STREAM_METADATA["author"],
+            category=lambda: plugin.get_category() or DEFAULT_STREAM_METADATA["category"],
+            game=lambda: plugin.get_category() or DEFAULT_STREAM_METADATA["game"],
+            url=plugin.url
+        )
+    else:
+        title = args.url
+    return title
+
+
+def iter_http_requests(server, player):
+    """Repeatedly accept HTTP connections on a server.
+
+    Forever if the serving externally, or while a player is running if it is not
+    empty.
+    """
+
+    while not player or player.running:
+        try:
+            yield server.open(timeout=2.5)
+        except OSError:
+            continue
+
+
+def output_stream_http(plugin, initial_streams, external=False, port=0):
+    """Continuously output the stream over HTTP."""
+    global output
+
+    if not external:
+        if not args.player:
+            console.exit("The default player (VLC) does not seem to be "
+                         "installed. You must specify the path to a player "
+                         "executable with --player.")
+
+        title = create_title(plugin)
+        server = create_http_server()
+        player = output = PlayerOutput(args.player, args=args.player_args,
+                                       filename=server.url,
+                                       quiet=not args.verbose_player,
+                                       title=title)
+
+        try:
+            log.info("Starting player: {0}".format(args.player))
+            if player:
+                player.open()
+        except OSError as err:
+            console.exit("Failed to start player: {0} ({1})",
+                         args.player, err)
+    else:
+        server = create_http_server(host=None, port=port)
+        player = None
+
+        log.info("Starting server, access with one of:")
+        for url in server.urls:
+            log.info(" " + url)
+
+    for req in iter_http_requests(server, player):
+        user_agent = req.headers.get("User-Agent") or "unknown player"
+        log.info("Got HTTP request from {0}".format(user_agent))
+
+        stream_fd = prebuffer = None
+        while not stream_fd and (not player or player.running):
+            try:
+                streams = initial_streams or fetch_streams(plugin)
+                initial_streams = None
+
+                for stream_name in (resolve_stream_name(streams, s) for s in args.stream):
+                    if stream_name in streams:
+                        stream = streams[stream_name]
+                        break
+                else:
+                    log.info("Stream not available, will re-fetch "
+                             "streams in 10 sec")
+                    sleep(10)
+                    continue
+            except PluginError as err:
+                log.error(u"Unable to fetch new streams: {0}".format(err))
+                continue
+
+            try:
+                log.info("Opening stream: {0} ({1})".format(stream_name,
+                                                            type(stream).shortname()))
+                stream_fd, prebuffer = open_stream(stream)
+            except StreamError as err:
+                log.error("{0}".format(err))
+
+        if stream_fd and prebuffer:
+            log.debug("Writing stream to player")
+            read_stream(stream_fd, server, prebuffer)
+
+        server.close(True)
+
+    player.close()
+    server.close()
+
+
+def output_stream_passthrough(plugin, stream):
+    """Prepares a filename to be passed to the player."""
+    global output
+
+    title = create_title(plugin)
+    filename = '"{0}"'.format(stream_to_url(stream))
+    output = PlayerOutput(args.player, args=args.player_args,
+                          filename=filename, call=True,
+                          quiet=not args.verbose_player,
+                          title=title)
+
+    try:
+        log.info("Starting player: {0}".format(args.player))
+        output.open()
+    except OSError as err:
+        console.exit("Failed to start player: {0} ({1})", args.player, err)
+        return False
+
+    return True
+
+
+def open_stream(stream):
+    """Opens a stream and reads 8192 bytes from it.
+
+    This is useful to check if a stream actually has data
+    before opening the output.
+
+    """
+    global stream_fd
+
+    # Attempts to open the stream
+    try:
+        stream_fd = stream.open()
+    except StreamError as err:
+        raise StreamError("Could not open stream: {0}".format(err))
+
+    # Read 8192 bytes before proceeding to check for errors.
+    # This is to avoid opening the output unnecessarily.
+    try:
+        log.debug("Pre-buffering 8192 bytes")
+        prebuffer = stream_fd.read(8192)
+    except IOError as err:
+        stream_fd.close()
+        raise StreamError("Failed to read data from stream: {0}".format(err))
+
+    if not prebuffer:
+        stream_fd.close()
+        raise StreamError("No data returned from stream")
+
+    return stream_fd, prebuffer
+
+
+def output_stream(plugin, stream):
+    """Open stream, create output and finally write the stream to output."""
+    global output
+
+    success_open = False
+    for i in range(args.retry_open):
+        try:
+            stream_fd, prebuffer = open_stream(stream)
+            success_open = True
+            break
+        except StreamError as err:
+            log.error("Try {0}/{1}: Could not open stream {2} ({3})".format(
+                i + 1, args.retry_open, stream, err))
+
+    if not success_open:
+        console.exit("Could not open stream {0}, tried {1} times, exiting", stream, args.retry_open)
+
+    output = create_output(plugin)
+
+    try:
+        output.open()
+    except (IOError, OSError) as err:
+        if isinstance(output, PlayerOutput):
+            console.exit("Failed to start player: {0} ({1})",
+                         args.player, err)
+        else:
+            console.exit("Failed to open output: {0} ({1})",
+                         args.output, err)
+
+    try:
+        log.debug("Writing stream to output")
+        read_stream(stream_fd, output, prebuffer)
+    finally:
+        close_output(output)
+
+    return True
+
+
+def read_stream(stream, output, prebuffer, chunk_size=8192):
+    """Reads data from stream and then writes it to the output."""
+    is_player = isinstance(output, PlayerOutput)
+    is_http = isinstance(output, HTTPServer)
+    is_fifo = is_player and output.namedpipe
+    metrics = streamlink.get_option("stream-metrics")
+    # a FileOutput reports its own writes, the player and HTTP outputs are timed here
+    time_writes = metrics is not None and not isinstance(output, FileOutput)
+    show_progress = (
+        isinstance(output, FileOutput)
+        and output.fd is not stdout
+        and (sys.stdout.isatty() or args.force_progress)
+    )
+    show_record_progress = (
+        hasattr(output, "record")
+        and isinstance(output.record, FileOutput)
+        and output.record.fd is not stdout
+        and (sys.stdout.isatty() or args.force_progress)
+    )
+
+    stream_iterator = chain(
+        [prebuffer],
+        iter(partial(stream.read, chunk_size), b"")
+    )
+    if show_progress:
+        stream_iterator = progress(stream_iterator,
+                                   prefix=os.path.basename(args.output))
+    elif show_record_progress:
+        stream_iterator = progress(stream_iterator,
+                                   prefix=os.path.basename(args.record))
+
+    try:
+        for data in stream_iterator:
+            # We need to check if the player process still exists when
+            # using named pipes on Windows since the named pipe is not
+            # automatically closed by the player.
+            if is_win32 and is_fifo:
+                output.player.poll()
+
+                if output.player.returncode is not None:
+                    log.info("Player closed")
+                    break
+
+            if metrics:
+                metrics.read(len(data))
+
+            try:
+                if time_writes:
+                    start = time.time()
+                    output.write(data)
+                    metrics.write(len(data), time.time() - start)
+                else:
+                    output.write(data)
+            except IOError as err:
+                if is_player and err.errno in ACCEPTABLE_ERRNO:
+                    log.info("Player closed")
+                elif is_http and err.errno in ACCEPTABLE_ERRNO:
+                    log.info("HTTP connection closed")
+                else:
+                    console.exit("Error when writing to output: {0}, exiting", err)
+
+                break
+    except IOError as err:
+        console.exit("Error when reading from stream: {0}, exiting", err)
+    finally:
+        stream.close()
+        log.info("Stream ended")
+
+
 def handle_stream(plugin, streams, stream_name):
     """Decides what to do with the selected stream.
 
@@ -65,7 +432,7 @@ def handle_stream(plugin, streams, stream_name):
 
     # Print internal command-lin eif this stream uses a subprocess 
     if args.subprocess_cmdline:
-        if isinstance(stream, SteamProcess):
+        if isinstance(stream, StreamProcess):
             try:
                 cmdline = stream.cmdline()
             except StreamError as err: 
@@ -83,73 +450,90 @@ def handle_stream(plugin, streams, stream_name):
         try:
             console.msg("{0}", stream.to_url())
         except TypeError:
-            console.exit()
+            console.exit("The stream specified cannot be translated to a URL")
 
     # Output to stream
     else:
-        alt_streams = list(filter(lambda k: stream_name + "_alt" in k, 
-                                  sorted(stream.keys())))
-        file_output = args.output or args.stdout 
-    
-    for stream_name in [stream_name] + alt_streams: 
-        stream  = streams[stream_name]
-        stream_type = type(stream).shortname()
-
-        if stream_type in args.player_passthrough and not file_output:
-            log.info("Opening stream: {0} ({1})".format(stream_name,
+        # Find any streams with a '_alt' suffix and attempt
+        # to use these in case the main stream is not usable.
+        alt_streams = list(filter(lambda k: stream_name + "_alt" in k,
+                                  sorted(streams.keys())))
+        file_output = args.output or args.stdout
+
+        for stream_name in [stream_name] + alt_streams:
+            stream = streams[stream_name]
+            stream_type = type(stream).shortname()
+
+            if stream_type in args.player_passthrough and not file_output:
+                log.info("Opening stream: {0} ({1})".format(stream_name,
+                                                            stream_type))
+                success = output_stream_passthrough(plugin, stream)
+            elif args.player_external_http:
+                return output_stream_http(plugin, streams, external=True,
+                                          port=args.player_external_http_port)
+            elif args.player_continuous_http and not file_output:
+                return output_stream_http(plugin, streams)
+            else:
+                log.info("Opening stream: {0} ({1})".format(stream_name,
                                                             stream_type))
-            success = output_stream_passthrough(plugin, stream)
-        elif args.player_external_http:
-            return output_stream_http(plugin, streams, external=True,
-                            port=args.player_external_http_port)
-        elif args.player_continuous_http and not file_output:
-            return output_stream_http(plugin, streams)
+
+                success = output_stream(plugin, stream)
+
+            if success:
+                break
+
+
+def close_output(output):
+    """Closes the output, reporting what its last writes failed with.
+
+    A player or HTTP client that has gone away (EPIPE ...) is not an error.
+    """
+    try:
+        output.close()
+    except (IOError, OSError) as err:
+        if err.errno in ACCEPTABLE_ERRNO:
+            log.info("Player closed")
         else:
-            log.info("Opening stream: {0} ({1})".format(stream_name,
-                                                        stream_type))
+            log.error("Error when writing to output: {0}".format(err))
 
-            success = output_stream(plugin, stream)
 
-        if success:
-            break
+def resolve_url(url, follow_redirect=True):
+    """Resolves the URL to a plugin, importing only the plugins that may handle it.
+
+    Only when none of them can, every plugin is loaded and the URL is resolved the
+    usual way (that includes following redirects to find a plugin).
+    """
+    registry.load_matching(streamlink, url)
+    try:
+        return streamlink.resolve_url_no_redirect(url)
+    except NoPluginError:
+        registry.load_all(streamlink)
+        if follow_redirect:
+            return streamlink.resolve_url(url)
+        return streamlink.resolve_url_no_redirect(url)
 
 
 def fetch_streams(plugin):
     """Fetches streams using correct parameters"""
-    retur plugin.streams(stream_types=args.stream_types, 
+    return plugin.streams(stream_types=args.stream_types, 
                          sorting_excludes=args.stream_sorting_excludes)
 
 
-# very good implementation of retry 
-def fetch_streams_with_retry(plugin, interval, count):
-    """Attempts to fetch sterams repeatedly until some are returned or limit hit."""
-    try:
-        streams = fetch_streams(plugin)
-    except PluginError as err: 
-        log.error(u"{0}".format(err))
-        streams = None
+def create_stream_watcher(interval, count, concurrency=1):
+    """A StreamWatcher polling with the --retry-streams/--retry-max options."""
+    return StreamWatcher(fetch_streams, http=streamlink.http, interval=interval,
+                         max_interval=args.retry_streams_max_delay,
+                         max_polls=count + 1 if count > 0 else 0,
+                         concurrency=concurrency)
 
-    if not streams:
-        log.info("waiting for streams, retrying every {}"
-                 "second(s)".format(interval))
-    
-    attempts = 0 
-    while not streams:
-        sleep(interval)
 
-        try:
-            streams = fetch_streams(plugin)
-        except FatalPluginError:
-            raise 
-        except PluginError as err:
-            log.error(u"{0}".format(err))
-        
-        if count > 0:
-            attempts += 1
-            if attemps > count:
-                break
-    
-    return streams
+def fetch_streams_with_retry(plugin, interval, count):
+    """Attempts to fetch streams repeatedly until some are returned or limit hit."""
+    watcher = create_stream_watcher(interval, count).start()
+    try:
+        return watcher.watch(plugin).result()
+    finally:
+        watcher.stop()
 
 
 def resolve_stream_name(streams, stream_name):
@@ -206,7 +590,7 @@ def handle_url():
     otherwise output list of valid streams.
     """
     try: 
-        plugin = streamlink.resolve_url(args.url)
+        plugin = resolve_url(args.url)
         setup_plugin_options(streamlink, plugin)
         log.info("Found matching plugin {0} for URL {1}".format(
                  plugin.module, args.url))
@@ -227,11 +611,121 @@ def handle_url():
             streams = fetch_streams_with_retry(plugin, retry_streams,
                                                retry_max)
         else:
-            streams = fetch_stream(plugin)
-    
-    except
+            streams = fetch_streams(plugin)
+    except NoPluginError:
+        console.exit("No plugin can handle URL: {0}", args.url)
+    except PluginError as err:
+        console.exit(u"{0}", err)
+
+    if not streams:
+        console.exit("No playable streams found on this URL: {0}", args.url)
 
+    if args.default_stream and not args.stream and not args.json:
+        args.stream = args.default_stream
 
+    if args.stream:
+        validstreams = format_valid_streams(plugin, streams)
+        for stream_name in args.stream:
+            if stream_name in streams:
+                log.info("Available streams: {0}".format(validstreams))
+                handle_stream(plugin, streams, stream_name)
+                return
+
+        err = ("The specified stream(s) '{0}' could not be "
+               "found".format(", ".join(args.stream)))
+
+        if console.json:
+            console.msg_json(dict(streams=streams, plugin=plugin.module,
+                                  error=err))
+        else:
+            console.exit("{0}.\n       Available streams: {1}",
+                         err, validstreams)
+    else:
+        if console.json:
+            console.msg_json(dict(streams=streams, plugin=plugin.module))
+        else:
+            validstreams = format_valid_streams(plugin, streams)
+            console.msg("Available streams: {0}", validstreams)
+
+
+def print_plugins():
+    """Outputs a list of all plugins Streamlink has loaded."""
+
+    pluginlist = list(streamlink.get_plugins().keys())
+    pluginlist_formatted = ", ".join(sorted(pluginlist))
+
+    if console.json:
+        console.msg_json(pluginlist)
+    else:
+        console.msg("Loaded plugins: {0}", pluginlist_formatted)
+
+
+def format_record_status(status):
+    """One line per recording of a MultiStreamRecorder status"""
+    lines = ["Recording {0} of {1} streams, {2} written".format(
+        status["recording"], len(status["jobs"]), format_filesize(status["bytes"]))]
+    for job in status["jobs"]:
+        line = "  [{0}] {1}".format(job["state"], job["url"])
+        if job["stream"]:
+            line += " ({0})".format(job["stream"])
+        line += ": {0}".format(format_filesize(job["bytes"]))
+        if job["rate"] is not None and job["state"] == "recording":
+            line += " ({0}/s)".format(format_filesize(job["rate"]))
+        if job["error"]:
+            line += " - {0}".format(job["error"])
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def handle_record_list():
+    """Records every stream of the --record-list file concurrently, in this process."""
+    jobs = read_record_list(args.record_list, args.default_stream or ["best"])
+    if not jobs:
+        console.exit("No streams to record in {0}", args.record_list)
+
+    # resolving (and prompting for plugin options) happens here, before any recording starts
+    for job in jobs:
+        try:
+            job.plugin = resolve_url(job.url)
+        except NoPluginError:
+            console.exit("No plugin can handle URL: {0}", job.url)
+        except PluginError as err:
+            console.exit(u"{0}", err)
+        setup_plugin_options(streamlink, job.plugin)
+        log.info("Found matching plugin {0} for URL {1}".format(job.plugin.module, job.url))
+
+    # with retries, one watcher polls every channel that is waiting for its streams
+    watcher = None
+    fetch = fetch_streams
+    if args.retry_max or args.retry_streams:
+        watcher = create_stream_watcher(args.retry_streams or 1, args.retry_max or 0,
+                                        concurrency=min(len(jobs), 16)).start()
+
+        def fetch(plugin):
+            return watcher.watch(plugin).result()
+
+    recorder = MultiStreamRecorder(streamlink, jobs, fetch,
+                                   directory=os.path.expanduser(args.record_dir),
+                                   reconnect=args.record_reconnect,
+                                   segment_threads=args.hls_segment_threads or 3)
+
+    def report(status):
+        if console.json:
+            console.msg_json(status)
+        else:
+            console.msg("{0}", format_record_status(status))
+
+    recorder.start()
+    try:
+        recorder.wait(args.record_status_interval, report)
+    finally:
+        recorder.stop()
+        if watcher:
+            watcher.stop()
+
+    if any(job.state == "failed" for job in jobs):
+        return 1
+    return 0
 
 
 # use both config file and the parser to populate this namespace 
@@ -242,13 +736,13 @@ def setup_args(parser, config_files=[], ignore_unknown=False):
     
     # then load arguments from config files 
     # not ArgumentParser takes this parameter fromfile_prefix_chars="@"
-    for config_file in filter(os.path.isfile, config_file): 
+    for config_file in filter(os.path.isfile, config_files): 
         arglist.insert(0, "@"+config_file)
     
     args, unknown = parser.parse_known_args(arglist)
     if unknown and not ignore_unknown: 
         msg = gettext('unrecognized arguments" %s')
-        parser.error(msg % ' '.join(known))
+        parser.error(msg % ' '.join(unknown))
     
     # force lowercase to allow case-insensitive lookup 
     if args.stream: 
@@ -263,7 +757,7 @@ def setup_config_args(parser):
 
     if args.url:
         with ignored(NoPluginError):
-            plugin = streamlink.resolve_url(args.url)
+            plugin = resolve_url(args.url)
             config_files += ["{0}.{1}".format(fn, plugin.module) for fn in CONFIG_FILES]
     
     if args.config:
@@ -275,8 +769,8 @@ def setup_config_args(parser):
             config_files.append(config_file)
             break 
 
-    if config_files:
-        setup_args(parser, config_files)
+    # always parse here, this is the parse with the plugin arguments added
+    setup_args(parser, config_files)
 
 # important - setup the console here that other functions can refer to 
 def setup_console(output):
@@ -291,19 +785,81 @@ def setup_console(output):
     signal.signal(signal.SIGTERM, signal.default_int_handler)
 
 
+def setup_http_session():
+    """Sets the global HTTP settings, such as proxy and headers."""
+    if args.http_proxy:
+        streamlink.set_option("http-proxy", args.http_proxy)
+
+    if args.https_proxy:
+        streamlink.set_option("https-proxy", args.https_proxy)
+
+    if args.http_cookie:
+        streamlink.set_option("http-cookies", dict(args.http_cookie))
+
+    if args.http_header:
+        streamlink.set_option("http-headers", dict(args.http_header))
+
+    if args.http_query_param:
+        streamlink.set_option("http-query-params", dict(args.http_query_param))
+
+    if args.http_ignore_env:
+        streamlink.set_option("http-trust-env", False)
+
+    if args.http_no_ssl_verify:
+        streamlink.set_option("http-ssl-verify", False)
+
+    if args.http_disable_dh:
+        streamlink.set_option("http-disable-dh", True)
+
+    if args.http_ssl_cert:
+        streamlink.set_option("http-ssl-cert", args.http_ssl_cert)
+
+    if args.http_ssl_cert_crt_key:
+        streamlink.set_option("http-ssl-cert", tuple(args.http_ssl_cert_crt_key))
+
+    if args.http_timeout:
+        streamlink.set_option("http-timeout", args.http_timeout)
+
+    if args.http_cookies:
+        streamlink.set_option("http-cookies", args.http_cookies)
+
+    if args.http_headers:
+        streamlink.set_option("http-headers", args.http_headers)
+
+    if args.http_query_params:
+        streamlink.set_option("http-query-params", args.http_query_params)
+
+
 def setup_plugins(extra_plugin_dir=None):
+    """Sets up the plugin registry, plugins are then loaded when a URL needs them."""
+    global registry
+
+    directories = [plugins.__path__[0]]
     if os.path.isdir(PLUGINS_DIR):
-        load_plugins([PLUGINS_DIR])
-    
-    if extra_plugin_dir:
-        load_plugins(extra_plugin_dir)
+        directories.append(PLUGINS_DIR)
+
+    for directory in extra_plugin_dir or []:
+        directory = os.path.expanduser(directory)
+        if os.path.isdir(directory):
+            directories.append(directory)
+        else:
+            log.warning("Plugin path {0} does not exist or is not a directory!".format(directory))
+
+    registry = PluginRegistry(directories, PLUGIN_REGISTRY_FILE).refresh(streamlink)
+
+
+class LazyStreamlink(Streamlink):
+    """Streamlink session which leaves loading the plugins to the registry"""
+
+    def load_builtin_plugins(self):
+        pass
 
 
 def setup_streamlink():
     """Creates the Streamlink session."""
     global streamlink
 
-    streamlink = Streamlink({"user-input-requester": ConsoleUserInputRequester(console)})
+    streamlink = LazyStreamlink({"user-input-requester": ConsoleUserInputRequester(console)})
 
 
 def setup_options():
@@ -317,28 +873,97 @@ def setup_options():
     if args.hls_segment_attempts:
         streamlink.set_option("hls-segment-attempts", args.hls_segment_attempts)
 
+    if args.hls_segment_threads:
+        streamlink.set_option("hls-segment-threads", args.hls_segment_threads)
+
+    if args.ringbuffer_size:
+        streamlink.set_option("ringbuffer-size", args.ringbuffer_size)
+
+    if args.stream_metrics_interval or args.stream_metrics_file:
+        setup_stream_metrics()
+
+
+def setup_stream_metrics():
+    """Shares a StreamMetrics through the session.
+
+    It is shown every --stream-metrics-interval seconds and dumped as JSON
+    to --stream-metrics-file at exit.
+    """
+    metrics = StreamMetrics()
+    streamlink.set_option("stream-metrics", metrics)
+
+    if args.stream_metrics_interval:
+        def report():
+            wait = threading.Event().wait
+            while not wait(args.stream_metrics_interval):
+                show_stream_metrics(metrics.snapshot())
+
+        thread = threading.Thread(target=report, name="StreamMetrics")
+        thread.daemon = True
+        thread.start()
+
+    if args.stream_metrics_file:
+        atexit.register(dump_stream_metrics, metrics, os.path.expanduser(args.stream_metrics_file))
+
+
+def show_stream_metrics(snapshot):
+    if console.json:
+        console.msg_json(snapshot)
+    else:
+        console.msg("Stream metrics: {0}", format_metrics(snapshot, format_filesize))
+
+
+def dump_stream_metrics(metrics, filename):
+    try:
+        metrics.dump(filename)
+        log.debug("Wrote stream metrics to {0}".format(filename))
+    except (IOError, OSError) as err:
+        log.error("Failed to write stream metrics to {0}: {1}".format(filename, err))
+
 # can pass in 
 def setup_plugin_args(session, parser):
     """Set Streamlink plugin options."""
     plugin_args = parser.add_argument_group("Plugin options")
-    for pname, plugin in session.plugins.items():
-        defaults = {}
-        for parg in plugin.arguments: 
+    # the arguments of the plugins which are not loaded come from the registry
+    for pname, arguments in registry.arguments(session):
+        for parg in arguments:
             plugin_args.add_argument(parg.argument_name(pname), **parg.options)
-            defaults[parg.dest] = parg.default 
-        
-        plugin.options = PluginOptions(defaults)
+
+
+def convert_plugin_argument(pname, parg, value):
+    """Applies the type of an argument the registry added to the parser without it."""
+    type_ = parg.options.get("type")
+    if type_ is None:
+        return value
+
+    try:
+        if isinstance(value, list):
+            return [type_(v) if isinstance(v, str) else v for v in value]
+        elif isinstance(value, str):
+            return type_(value)
+    except (argparse.ArgumentTypeError, TypeError, ValueError) as err:
+        console.exit("argument {0}: invalid value: {1!r} ({2})", parg.argument_name(pname), value, err)
+
+    return value
 
 
 def setup_plugin_options(session, plugin):
     """Sets Streamlink plugin options."""
     pname = plugin.module
+    defaults = {}
+    for parg in plugin.arguments:
+        defaults[parg.dest] = parg.default
+    plugin.options = PluginOptions(defaults)
+
+    deferred = registry.deferred(pname)
     required = OrderedDict({})
     for parg in plugin.arguments:
         if parg.options.get("help") != argparse.SUPPRESS:
             if parg.required:
                 required[parg.name] = parg
             value = getattr(args, parg.namespace_dest(pname))
+            if parg.name in deferred:
+                value = convert_plugin_argument(pname, parg, value)
             session.set_plugin_option(pname, parg.dest, value)
             # if the value is set, check to see if any of the required arguments are not set
             if parg.required or value:
@@ -359,6 +984,39 @@ def setup_plugin_options(session, plugin):
                                           console.ask(prompt + ": "))
 
 
+def check_root():
+    if hasattr(os, "getuid"):
+        if os.geteuid() == 0:
+            log.info("streamlink is running as root! Be careful!")
+
+
+def log_current_versions():
+    """Show current installed versions"""
+    if logger.root.isEnabledFor(logging.DEBUG):
+        # MAC OS X
+        if sys.platform == "darwin":
+            os_version = "macOS {0}".format(platform.mac_ver()[0])
+        # Windows
+        elif sys.platform.startswith("win"):
+            os_version = "{0} {1}".format(platform.system(), platform.release())
+        # linux / other
+        else:
+            os_version = platform.platform()
+
+        log.debug("OS:         {0}".format(os_version))
+        log.debug("Python:     {0}".format(platform.python_version()))
+        log.debug("Streamlink: {0}".format(streamlink_version))
+        log.debug("Requests({0}), Socks({1}), Websocket({2})".format(
+            requests.__version__, socks_version, websocket_version))
+
+
+def setup_logging(stream=sys.stdout, level="info"):
+    fmt = ("[{asctime},{msecs:0.0f}]" if level == "trace" else "") + "[{name}][{levelname}] {message}"
+    logger.basicConfig(stream=stream, level=level,
+                       format=fmt, style="{",
+                       datefmt="%H:%M:%S")
+
+
 def main():
     error_code = 0 
     parser = build_parser()
@@ -382,8 +1040,7 @@ def main():
     setup_plugins(args.plugin_dirs)
     # add to the parser the plugin args 
     setup_plugin_args(streamlink, parser)
-    # call setup args again once the plugin specific args have been added
-    setup_args(parser)
+    # parse again (with the config files) once the plugin specific args have been added
     setup_config_args(parser)
 
     # update the logging level if changed by a plugin specific config
@@ -395,21 +1052,29 @@ def main():
     log_current_versions()
     
     if args.plugins:
+            registry.load_all(streamlink)
             print_plugins()
     elif args.can_handle_url:
         try:
-            streamlink.resolve_url(args.can_handle_url)
+            resolve_url(args.can_handle_url)
         except NoPluginError:
             error_code = 1
         except KeyboardInterrupt:
             error_code = 130
     elif args.can_handle_url_no_redirect:
         try:
-            streamlink.resolve_url_no_redirect(args.can_handle_url_no_redirect)
+            resolve_url(args.can_handle_url_no_redirect, follow_redirect=False)
         except NoPluginError:
             error_code = 1
         except KeyboardInterrupt:
             error_code = 130
+    elif args.record_list:
+        try:
+            setup_options()
+            error_code = handle_record_list()
+        except KeyboardInterrupt:
+            console.msg("Interrupted! Exiting...")
+            error_code = 130
     elif args.url:
         try:
             setup_options()
@@ -417,7 +1082,7 @@ def main():
         except KeyboardInterrupt:
             # Close output
             if output:
-                output.close()
+                close_output(output)
             console.msg("Interrupted! Exiting...")
             error_code = 130
         finally:
@@ -427,8 +1092,6 @@ def main():
                     stream_fd.close()
                 except KeyboardInterrupt:
                     error_code = 130
-    elif args.twitch_oauth_authenticate:
-        authenticate_twitch_oauth()
     elif args.help:
         parser.print_help()
     else:
@@ -1,7 +1,17 @@
 import logging 
 import os 
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from time import sleep
 
-from .compat import stdout
+from streamlink.utils.encoding import get_filesystem_encoding, maybe_encode, maybe_decode
+from .compat import is_win32, stdout
+from .constants import DEFAULT_PLAYER_ARGUMENTS, SUPPORTED_PLAYERS
+from .utils import ignored
 
 log = logging.getLogger("streamlink.cli.output")
 
@@ -16,9 +26,9 @@ class Output(object):
     
     def close(self):
         if self.opened:
+            # not opened any more even when _close() raises
+            self.opened = False
             self._close()
-        
-        self.opened = False 
     
     def write(self, data):
         if not self.opened:
@@ -36,28 +46,453 @@ class Output(object):
         pass 
 
 
+class AsyncWriter(object):
+    """
+    Writes chunks to one or more file objects from a background thread
+
+    The thread reading the stream only queues the chunk and goes back to the network,
+    a slow disk or player pipe is absorbed by up to buffer_size queued bytes and only
+    then blocks put() (backpressure). Queued chunks are written out in batches of up
+    to batch_size bytes with a single os.writev per target where the platform has it,
+    so many small chunks become one syscall and nothing is joined or copied.
+
+    Read-only buffers (bytes, memoryviews of bytes) are queued as they are, writable
+    ones (bytearray, views of a reused buffer) are copied once since the caller may
+    overwrite them before they are written.
+    """
+
+    # the smallest IOV_MAX of the platforms with writev (it is 1024 on linux and macOS)
+    IOV_MAX = 1024
+
+    def __init__(self, fds, buffer_size=1024 * 1024 * 8, batch_size=1024 * 1024, metrics=None):
+        self.fds = fds
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.filenos = [self._fileno(fd) for fd in fds]
+
+        self.queue = deque()
+        self.queued = 0
+        self.cond = threading.Condition()
+        self.closing = False
+        self.error = None
+        self.error_raised = False
+        self.stats = dict(chunks=0, bytes=0, copies=0, writes=0, write_time=0.0,
+                          max_queued=0, producer_waits=0, producer_wait_time=0.0)
+        # a StreamMetrics, writes and producer waits are reported to it
+        self.metrics = metrics
+        if metrics:
+            metrics.add_gauge("output_buffer", self.backpressure)
+
+        self.thread = threading.Thread(target=self._run, name="AsyncWriter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    @staticmethod
+    def _fileno(fd):
+        # None means fall back to fd.write
+        if not hasattr(os, "writev"):
+            return None
+        try:
+            # everything written so far has to go out before we bypass the file object's buffer
+            fd.flush()
+            return fd.fileno()
+        except (AttributeError, IOError, OSError, ValueError):
+            return None
+
+    def put(self, data):
+        view = memoryview(data)
+        if not view.readonly:
+            view = memoryview(bytes(view))
+            self.stats["copies"] += 1
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+        size = view.nbytes
+        if not size:
+            return
+
+        waited = None
+        with self.cond:
+            if self.queued and self.queued + size > self.buffer_size:
+                self.stats["producer_waits"] += 1
+                start = time.time()
+                while self.error is None and self.queued and self.queued + size > self.buffer_size:
+                    self.cond.wait()
+                waited = time.time() - start
+                self.stats["producer_wait_time"] += waited
+            if self.error is not None:
+                self.error_raised = True
+                raise self.error
+            self.queue.append(view)
+            self.queued += size
+            self.stats["chunks"] += 1
+            self.stats["max_queued"] = max(self.stats["max_queued"], self.queued)
+            self.cond.notify_all()
+        if waited is not None and self.metrics:
+            self.metrics.stall("output", waited)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closing:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                batch = []
+                size = 0
+                while self.queue and len(batch) < self.IOV_MAX and size < self.batch_size:
+                    view = self.queue.popleft()
+                    batch.append(view)
+                    size += view.nbytes
+
+            start = time.time()
+            try:
+                for fd, fileno in zip(self.fds, self.filenos):
+                    self._write(fd, fileno, batch)
+            except (IOError, OSError) as err:
+                with self.cond:
+                    self.error = err
+                    self.queue.clear()
+                    self.queued = 0
+                    self.cond.notify_all()
+                return
+
+            elapsed = time.time() - start
+            with self.cond:
+                self.queued -= size
+                self.stats["bytes"] += size
+                self.stats["writes"] += 1
+                self.stats["write_time"] += elapsed
+                self.cond.notify_all()
+            if self.metrics:
+                self.metrics.write(size, elapsed)
+
+    @staticmethod
+    def _write(fd, fileno, batch):
+        if fileno is None:
+            fd.write(batch[0] if len(batch) == 1 else b"".join(batch))
+            return
+
+        while batch:
+            written = os.writev(fileno, batch)
+            # partial write (e.g. a full pipe), drop what went out and try again with the rest
+            index = 0
+            while index < len(batch) and written >= batch[index].nbytes:
+                written -= batch[index].nbytes
+                index += 1
+            batch = batch[index:]
+            if batch and written:
+                batch[0] = batch[0][written:]
+
+    def close(self):
+        """
+        Waits until everything queued is written
+
+        Raises the error a write failed with, unless put() has raised it already
+        (the last chunks are only written here, after the final put()).
+        """
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join()
+        if self.metrics:
+            self.metrics.remove_gauge("output_buffer", self.backpressure)
+        if self.error is not None:
+            log.debug("Output writer failed: {0}".format(self.error))
+            if not self.error_raised:
+                self.error_raised = True
+                raise self.error
+
+    def backpressure(self):
+        """How full the buffer is (0 - 1), for progress output"""
+        with self.cond:
+            return float(self.queued) / self.buffer_size
+
+
 class FileOutput(Output):
-    def __init__(self, filename=None, fd=None, record=None):
+    def __init__(self, filename=None, fd=None, record=None, async_write=True,
+                 buffer_size=1024 * 1024 * 8, metrics=None):
         super(FileOutput, self).__init__()
         self.filename = filename 
         self.fd = fd 
         self.record = record 
+        self.async_write = async_write
+        self.buffer_size = buffer_size
+        self.metrics = metrics
+        self.writer = None
     
     def _open(self):
         if self.filename:
             self.fd = open(self.filename, "wb")
         
         if self.record:
+            if isinstance(self.record, FileOutput):
+                # the record file is written by our writer thread, from the same buffers
+                self.record.async_write = False
             self.record.open()
+
+        if self.async_write:
+            fds = [self.fd]
+            if isinstance(self.record, FileOutput):
+                fds.append(self.record.fd)
+            self.writer = AsyncWriter(fds, buffer_size=self.buffer_size, metrics=self.metrics)
         
     def _close(self):
-        if self.fd is not stdout:
-            self.fd.close()
-        if self.record:
-            self.record.close()
+        # the files are closed even when the writer raises what it failed with
+        try:
+            if self.writer:
+                writer, self.writer = self.writer, None
+                writer.close()
+        finally:
+            try:
+                if self.fd is not stdout:
+                    self.fd.close()
+            finally:
+                if self.record:
+                    self.record.close()
     
     def _write(self, data):
+        if self.writer:
+            self.writer.put(data)
+            if self.record and not isinstance(self.record, FileOutput):
+                self.record.write(data)
+            return
+
+        start = time.time()
         self.fd.write(data)
+        if self.metrics:
+            self.metrics.write(len(data), time.time() - start)
         if self.record:
             self.record.write(data)
-        
+
+    @property
+    def stats(self):
+        """Writer stats (bytes, writes, max_queued, producer_waits ...), None when writing synchronously"""
+        if self.writer:
+            return dict(self.writer.stats, buffer_size=self.buffer_size)
+
+
+class PlayerOutput(Output):
+    PLAYER_TERMINATE_TIMEOUT = 10.0
+
+    def __init__(self, cmd, args=DEFAULT_PLAYER_ARGUMENTS, filename=None, quiet=True, kill=True,
+                 call=False, http=None, namedpipe=None, record=None, title=None):
+        super(PlayerOutput, self).__init__()
+        self.cmd = cmd
+        self.args = args
+        self.kill = kill
+        self.call = call
+        self.quiet = quiet
+
+        self.filename = filename
+        self.namedpipe = namedpipe
+        self.http = http
+        self.title = title
+        self.player = None
+        self.player_name = self.supported_player(self.cmd)
+        self.record = record
+
+        if self.namedpipe or self.filename or self.http:
+            self.stdin = sys.stdin
+        else:
+            self.stdin = subprocess.PIPE
+
+        if self.quiet:
+            self.stdout = open(os.devnull, "w")
+            self.stderr = open(os.devnull, "w")
+        else:
+            self.stdout = sys.stdout
+            self.stderr = sys.stderr
+
+    @property
+    def running(self):
+        sleep(0.5)
+        return self.player.poll() is None
+
+    @classmethod
+    def supported_player(cls, cmd):
+        """
+        Check if the current player supports adding a title
+
+        :param cmd: command to test
+        :return: name of the player|None
+        """
+        if not is_win32:
+            # under a POSIX system use shlex to find the actual command
+            # under windows this is not an issue because executables end in .exe
+            cmd = shlex.split(cmd)[0]
+
+        cmd = os.path.basename(cmd.lower())
+        for player, possiblecmds in SUPPORTED_PLAYERS.items():
+            for possiblecmd in possiblecmds:
+                if cmd.startswith(possiblecmd):
+                    return player
+
+    @classmethod
+    def _mpv_title_escape(cls, title_string):
+        # mpv has a "disable property-expansion" token which must be handled
+        # in order to accurately represent $$ in title
+        if r'\$>' in title_string:
+            processed_title = ""
+            double_dollars = True
+            i = dollars = 0
+            while i < len(title_string):
+                if double_dollars:
+                    if title_string[i] == "\\":
+                        if title_string[i + 1] == "$":
+                            processed_title += "$"
+                            dollars += 1
+                            i += 1
+                            if title_string[i + 1] == ">" and dollars % 2 == 1:
+                                double_dollars = False
+                                processed_title += ">"
+                                i += 1
+                        else:
+                            processed_title += "\\"
+                    elif title_string[i] == "$":
+                        processed_title += "$$"
+                    else:
+                        dollars = 0
+                        processed_title += title_string[i]
+                else:
+                    if title_string[i:i + 2] == "\\$":
+                        processed_title += "$"
+                        i += 1
+                    else:
+                        processed_title += title_string[i]
+                i += 1
+            return processed_title
+        else:
+            # not possible for property-expansion to be disabled, happy days
+            return title_string.replace("$", "$$").replace(r'\$$', "$")
+
+    def _create_arguments(self):
+        if self.namedpipe:
+            filename = self.namedpipe.path
+        elif self.filename:
+            filename = self.filename
+        elif self.http:
+            filename = self.http.url
+        else:
+            filename = "-"
+        extra_args = []
+
+        if self.title is not None:
+            # vlc
+            if self.player_name == "vlc":
+                # see https://wiki.videolan.org/Documentation:Format_String/, allow escaping with \$
+                self.title = self.title.replace("$", "$$").replace(r'\$$', "$")
+                extra_args.extend([u"--input-title-format", self.title])
+
+            # mpv
+            if self.player_name == "mpv":
+                # see https://mpv.io/manual/stable/#property-expansion, allow escaping with \$, respect mpv's $>
+                self.title = self._mpv_title_escape(self.title)
+                extra_args.append(u"--title={}".format(self.title))
+
+            # potplayer
+            if self.player_name == "potplayer":
+                if filename != "-":
+                    # PotPlayer - About - Command Line
+                    # You can specify titles for URLs by separating them with a backslash (\) at the end of URLs.
+                    # eg. "http://...\title of this url"
+                    self.title = self.title.replace('"', '')
+                    filename = filename[:-1] + '\\' + self.title + filename[-1]
+
+        args = self.args.format(filename=filename)
+        cmd = self.cmd
+
+        # player command
+        if is_win32:
+            eargs = maybe_decode(subprocess.list2cmdline(extra_args))
+            # do not insert and extra " " when there are no extra_args
+            return u' '.join([cmd] + ([eargs] if eargs else []) + [args])
+        return shlex.split(cmd) + extra_args + shlex.split(args)
+
+    def _open(self):
+        try:
+            if self.record:
+                self.record.open()
+            if self.call and self.filename:
+                self._open_call()
+            else:
+                self._open_subprocess()
+        finally:
+            if self.quiet:
+                # Output streams no longer needed in parent process
+                self.stdout.close()
+                self.stderr.close()
+
+    def _open_call(self):
+        args = self._create_arguments()
+        if is_win32:
+            fargs = args
+        else:
+            fargs = subprocess.list2cmdline(args)
+        log.debug(u"Calling: {0}".format(fargs))
+
+        subprocess.call(maybe_encode(args, get_filesystem_encoding()),
+                        stdout=self.stdout,
+                        stderr=self.stderr)
+
+    def _open_subprocess(self):
+        # Force bufsize=0 on all Python versions to avoid writing the
+        # unflushed buffer when closing a broken input pipe
+        args = self._create_arguments()
+        if is_win32:
+            fargs = args
+        else:
+            fargs = subprocess.list2cmdline(args)
+        log.debug(u"Opening subprocess: {0}".format(fargs))
+
+        self.player = subprocess.Popen(maybe_encode(args, get_filesystem_encoding()),
+                                       stdin=self.stdin, bufsize=0,
+                                       stdout=self.stdout,
+                                       stderr=self.stderr)
+        # Wait 0.5 seconds to see if program exited prematurely
+        if not self.running:
+            raise OSError("Process exited prematurely")
+
+        if self.namedpipe:
+            self.namedpipe.open("wb")
+        elif self.http:
+            self.http.open()
+
+    def _close(self):
+        # Close input to the player first to signal the end of the
+        # stream and allow the player to terminate of its own accord
+        if self.namedpipe:
+            self.namedpipe.close()
+        elif self.http:
+            self.http.close()
+        elif not self.filename:
+            self.player.stdin.close()
+
+        if self.record:
+            self.record.close()
+
+        if self.kill:
+            with ignored(Exception):
+                self.player.terminate()
+                if not is_win32:
+                    t, timeout = 0.0, self.PLAYER_TERMINATE_TIMEOUT
+                    while self.player.poll() is None and t < timeout:
+                        sleep(0.5)
+                        t += 0.5
+
+                    if not self.player.returncode:
+                        self.player.kill()
+        self.player.wait()
+
+    def _write(self, data):
+        if self.record:
+            self.record.write(data)
+
+        if self.namedpipe:
+            self.namedpipe.write(data)
+        elif self.http:
+            self.http.write(data)
+        else:
+            self.player.stdin.write(data)
+
+
+__all__ = ["PlayerOutput", "FileOutput"]
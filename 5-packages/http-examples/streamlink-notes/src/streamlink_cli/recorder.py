@@ -0,0 +1,290 @@
+"""
+Records many streams in one streamlink process
+
+Each entry of the record list gets a thread that resolves its streams (with the
+same retry behaviour as a single `streamlink --retry-streams` run), opens the
+selected one and writes it to its own file. All of them share the one Streamlink
+session, so a single pooled HTTPSession and a single segment download executor,
+instead of one interpreter with its own connections and threads per channel.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from datetime import datetime
+
+from streamlink import StreamError, PluginError
+from streamlink.compat import urlparse
+
+from .output import FileOutput
+
+log = logging.getLogger("streamlink.cli.recorder")
+
+_unsafe_re = re.compile(r"[^\w.-]+")
+
+
+class RecordJob(object):
+    """
+    One line of the record list: ``URL [STREAM[,STREAM...]] [FILENAME]``
+
+    The streams are tried in order, FILENAME may use ``{time}`` (the time the
+    recording starts, formatted with strftime) and defaults to
+    ``<url>-{time:%Y%m%d-%H%M%S}.ts`` in the record directory.
+    """
+
+    def __init__(self, url, streams, filename=None):
+        self.url = url
+        self.streams = streams
+        self.filename = filename
+        self.plugin = None
+        self.stream_name = None
+        self.state = "pending"
+        self.error = None
+        self.fd = None
+        self.output = None
+        self.stats = dict(bytes=0, files=0, retries=0, errors=0, started=None, last_data=None)
+
+    @classmethod
+    def parse(cls, line, default_streams):
+        parts = line.split()
+        url = parts[0]
+        streams = [s.lower() for s in parts[1].split(",")] if len(parts) > 1 else default_streams
+        filename = " ".join(parts[2:]) or None
+        return cls(url, streams, filename)
+
+    @property
+    def host(self):
+        return urlparse(self.url).netloc
+
+    def output_filename(self, directory, when):
+        if self.filename:
+            filename = self.filename.format(time=when)
+        else:
+            slug = _unsafe_re.sub("_", self.url.split("://", 1)[-1]).strip("_")
+            filename = "{0}-{1:%Y%m%d-%H%M%S}.ts".format(slug, when)
+
+        filename = os.path.join(directory, os.path.expanduser(filename))
+        if os.path.exists(filename):
+            # a reconnect within the same second or a fixed filename, never overwrite a recording
+            base, ext = os.path.splitext(filename)
+            n = 1
+            while os.path.exists("{0}-{1}{2}".format(base, n, ext)):
+                n += 1
+            filename = "{0}-{1}{2}".format(base, n, ext)
+        return filename
+
+
+def read_record_list(filename, default_streams):
+    """Reads the jobs of a record list file, empty lines and lines starting with # are skipped"""
+    jobs = []
+    with open(filename) as fd:
+        for line in fd:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                jobs.append(RecordJob.parse(line, default_streams))
+    return jobs
+
+
+class MultiStreamRecorder(object):
+    """
+    Runs the RecordJobs of one Streamlink session concurrently
+
+    :param session: the Streamlink session, already set up with the CLI options
+    :param jobs: RecordJobs whose plugin has been resolved and set up
+    :param fetch: ``fetch(plugin)`` returns the plugin's streams (retrying as configured) or
+                  None when the retries ran out, may raise PluginError
+    :param directory: where the recordings are written
+    :param reconnect: go back to waiting for streams when a recording ends, instead of finishing the job
+    :param segment_threads: max concurrent segment downloads per stream, the shared
+                            executor and the per host connection pools are sized from it
+    :param chunk_size: size of the reads from the streams
+    """
+
+    def __init__(self, session, jobs, fetch, directory=".", reconnect=False,
+                 segment_threads=3, chunk_size=8192):
+        self.session = session
+        self.jobs = jobs
+        self.fetch = fetch
+        self.directory = directory
+        self.reconnect = reconnect
+        self.chunk_size = chunk_size
+        self.metrics = session.get_option("stream-metrics")
+
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.started = None
+        self._last_status = (None, {})
+
+        # one download executor for the segments of every stream
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(jobs) * segment_threads))
+        session.set_option("segment-executor", self.executor)
+
+        # every stream keeps connections to its site (and mostly a CDN shared with others)
+        hosts = OrderedDict()
+        for job in jobs:
+            hosts[job.host] = hosts.get(job.host, 0) + 1
+        http = session.http
+        http.set_pool_size(max(http.pool_connections, 2 * len(hosts)),
+                           max(http.pool_maxsize, len(jobs) * (segment_threads + 1)))
+        for host, count in hosts.items():
+            http.set_host_pool_size(host, max(http.pool_maxsize, count * (segment_threads + 1)))
+
+    def start(self):
+        self.started = time.time()
+        for index, job in enumerate(self.jobs):
+            thread = threading.Thread(target=self._run, args=(job,), name="Recorder-{0}".format(index))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _set_state(self, job, state, error=None):
+        with self.lock:
+            job.state = state
+            job.error = error
+        if error:
+            log.error("{0}: {1}".format(job.url, error))
+
+    def _run(self, job):
+        while not self.stopped.is_set():
+            self._set_state(job, "waiting")
+            try:
+                streams = self.fetch(job.plugin)
+            except CancelledError:
+                # the watcher was stopped while the job was waiting for its streams
+                break
+            except PluginError as err:
+                job.stats["errors"] += 1
+                self._set_state(job, "failed", err)
+                return
+
+            if not streams:
+                self._set_state(job, "failed", "No playable streams found")
+                return
+
+            for name in job.streams:
+                if name in streams:
+                    break
+            else:
+                self._set_state(job, "failed", "None of the streams {0} is available, available streams: {1}".format(
+                    ",".join(job.streams), ", ".join(streams)))
+                return
+
+            job.stream_name = name
+            try:
+                self._record(job, streams[name])
+            except (StreamError, IOError, OSError) as err:
+                job.stats["errors"] += 1
+                self._set_state(job, "error", err)
+
+            if not self.reconnect:
+                break
+            job.stats["retries"] += 1
+
+        if job.state not in ("failed", "error"):
+            self._set_state(job, "finished")
+
+    def _record(self, job, stream):
+        fd = stream.open()
+        when = datetime.now()
+        output = FileOutput(job.output_filename(self.directory, when), metrics=self.metrics)
+        with self.lock:
+            job.fd = fd
+            job.output = output
+            job.stats["files"] += 1
+            job.stats["started"] = time.time()
+        log.info("{0}: recording {1} to {2}".format(job.url, job.stream_name, output.filename))
+        self._set_state(job, "recording")
+
+        try:
+            output.open()
+            while not self.stopped.is_set():
+                data = fd.read(self.chunk_size)
+                if not data:
+                    break
+                output.write(data)
+                if self.metrics:
+                    self.metrics.read(len(data))
+                with self.lock:
+                    job.stats["bytes"] += len(data)
+                    job.stats["last_data"] = time.time()
+        finally:
+            with self.lock:
+                job.fd = job.output = None
+            fd.close()
+            output.close()
+
+    def status(self):
+        """
+        The combined view of all jobs, a dict with a list of per job dicts
+        (state, bytes, current rate ...) and the session's per host HTTP stats
+        """
+        now = time.time()
+        last_time, last_bytes = self._last_status
+        jobs = []
+        totals = {}
+        with self.lock:
+            for index, job in enumerate(self.jobs):
+                stats = dict(job.stats)
+                rate = None
+                if last_time is not None and now > last_time:
+                    rate = (stats["bytes"] - last_bytes.get(index, 0)) / (now - last_time)
+                totals[index] = stats["bytes"]
+                writer = job.output.stats if job.output is not None else None
+                jobs.append(dict(
+                    url=job.url,
+                    stream=job.stream_name,
+                    state=job.state,
+                    error=job.error and str(job.error),
+                    rate=rate,
+                    output=job.output.filename if job.output is not None else None,
+                    backpressure=job.output.writer.backpressure() if writer else None,
+                    **stats
+                ))
+        self._last_status = (now, totals)
+
+        host_stats = getattr(self.session.http, "host_stats", None)
+        return dict(
+            uptime=now - self.started if self.started else 0,
+            recording=sum(1 for job in jobs if job["state"] == "recording"),
+            bytes=sum(job["bytes"] for job in jobs),
+            jobs=jobs,
+            hosts=host_stats() if host_stats else {},
+        )
+
+    def running(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def wait(self, interval=None, report=None):
+        """Waits for every job to finish, calling report(status()) every interval seconds"""
+        last_report = time.time()
+        while self.running():
+            # short sleeps rather than joins, a KeyboardInterrupt has to get through
+            time.sleep(0.5)
+            if report and interval and time.time() - last_report >= interval:
+                report(self.status())
+                last_report = time.time()
+        if report:
+            report(self.status())
+
+    def stop(self):
+        """Stops every job, closing the streams unblocks the threads reading them"""
+        self.stopped.set()
+        with self.lock:
+            fds = [job.fd for job in self.jobs if job.fd is not None]
+        for fd in fds:
+            try:
+                fd.close()
+            except (StreamError, IOError, OSError):
+                pass
+        for thread in self.threads:
+            thread.join(5)
+        self.executor.shutdown(wait=False)
+
+
+__all__ = ["MultiStreamRecorder", "RecordJob", "read_record_list"]
@@ -0,0 +1,240 @@
+"""
+Waits for streams to become available, for any number of channels at once
+
+fetch_streams_with_retry used to sleep in a loop per channel. Here one asyncio
+loop (in its own thread) schedules the polls of every watched plugin: each poll
+runs the plugin's stream extraction in a small thread pool, with the session's
+GET requests made conditional so unchanged API responses and playlists come back
+as 304s, and the next poll of a channel that is still offline is pushed further
+out (up to max_interval) with some jitter so hundreds of channels don't poll in
+lockstep. As soon as a poll returns streams the channel's callback fires and its
+future resolves.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from streamlink.exceptions import FatalPluginError, PluginError
+
+log = logging.getLogger("streamlink.cli.watcher")
+
+
+class Watch(object):
+    """The polling state of one watched plugin"""
+
+    def __init__(self, plugin, callback, interval):
+        self.plugin = plugin
+        self.callback = callback
+        self.future = Future()
+        self.interval = interval
+        self.polls = 0
+        self.errors = 0
+        self.added = time.time()
+        self.cancelled = False
+
+    @property
+    def name(self):
+        return getattr(self.plugin, "url", None) or repr(self.plugin)
+
+
+class StreamWatcher(object):
+    """
+    Polls watched plugins until they have streams
+
+    :param fetch: ``fetch(plugin)`` returns the plugin's streams, may raise PluginError
+    :param http: the HTTPSession, the polls' GET requests are made conditional on it
+    :param interval: seconds between the polls of a channel
+    :param max_interval: the interval of a channel that stays offline grows up to this,
+                         by default it doesn't grow
+    :param backoff: factor the interval grows by after each poll without streams
+    :param jitter: the delays are randomly spread by +- this fraction
+    :param max_polls: a channel is given up after this many polls without streams, 0 never gives up
+    :param concurrency: max number of extractions running at the same time
+    """
+
+    def __init__(self, fetch, http=None, interval=10.0, max_interval=None, backoff=1.5,
+                 jitter=0.1, max_polls=0, concurrency=8):
+        self.fetch = fetch
+        self.http = http
+        self.interval = interval
+        self.max_interval = max(interval, max_interval or interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_polls = max_polls
+        self.concurrency = concurrency
+
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.loop = None
+        self.thread = None
+        self._queue = []  # heap of (due time, seq, Watch)
+        self._polling = set()  # the Watches whose poll is running
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._ready = threading.Event()
+        self._stopped = False
+        self.stats = dict(watching=0, polls=0, errors=0, found=0, gave_up=0, wait_time=0.0)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run_loop, name="StreamWatcher")
+        self.thread.daemon = True
+        self.thread.start()
+        self._ready.wait()
+        return self
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._wakeup = asyncio.Event()
+        self._ready.set()
+        try:
+            self.loop.run_until_complete(self._schedule())
+            # the polls still running when stopped, their futures are cancelled by stop()
+            polls = asyncio.all_tasks(self.loop)
+            for task in polls:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*polls, return_exceptions=True))
+        finally:
+            self.loop.close()
+
+    def watch(self, plugin, callback=None):
+        """
+        Starts polling plugin (from any thread), the first poll runs right away
+
+        :param callback: ``callback(plugin, streams)``, called in the watcher's thread when streams
+                         were found, or with None when the plugin was given up
+        :return: a concurrent.futures.Future of the streams (None when given up, the FatalPluginError
+                 or unexpected error when the plugin failed for good, cancelled by stop())
+        """
+        watch = Watch(plugin, callback, self.interval)
+        watch.future.add_done_callback(lambda f: self._cancelled(watch) if f.cancelled() else None)
+        self.loop.call_soon_threadsafe(self._push, watch, 0)
+        return watch.future
+
+    def _cancelled(self, watch):
+        watch.cancelled = True
+
+    def _push(self, watch, delay):
+        if delay:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        heapq.heappush(self._queue, (self.loop.time() + delay, next(self._seq), watch))
+        self.stats["watching"] = len(self._queue)
+        self._wakeup.set()
+
+    async def _schedule(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while not self._stopped:
+            self._wakeup.clear()
+            if not self._queue:
+                await self._wakeup.wait()
+                continue
+
+            due = self._queue[0][0] - self.loop.time()
+            if due > 0:
+                # sleeps until the next poll is due, or a new watch was pushed
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), due)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, watch = heapq.heappop(self._queue)
+            self.stats["watching"] = len(self._queue)
+            if watch.cancelled:
+                continue
+            await semaphore.acquire()
+            task = self.loop.create_task(self._poll(watch))
+            task.add_done_callback(lambda _: semaphore.release())
+
+    def _fetch(self, plugin):
+        if self.http is not None and hasattr(self.http, "conditional_requests"):
+            with self.http.conditional_requests():
+                return self.fetch(plugin)
+        return self.fetch(plugin)
+
+    async def _poll(self, watch):
+        watch.polls += 1
+        self.stats["polls"] += 1
+        self._polling.add(watch)
+        try:
+            streams = await self.loop.run_in_executor(self.executor, self._fetch, watch.plugin)
+        except FatalPluginError as err:
+            self.stats["errors"] += 1
+            log.error(u"{0}".format(err))
+            self._failed(watch, err)
+            return
+        except PluginError as err:
+            watch.errors += 1
+            self.stats["errors"] += 1
+            log.error(u"{0}".format(err))
+            streams = None
+        except Exception as err:
+            # a bug in the plugin, polling it again won't help
+            self.stats["errors"] += 1
+            log.error(u"Failed to fetch the streams of {0}: {1}".format(watch.name, err))
+            self._failed(watch, err)
+            return
+        finally:
+            self._polling.discard(watch)
+
+        # cancelled, or stop() was called while polling
+        if watch.future.done():
+            return
+
+        if streams:
+            self.stats["found"] += 1
+            self.stats["wait_time"] += time.time() - watch.added
+            self._done(watch, streams)
+            return
+
+        if watch.polls == 1:
+            log.info("Waiting for streams of {0}, retrying every {1} second(s)".format(watch.name, self.interval))
+
+        if self.max_polls and watch.polls >= self.max_polls:
+            self.stats["gave_up"] += 1
+            self._done(watch, None)
+            return
+
+        delay = watch.interval
+        watch.interval = min(self.max_interval, watch.interval * self.backoff)
+        self._push(watch, delay)
+
+    def _failed(self, watch, err):
+        if not watch.future.done():
+            watch.future.set_exception(err)
+
+    def _done(self, watch, streams):
+        if watch.callback:
+            try:
+                watch.callback(watch.plugin, streams)
+            except Exception:
+                log.exception("Stream watcher callback failed")
+        if not watch.future.done():
+            watch.future.set_result(streams)
+
+    def stop(self):
+        """Stops polling, the futures of the channels still watched (polling or not) are cancelled"""
+        if self.loop is None or self._stopped:
+            return
+
+        def stop():
+            self._stopped = True
+            for _, _, watch in self._queue:
+                watch.future.cancel()
+            del self._queue[:]
+            # their polls are cancelled once the loop has stopped, the results dropped
+            for watch in self._polling:
+                watch.future.cancel()
+            self._wakeup.set()
+
+        self.loop.call_soon_threadsafe(stop)
+        self.thread.join(5)
+        self.executor.shutdown(wait=False)
+
+
+__all__ = ["StreamWatcher"]
@@ -0,0 +1,55 @@
+import unittest
+
+from streamlink.plugin.api.validate import (
+    all, any, compile_schema, get, length, optional, text, transform, union, validate
+)
+
+
+def outcome(func, value):
+    try:
+        return "ok", func(value)
+    except ValueError as err:
+        return "error", str(err)
+
+
+class TestCompiledSchema(unittest.TestCase):
+    # (schema, values), every value is checked by validate() and by the compiled schema
+    cases = [
+        ({"foo": int, optional("bar"): text}, [
+            {"foo": 1}, {"foo": 1, "bar": "b"}, {"foo": 1, "bar": 2}, {"bar": "b"}, [], None,
+        ]),
+        ({text: int}, [{}, {"a": 1, "b": 2}, {"a": "1"}, {1: 1}]),
+        ({"foo": int, text: transform(str)}, [{"foo": 1, "bar": 2}, {"foo": "1"}, {"bar": 2}]),
+        # validate() skips an optional wildcard it can't find and goes on with the next keys
+        ({optional(text): int, "foo": int}, [{"foo": 1}, {"foo": 1, "bar": "b"}, {"bar": 2}, {}]),
+        ({optional(text): int, "foo": int, optional("bar"): text}, [
+            {"foo": 1, "bar": "b"}, {"foo": 1, "bar": 2}, {"foo": "1"},
+        ]),
+        ({optional(any(text, int)): int, int: transform(str)}, [{1: 1, 2: 2}, {"a": 1}, {}]),
+        # keys after a wildcard that applies are never looked at
+        ({text: int, "foo": text}, [{"foo": 1}, {"foo": "1"}, {}]),
+        ({"foo": [int], optional("bar"): {text: any(int, None)}}, [
+            {"foo": [1, 2]}, {"foo": [1, "2"]}, {"foo": [], "bar": {"a": None, "b": 1}},
+            {"foo": [], "bar": {"a": "b"}},
+        ]),
+        (all({"data": {"items": [{"id": int}]}}, get("data"), get("items"), length(1)), [
+            {"data": {"items": [{"id": 1}]}}, {"data": {"items": []}}, {"data": {"items": [{"id": "1"}]}},
+        ]),
+        (union({"a": int, optional("b"): transform(int)}), ["1", 1]),
+    ]
+
+    def test_compiled_equals_interpreted(self):
+        for schema, values in self.cases:
+            check = compile_schema(schema)
+            for value in values:
+                self.assertEqual(outcome(check, value), outcome(lambda v: validate(schema, v), value),
+                                 "{0!r} with {1!r}".format(schema, value))
+
+    def test_optional_wildcard(self):
+        schema = {optional(text): int, "foo": transform(int)}
+        self.assertEqual(compile_schema(schema)({"foo": "1", "bar": "x"}), {"foo": 1})
+        self.assertEqual(validate(schema, {"foo": "1", "bar": "x"}), {"foo": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
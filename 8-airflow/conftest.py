@@ -0,0 +1,161 @@
+import io
+import threading
+from http.client import responses
+
+import pytest
+import requests
+
+
+class FakePgCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.connection = conn
+        self.rowcount = -1
+        self.rows = []
+
+    def execute(self, sql, parameters=None):
+        self.conn.executed.append((sql, parameters))
+        self.rows = self.conn.answer(sql)
+        self.conn.pending.append(sql)
+        if self.conn.autocommit:
+            self.conn.commit()
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def copy_expert(self, sql, file, size=8192):
+        self.conn.executed.append((sql, None))
+        self.conn.pending.append(sql)
+        if ' TO STDOUT' in sql:
+            file.write(b''.join(self.conn.answer(sql)))
+            return
+        data = b''.join(iter(lambda: file.read(size), b''))
+        self.conn.copied.append(data)
+
+    def close(self):
+        pass
+
+
+class FakePgConnection:
+    """
+    Just enough of a psycopg2 connection: statements are only kept once committed
+    Queries return the rows of the first of results' (sql fragment, rows) pairs found in them
+    """
+    def __init__(self, results=(), server_version=160000):
+        self.autocommit = False
+        self.closed = 0
+        self.server_version = server_version
+        self.results = results
+        self.executed = []
+        self.pending = []
+        self.committed = []
+        self.copied = []
+
+    def answer(self, sql):
+        for fragment, rows in self.results:
+            if fragment in sql:
+                return rows
+        return []
+
+    def cursor(self, name=None):
+        return FakePgCursor(self)
+
+    def commit(self):
+        self.committed += self.pending
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def reset(self):
+        self.rollback()
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePgConnections(list):
+    """
+    The connections made so far, new ones get results and server_version
+    """
+    def __init__(self):
+        super().__init__()
+        self.results = []
+        self.server_version = 160000
+
+
+@pytest.fixture
+def pg_connections(monkeypatch):
+    """
+    The fake connections psycopg2.connect hands out to the hooks, in the order they were made
+    """
+    import hooks
+
+    connections = FakePgConnections()
+    lock = threading.Lock()
+
+    def connect(**conn_args):
+        with lock:
+            connections.append(FakePgConnection(connections.results, connections.server_version))
+            return connections[-1]
+
+    monkeypatch.setattr(hooks.psycopg2, 'connect', connect)
+    monkeypatch.setattr(hooks, '_connection_pools', {})
+    return connections
+
+
+class FakeHttpSession(requests.Session):
+    """
+    A requests session answering from a handler instead of the network
+    handler(prepared_request) returns (status, headers, body)
+    """
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        status, headers, body = self.handler(request)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = responses.get(status, '')
+        response.headers.update(headers)
+        response._content = body
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class FakeHttpSessions(list):
+    """
+    The sessions the hooks opened, in order, all answering with handler
+    """
+    def __init__(self):
+        super().__init__()
+        self.handler = lambda request: (200, {}, b'{}')
+
+    def open(self):
+        self.append(FakeHttpSession(lambda request: self.handler(request)))
+        return self[-1]
+
+
+@pytest.fixture
+def http_sessions(monkeypatch):
+    """
+    The fake sessions requests.Session hands out to the HttpHooks, their connections point at https://api
+    """
+    import hooks
+    from airflow.models import Connection
+
+    sessions = FakeHttpSessions()
+    monkeypatch.setattr(hooks.requests, 'Session', sessions.open)
+    monkeypatch.setattr(hooks.HttpHook, 'get_connection',
+                        lambda self, conn_id: Connection(conn_id=conn_id, host='api', schema='https'))
+    monkeypatch.setattr(hooks.HttpHook, '_session_pool', {})
+    monkeypatch.setattr(hooks.HttpHook, '_circuit_breakers', {})
+    return sessions
@@ -1,3 +1,339 @@
+##################################################
+#  Hook instrumentation
+##################################################
+# not an airflow module - a thin layer used by the hooks below to record what every
+# call to an external system costs (latency, bytes, retries, errors), per hook / connection / operation
+
+import bisect
+import functools
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# upper bounds (seconds) of the latency histogram buckets - prometheus' defaults plus a couple of slow ones
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, float('inf'))
+
+
+class HookCall(object):
+    """
+    A single hook call in progress
+    The instrumented wrapper fills in the time, the hook method adds what only it knows (e.g. streamed bytes)
+    """
+    __slots__ = ('bytes_sent', 'bytes_received', 'items', 'retries', 'elapsed')
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.items = 0
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def count_sent(self, chunks):
+        """
+        Passes an iterator of bytes chunks through, adding their size to bytes_sent
+        """
+        for chunk in chunks:
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+
+class OperationStats(object):
+    """
+    Aggregated stats of one (hook, conn_id, operation)
+    Calls made from inside another instrumented call (e.g. the check_for_key in load_file)
+    are counted, but their time is left out of outer_time so hook totals don't count it twice
+    """
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.items = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_time = 0.0
+        self.outer_time = 0.0
+        self.outer_calls = 0
+        self.max_time = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, call, failed, nested):
+        self.calls += 1
+        self.errors += bool(failed)
+        self.retries += call.retries
+        self.items += call.items
+        self.bytes_sent += call.bytes_sent
+        self.bytes_received += call.bytes_received
+        self.total_time += call.elapsed
+        if not nested:
+            self.outer_time += call.elapsed
+            self.outer_calls += 1
+        self.max_time = max(self.max_time, call.elapsed)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, call.elapsed)] += 1
+
+    def percentile(self, q):
+        """
+        Estimates the q-th (0 - 1) latency percentile as the upper bound of the bucket it falls in
+        """
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max_time)
+        return self.max_time
+
+    def as_dict(self):
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            retries=self.retries,
+            items=self.items,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            total_time=round(self.total_time, 6),
+            mean_time=round(self.total_time / self.calls, 6) if self.calls else 0.0,
+            p50_time=round(self.percentile(0.5), 6),
+            p95_time=round(self.percentile(0.95), 6),
+            p99_time=round(self.percentile(0.99), 6),
+            max_time=round(self.max_time, 6),
+            # non cumulative counts, keyed by bucket upper bound
+            histogram={('+Inf' if bound == float('inf') else str(bound)): count
+                       for bound, count in zip(LATENCY_BUCKETS, self.buckets) if count})
+
+
+def _hook_conn_id(hook):
+    # DbApiHook subclasses name their conn id attribute in conn_name_attr
+    for attr in (getattr(hook, 'conn_name_attr', None), 'aws_conn_id', 'http_conn_id'):
+        if attr and getattr(hook, attr, None):
+            return getattr(hook, attr)
+    return None
+
+
+class HookMetrics(object):
+    """
+    Thread safe registry of OperationStats keyed by (hook, conn_id, operation)
+
+    hook_metrics below collects every instrumented call made in the process.
+    collect() registers a second, empty registry that only sees the calls made while
+    it is active - e.g. one task's execute() - and logs / writes it out at the end.
+    Stats are per process: calls made in a process pool's workers are not included.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._collectors = []
+        # calls in progress in the current thread, innermost last
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_call(self):
+        """
+        Returns the innermost HookCall in progress in this thread, None outside of instrumented calls
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def record(self, hook, operation, call, failed=False, nested=False):
+        key = (type(hook).__name__, _hook_conn_id(hook), operation)
+        with self._lock:
+            for registry in [self] + self._collectors:
+                stats = registry._stats.get(key)
+                if stats is None:
+                    stats = registry._stats[key] = OperationStats()
+                stats.add(call, failed, nested)
+
+    @contextmanager
+    def call(self, hook, operation):
+        """
+        Times the block as one call of operation on hook, yielding its HookCall
+        """
+        stack = self._stack()
+        nested = bool(stack)
+        call = HookCall()
+        stack.append(call)
+        failed = False
+        start = time.monotonic()
+        try:
+            yield call
+        except Exception:
+            failed = True
+            raise
+        finally:
+            call.elapsed = time.monotonic() - start
+            stack.pop()
+            self.record(hook, operation, call, failed, nested)
+
+    def iter_call(self, hook, operation, iterator, received=None, items=None):
+        """
+        Yields from iterator as one call of operation on hook
+        Only the time spent producing items is counted, not the time the caller spends on them,
+        and a caller stopping early is not an error
+        """
+        stack = self._stack()
+        nested = None
+        call = HookCall()
+        failed = False
+        try:
+            while True:
+                if nested is None:
+                    nested = bool(stack)
+                stack.append(call)
+                start = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    call.elapsed += time.monotonic() - start
+                    stack.pop()
+                call.items += items(item) if items else 1
+                if received:
+                    call.bytes_received += received(item)
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+            if nested is not None:
+                self.record(hook, operation, call, failed, nested)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self):
+        """
+        Returns one dict per (hook, conn_id, operation), the most time consuming first
+        """
+        with self._lock:
+            rows = [dict(hook=hook, conn_id=conn_id, operation=operation, **stats.as_dict())
+                    for (hook, conn_id, operation), stats in self._stats.items()]
+        return sorted(rows, key=lambda row: row['total_time'], reverse=True)
+
+    def hook_totals(self):
+        """
+        Returns one dict per (hook, conn_id), the most time consuming first
+        Time and calls only count outermost calls, bytes are only measured where they are known
+        """
+        totals = {}
+        with self._lock:
+            for (hook, conn_id, _), stats in self._stats.items():
+                total = totals.setdefault((hook, conn_id), dict(
+                    hook=hook, conn_id=conn_id, calls=0, errors=0, retries=0,
+                    bytes_sent=0, bytes_received=0, total_time=0.0))
+                total['calls'] += stats.outer_calls
+                total['errors'] += stats.errors
+                total['retries'] += stats.retries
+                total['bytes_sent'] += stats.bytes_sent
+                total['bytes_received'] += stats.bytes_received
+                total['total_time'] += stats.outer_time
+        for total in totals.values():
+            total['total_time'] = round(total['total_time'], 6)
+        return sorted(totals.values(), key=lambda total: total['total_time'], reverse=True)
+
+    def as_dict(self):
+        return dict(pid=os.getpid(),
+                    hostname=socket.gethostname(),
+                    generated_at=time.time(),
+                    hooks=self.hook_totals(),
+                    operations=self.summary())
+
+    def dump(self, path):
+        """
+        Writes the stats to path as json (atomically, so a reader never sees half a file)
+        """
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w') as file:
+            json.dump(self.as_dict(), file, indent=2)
+        os.replace(tmp_path, path)
+
+    def log_summary(self, log):
+        for total in self.hook_totals():
+            log.info("%s (%s): %d calls in %.3fs, %d errors, %d retries, %d bytes sent, %d bytes received",
+                     total['hook'], total['conn_id'], total['calls'], total['total_time'],
+                     total['errors'], total['retries'], total['bytes_sent'], total['bytes_received'])
+        for row in self.summary():
+            log.info("  %s.%s (%s): %d calls, %.3fs total, p50 %.3fs, p95 %.3fs, max %.3fs",
+                     row['hook'], row['operation'], row['conn_id'], row['calls'], row['total_time'],
+                     row['p50_time'], row['p95_time'], row['max_time'])
+
+    @contextmanager
+    def collect(self, path=None, log=None):
+        """
+        Collects the hook calls made inside the block, e.g. around a task's execute()
+        (BatchPythonOperator and S3ToRedshiftTransfer do, their metrics_path gets the json file)
+        :param path: write the collected stats there as json on exit
+        :param log: logger the summary is written to on exit
+        Yields the collecting HookMetrics
+        """
+        collector = HookMetrics()
+        with self._lock:
+            self._collectors.append(collector)
+        try:
+            yield collector
+        finally:
+            with self._lock:
+                self._collectors.remove(collector)
+            if log is not None:
+                collector.log_summary(log)
+            if path:
+                collector.dump(path)
+
+
+hook_metrics = HookMetrics()
+
+
+def current_hook_call():
+    """
+    Returns the HookCall in progress in this thread (None if there is none), see HookMetrics.current_call
+    """
+    return hook_metrics.current_call()
+
+
+def instrumented(operation=None, sent=None, received=None, items=None):
+    """
+    Decorator recording every call of a hook method in hook_metrics
+    Goes above @provide_bucket_name and the like, generator methods are timed item by item
+
+    :param operation: name of the operation, defaults to the method name
+    :param sent: fn(self, *args, **kwargs) -> bytes sent, worked out from the arguments
+    :param received: fn(result) -> bytes received, for generators fn(item) for every item
+    :param items: fn(result) -> number of items (rows, keys ...), generators count each item as 1 by default
+    """
+    def decorator(func):
+        name = operation or func.__name__
+        is_generator = inspect.isgeneratorfunction(inspect.unwrap(func))
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if is_generator:
+                return hook_metrics.iter_call(self, name, func(self, *args, **kwargs),
+                                              received=received, items=items)
+            with hook_metrics.call(self, name) as call:
+                if sent:
+                    call.bytes_sent += sent(self, *args, **kwargs)
+                result = func(self, *args, **kwargs)
+                if received:
+                    call.bytes_received += received(result)
+                if items:
+                    call.items += items(result)
+                return result
+        return wrapper
+    return decorator
+
+
 ##################################################
 #  AWS Hooks 
 ##################################################
@@ -6,6 +342,13 @@
 '''
 base AWS hook
 '''
+
+import boto3
+
+from airflow.exceptions import AirflowException
+from airflow.hooks.base_hook import BaseHook
+
+
 def _parse_s3_config(config_file_name, config_format='boto', profile=None):
     """
     parses a config file for s3 credentials 
@@ -21,6 +364,7 @@ class AwsHook(BaseHook):
         self.aws_conn_id = aws_conn_id
         self.verify = verify
     
+    @instrumented('credentials')
     def _get_credentials(self, region_name):
         # return a boto3 session iwth access key and region name
         # input is from the info from the connection 
@@ -48,7 +392,7 @@ class AwsHook(BaseHook):
                     aws_access_key_id, aws_secret_access_key = \
                         _parse_s3_config(
                             extra_config['s3_config_file'],
-                            extra_config.get('s3_config_format')
+                            extra_config.get('s3_config_format'),
                             extra_config.get('profile'))
                 
                 if region_name is None:
@@ -56,7 +400,7 @@ class AwsHook(BaseHook):
                 
                 role_arn = extra_config.get('role_arn')
                 external_id = extra_config.get('external_id')
-                aws_account_id = extra_config.geet('aws_account_id')
+                aws_account_id = extra_config.get('aws_account_id')
                 aws_iam_role = extra_config.get('aws_iam_role')
                 
                 if 'aws_session_token' in extra_config and aws_session_token is None:
@@ -103,7 +447,7 @@ class AwsHook(BaseHook):
         
         return boto3.session.Session(
             aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
             aws_session_token=aws_session_token,
             region_name=region_name), endpoint_url
     
@@ -146,12 +490,340 @@ class AwsHook(BaseHook):
 ##################################################
 # https://github.com/apache/airflow/blob/master/airflow/hooks/http_hook.py
 
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+
 import requests
 import tenacity
+from requests.adapters import HTTPAdapter
+
+# ijson is only needed for paginate(stream=True)
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from airflow.exceptions import AirflowException
 from airflow.hooks.base_hook import BaseHook 
 
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header, which is either a number of seconds or an http date
+    Returns the number of seconds to wait, or None if there is no usable value
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast once a base_url has failed failure_threshold times in a row
+
+    After reset_timeout seconds one trial call is let through (half open),
+    a success closes the circuit again, a failure keeps it open for another reset_timeout
+    """
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise AirflowException('Circuit open for {}: {} consecutive failures'
+                                       .format(self.name, self.failures))
+            # half open - this caller is the trial, everyone else keeps failing fast
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class HttpRetryPolicy(object):
+    """
+    Retry rules for HttpHook, turned into a tenacity.Retrying object per request
+
+    :param max_attempts: max number of attempts (including the first one)
+    :type max_attempts: int
+    :param retry_statuses: status codes to retry, or a dict of status code -> max attempts for that status
+    :type retry_statuses: tuple or dict
+    :param backoff: base delay in seconds, doubled after every attempt
+    :type backoff: float
+    :param max_backoff: cap on a single delay
+    :type max_backoff: float
+    :param deadline: max total seconds across all attempts, None for no limit
+    :type deadline: float
+    :param respect_retry_after: wait as long as the server's Retry-After header asks
+    :type respect_retry_after: bool
+    :param failure_threshold: consecutive failures before the circuit for a base_url opens
+    :type failure_threshold: int
+    :param reset_timeout: seconds an open circuit fails fast before a trial call
+    :type reset_timeout: float
+
+    The hooks of a base_url share one circuit per failure_threshold / reset_timeout pair.
+    """
+    def __init__(self,
+                 max_attempts=5,
+                 retry_statuses=(429, 500, 502, 503, 504),
+                 backoff=1.0,
+                 max_backoff=60.0,
+                 deadline=None,
+                 respect_retry_after=True,
+                 failure_threshold=5,
+                 reset_timeout=30.0):
+        self.max_attempts = max_attempts
+        self.retry_statuses = retry_statuses
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.respect_retry_after = respect_retry_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    def is_retryable_status(self, status_code):
+        return status_code in self.retry_statuses
+
+    @staticmethod
+    def _response(retry_state):
+        if retry_state.outcome.failed:
+            return None
+        return retry_state.outcome.result()
+
+    def _retry_after(self, retry_state):
+        response = self._response(retry_state)
+        if not self.respect_retry_after or response is None:
+            return None
+        return parse_retry_after(response.headers.get('Retry-After'))
+
+    # the three callables below follow tenacity's retry / wait / stop signature
+
+    def retry(self, retry_state):
+        if retry_state.outcome.failed:
+            return isinstance(retry_state.outcome.exception(),
+                              (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        return self.is_retryable_status(retry_state.outcome.result().status_code)
+
+    def wait(self, retry_state):
+        retry_after = self._retry_after(retry_state)
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            # full jitter - parallel tasks spread their retries out instead of coming back all at once
+            delay = random.uniform(0, min(self.max_backoff,
+                                          self.backoff * 2 ** (retry_state.attempt_number - 1)))
+        if self.deadline is not None:
+            delay = min(delay, max(0.0, self.deadline - retry_state.seconds_since_start))
+        return delay
+
+    def stop(self, retry_state):
+        max_attempts = self.max_attempts
+        response = self._response(retry_state)
+        if response is not None and isinstance(self.retry_statuses, dict):
+            max_attempts = self.retry_statuses.get(response.status_code, max_attempts)
+        if retry_state.attempt_number >= max_attempts:
+            return True
+
+        if self.deadline is None:
+            return False
+        remaining = self.deadline - retry_state.seconds_since_start
+        # no point sleeping if the server already told us it won't be ready before the deadline
+        retry_after = self._retry_after(retry_state)
+        return remaining <= 0 or (retry_after is not None and retry_after > remaining)
+
+    def retrying(self, before_sleep=None):
+        return tenacity.Retrying(
+            retry=self.retry,
+            wait=self.wait,
+            stop=self.stop,
+            before_sleep=before_sleep,
+            # once out of attempts hand back the last response (or re-raise the last error)
+            # so check_response turns it into the usual AirflowException
+            retry_error_callback=lambda retry_state: retry_state.outcome.result())
+
+# pagination strategies for HttpHook.paginate
+
+def _dig(obj, path):
+    """
+    Gets a value out of nested dicts with a dotted path, 'meta.next_cursor' -> obj['meta']['next_cursor']
+    """
+    if not path:
+        return obj
+    for key in path.split('.'):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def iter_json_items(fileobj, items_path, values):
+    """
+    Decodes a JSON body incrementally (ijson), yielding each element of the array at items_path
+    Scalars found at the paths already in `values` (e.g. the next cursor) are filled in as they go by,
+    so only one item is in memory at a time
+    """
+    # ijson prefixes use the same dotted paths, array elements are called 'item'
+    item_prefix = items_path + '.item' if items_path else 'item'
+    builder = None
+    depth = 0
+
+    for prefix, event, value in ijson.parse(fileobj):
+        if builder is None and prefix == item_prefix:
+            if event not in ('start_map', 'start_array'):
+                yield value  # an array of scalars
+                continue
+            builder = ijson.ObjectBuilder()
+            depth = 0
+
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+                if depth == 0:
+                    yield builder.value
+                    builder = None
+        elif prefix in values:
+            values[prefix] = value
+
+
+class PaginationStrategy(object):
+    """
+    Works out the request for the next page from the current one
+
+    next_page gets the (endpoint, data) of the current request, its response,
+    the body values listed in body_paths and the number of items on the page,
+    and returns the (endpoint, data) of the next page or None when there are no more pages.
+    Strategies with from_headers = True only look at the response headers,
+    so the next page can be requested before the current body is even read.
+    """
+    body_paths = ()
+    from_headers = False
+
+    def first_page(self, data):
+        return data
+
+    def next_page(self, request, response, values, num_items):
+        raise NotImplementedError
+
+
+class OffsetPagination(PaginationStrategy):
+    """
+    ?offset=0&limit=100, ?offset=100&limit=100 ... until a page comes back short
+    """
+    def __init__(self, limit=100, offset_param='offset', limit_param='limit'):
+        self.limit = limit
+        self.offset_param = offset_param
+        self.limit_param = limit_param
+
+    def first_page(self, data):
+        data = dict(data or {})
+        data.setdefault(self.offset_param, 0)
+        data[self.limit_param] = self.limit
+        return data
+
+    def next_page(self, request, response, values, num_items):
+        endpoint, data = request
+        if num_items < self.limit:
+            return None
+        data = dict(data)
+        data[self.offset_param] += num_items
+        return endpoint, data
+
+
+class CursorPagination(PaginationStrategy):
+    """
+    The body carries an opaque cursor which is sent back as a parameter for the next page
+    """
+    def __init__(self, cursor_path='next_cursor', cursor_param='cursor'):
+        self.cursor_path = cursor_path
+        self.cursor_param = cursor_param
+        self.body_paths = (cursor_path,)
+
+    def next_page(self, request, response, values, num_items):
+        endpoint, data = request
+        cursor = values.get(self.cursor_path)
+        if not cursor:
+            return None
+        data = dict(data or {})
+        data[self.cursor_param] = cursor
+        return endpoint, data
+
+
+class LinkHeaderPagination(PaginationStrategy):
+    """
+    RFC 5988 Link header, e.g. Link: <https://api.github.com/...?page=2>; rel="next"
+    """
+    from_headers = True
+
+    def __init__(self, rel='next'):
+        self.rel = rel
+
+    def next_page(self, request, response, values, num_items):
+        # requests already parses the Link header into response.links
+        link = response.links.get(self.rel)
+        if not link:
+            return None
+        return urljoin(response.url, link['url']), None
+
+
+class NextUrlPagination(PaginationStrategy):
+    """
+    The body carries the full url of the next page, e.g. {"next": "https://...", "results": [...]}
+    """
+    def __init__(self, next_path='next'):
+        self.next_path = next_path
+        self.body_paths = (next_path,)
+
+    def next_page(self, request, response, values, num_items):
+        next_url = values.get(self.next_path)
+        if not next_url:
+            return None
+        return urljoin(response.url, next_url), None
+
+
+def _response_size(response):
+    # streamed bodies aren't read yet, so prefer what the server announced
+    length = response.headers.get('Content-Length')
+    if length is not None and length.isdigit():
+        return int(length)
+    if getattr(response, '_content_consumed', False):
+        return len(response.content or b'')
+    return 0
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
 class HttpHook(BaseHook):
     """
     Interact with HTTP servers
@@ -161,17 +833,43 @@ class HttpHook(BaseHook):
     :type http_conn_id: str
     :param method: the API method to be called 
     :type method: str
+    :param pool_connections: number of host pools to cache in the pooled session
+    :type pool_connections: int
+    :param pool_maxsize: max connections kept alive per host, should be >= run_many max_workers
+    :type pool_maxsize: int
+    :param keep_alive: reuse connections between requests
+    :type keep_alive: bool
+    :param retry_policy: how to retry failed requests, None to send each request once
+    :type retry_policy: HttpRetryPolicy
     """
 
+    # pooled sessions are shared by every HttpHook in the process
+    # keyed by connection id + pool config, value is (session, base_url)
+    _session_pool = {}
+    _session_pool_lock = threading.Lock()
+
+    # circuit breakers are per base_url, so every task hitting a down API fails fast together
+    # keyed by base_url + breaker settings, hooks with other thresholds keep their own breaker
+    _circuit_breakers = {}
+    _circuit_breakers_lock = threading.Lock()
+
     def __init__(
         self,
         method='POST',
-        http_conn_id='http_default'
+        http_conn_id='http_default',
+        pool_connections=10,
+        pool_maxsize=10,
+        keep_alive=True,
+        retry_policy=None
     ):
         self.http_conn_id = http_conn_id
         self.method = method.upper()
         self.base_url = None 
         self._retry_obj = None 
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.retry_policy = retry_policy
     
     # headers maybe passed through directly or in the "extra" field
     def get_conn(self, headers=None):
@@ -209,6 +907,41 @@ class HttpHook(BaseHook):
             
             return session 
 
+    def get_pooled_conn(self):
+        """
+        Returns the pooled http session for this connection, creating it on first use
+        The connection lookup and the header merge happen once per process instead of once per request.
+        Per-request headers are passed on the request itself, never merged into the shared session.
+        """
+        pool_key = (self.http_conn_id, self.pool_connections, self.pool_maxsize, self.keep_alive)
+
+        with self._session_pool_lock:
+            pooled = self._session_pool.get(pool_key)
+            if pooled is None:
+                session = self.get_conn()
+                # the default adapter keeps 10 connections per host, size it for the concurrency we expect
+                adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                      pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                if not self.keep_alive:
+                    session.headers['Connection'] = 'close'
+                pooled = self._session_pool[pool_key] = (session, self.base_url)
+
+        session, self.base_url = pooled
+        return session
+
+    @classmethod
+    def close_pooled_conns(cls):
+        """
+        Closes every pooled session (and their kept alive connections)
+        """
+        with cls._session_pool_lock:
+            for session, _ in cls._session_pool.values():
+                session.close()
+            cls._session_pool.clear()
+
+    @instrumented(received=_response_size)
     def run(self, endpoint, data=None, headers=None, extra_options=None):
         """
         Performs the request 
@@ -219,24 +952,28 @@ class HttpHook(BaseHook):
         """
         extra_options = extra_options or {}
 
-        session = self.get_conn(headers)
+        # headers are added to the request below, so the shared session is left untouched
+        session = self.get_pooled_conn()
 
         # construct request url from base url and endpoint
-        if self.base_url and not self.base_url.endswith('/') and 
-           endpoint and not endpoint.startwith('/'):
+        # absolute urls (e.g. next page links) are used as they are
+        if endpoint and endpoint.startswith(('http://', 'https://')):
+            url = endpoint
+        elif self.base_url and not self.base_url.endswith('/') and \
+                endpoint and not endpoint.startswith('/'):
             url = self.base_url + '/' + endpoint 
         else:
             url = (self.base_url or '') + (endpoint or '')
 
         # construct request object based on the method, url and other inputs
         req = None 
-        if self.method = 'GET':
+        if self.method == 'GET':
             # get uses params 
             req = requests.Request(self.method, 
                                    url,
                                    params=data,
                                    headers=headers)
-        elif self.method = 'HEAD':
+        elif self.method == 'HEAD':
             # HEAD doesn't use params 
             req = requests.Request(self.method,
                                   url,
@@ -249,9 +986,111 @@ class HttpHook(BaseHook):
                                    headers=headers)
         # session prepare_request https://requests.readthedocs.io/en/master/user/advanced/
         prepped_request = session.prepare_request(req)
+        call = current_hook_call()
+        if call is not None and prepped_request.body:
+            call.bytes_sent += len(prepped_request.body)
         self.log.info("sending '%s' to url: %s", self.method, url)
         return self.run_and_check(session, prepped_request, extra_options)
 
+    def paginate(self, endpoint, strategy, data=None, headers=None, extra_options=None,
+                 items_path=None, stream=False, prefetch=True, max_pages=None):
+        """
+        Yields the items of every page of a paginated API, one item at a time
+        :param endpoint: the endpoint of the first page
+        :param strategy: a PaginationStrategy, e.g. CursorPagination()
+        :param data: parameters of the first page
+        :param items_path: dotted path of the items array in the body, None if the body is the array
+        :param stream: decode the body incrementally (needs ijson) instead of loading the whole page
+        :param prefetch: request the next page while the caller is still processing the current one
+        :param max_pages: stop after this many pages
+        With stream=True body based strategies only know the next page once the body is read,
+        so only header based ones (LinkHeaderPagination) prefetch while items are still being decoded.
+        """
+        if stream and ijson is None:
+            raise AirflowException('paginate(stream=True) requires the ijson package')
+
+        extra_options = dict(extra_options or {})
+        extra_options['stream'] = stream
+
+        def fetch(request):
+            page_endpoint, page_data = request
+            return self.run(page_endpoint, data=page_data, headers=headers, extra_options=extra_options)
+
+        # a single worker thread is enough - only one page is ever fetched ahead
+        executor = ThreadPoolExecutor(max_workers=1)
+        request = (endpoint, strategy.first_page(data))
+        pending = executor.submit(fetch, request)
+        pages = 0
+
+        try:
+            while pending is not None:
+                response = pending.result()
+                pending = None
+                pages += 1
+                more_pages = max_pages is None or pages < max_pages
+                next_request = None
+
+                if strategy.from_headers and more_pages:
+                    next_request = strategy.next_page(request, response, {}, None)
+                    if next_request and prefetch:
+                        pending = executor.submit(fetch, next_request)
+
+                values = dict.fromkeys(strategy.body_paths)
+                if stream:
+                    num_items = 0
+                    # raw is the undecoded socket stream, have urllib3 undo any gzip / deflate
+                    response.raw.decode_content = True
+                    for item in iter_json_items(response.raw, items_path, values):
+                        num_items += 1
+                        yield item
+                    response.close()
+                    if not strategy.from_headers and more_pages:
+                        next_request = strategy.next_page(request, response, values, num_items)
+                else:
+                    page = response.json()
+                    items = _dig(page, items_path) or []
+                    values = {path: _dig(page, path) for path in strategy.body_paths}
+                    if not strategy.from_headers and more_pages:
+                        next_request = strategy.next_page(request, response, values, len(items))
+                        if next_request and prefetch:
+                            pending = executor.submit(fetch, next_request)
+                    # the caller works through this page while the next one downloads
+                    yield from items
+
+                if next_request and pending is None:
+                    pending = executor.submit(fetch, next_request)
+                request = next_request
+        finally:
+            # the caller stopped early - don't leave a prefetched response holding a pooled connection
+            if pending is not None and not pending.cancel():
+                pending.add_done_callback(_close_response)
+            executor.shutdown(wait=False)
+
+    def run_many(self, calls, headers=None, extra_options=None, max_workers=8):
+        """
+        Performs a batch of requests concurrently over the pooled session
+        :param calls: iterable of (endpoint, data) pairs
+        :param headers: additional headers sent with every request
+        :param extra_options: additional options used for every request
+        :param max_workers: max number of requests in flight at once
+        Returns the responses in the same order as calls
+        """
+        if max_workers > self.pool_maxsize:
+            # extra connections would be opened and thrown away after each request
+            self.log.warning('run_many max_workers (%s) is larger than pool_maxsize (%s)',
+                             max_workers, self.pool_maxsize)
+
+        # create the pooled session up front rather than have every worker race for the lock
+        self.get_pooled_conn()
+
+        def run_one(call):
+            endpoint, data = call
+            return self.run(endpoint, data=data, headers=headers, extra_options=extra_options)
+
+        # executor.map yields results in submission order, whichever request finishes first
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run_one, calls))
+
     # helper function to check response - raise AirflowException for status code except 2XX and 3XX
     def check_response(self, response):
         try:
@@ -265,24 +1104,72 @@ class HttpHook(BaseHook):
     # if extra options mute the status check then don't check 
     def run_and_check(self, session, prepped_request, extra_options):
         extra_options = extra_options or {}
-        
+
+        if self.retry_policy is None:
+            response = self._send(session, prepped_request, extra_options)
+        else:
+            # https://tenacity.readthedocs.io/en/latest/
+            self._retry_obj = self.retry_policy.retrying(before_sleep=self._log_retry)
+            response = self._retry_obj(self._send, session, prepped_request, extra_options)
+
+        if extra_options.get('check_response', True):
+            self.check_response(response)
+        return response 
+
+    def _get_circuit_breaker(self):
+        if self.retry_policy is None:
+            return None
+        breaker_key = (self.base_url, self.retry_policy.failure_threshold, self.retry_policy.reset_timeout)
+        with self._circuit_breakers_lock:
+            breaker = self._circuit_breakers.get(breaker_key)
+            if breaker is None:
+                breaker = self._circuit_breakers[breaker_key] = CircuitBreaker(
+                    self.base_url,
+                    failure_threshold=self.retry_policy.failure_threshold,
+                    reset_timeout=self.retry_policy.reset_timeout)
+        return breaker
+
+    # a single attempt, the retry policy decides whether the outcome is worth another one
+    def _send(self, session, prepped_request, extra_options):
+        breaker = self._get_circuit_breaker()
+        if breaker:
+            breaker.before_call()
+
         try:
             response = session.send(
                 prepped_request,
-                stream=extra_options.get("stream", False)
+                stream=extra_options.get("stream", False),
                 verify=extra_options.get("verify", True),
                 proxies=extra_options.get("proxies", {}),
                 cert=extra_options.get("cert"),
                 timeout=extra_options.get("timeout"),
                 allow_redirects=extra_options.get("allow_redirects", True))
-            
-            if extra_options.get('check_response', True):
-                self.check_response(response)
-            return response 
-
-        except requests.exceptions.ConnectionError as ex:
-            self.log.warning(str(ex) + ' Tenacity will retry to execute the operation')
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ex:
+            if breaker:
+                breaker.record_failure()
+            self.log.warning(str(ex))
             raise ex
+
+        if breaker:
+            if self.retry_policy.is_retryable_status(response.status_code):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        return response
+
+    def _log_retry(self, retry_state):
+        call = current_hook_call()
+        if call is not None:
+            call.retries += 1
+        if retry_state.outcome.failed:
+            reason = str(retry_state.outcome.exception())
+        else:
+            response = retry_state.outcome.result()
+            reason = str(response.status_code) + ":" + response.reason
+            # give the connection back to the pool before sleeping (matters for stream=True)
+            response.close()
+        self.log.warning("Attempt %s failed (%s), retrying in %.1fs",
+                         retry_state.attempt_number, reason, retry_state.next_action.sleep)
     
 
 ##################################################
@@ -291,8 +1178,17 @@ class HttpHook(BaseHook):
 
 # https://github.com/apache/airflow/blob/master/airflow/hooks/postgres_hook.py
 
+import json
 import os
-from contextlib import closing
+import queue
+import re
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from decimal import Decimal
 
 import psycopg2
 import psycopg2.extensions
@@ -300,6 +1196,414 @@ import psycopg2.extras
 
 from airflow.hooks.dbapi_hook import DbApiHook
 
+# RDS auth tokens are valid for 15 minutes, refresh them a minute early
+IAM_TOKEN_LIFETIME = 15 * 60
+IAM_TOKEN_REFRESH_MARGIN = 60
+
+
+class _PooledConnection(object):
+    """
+    Wraps a psycopg2 connection so that close() hands it back to its pool
+    Everything else is passed through, so callers using closing(hook.get_conn()) get pooling for free
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    # sets go to the real connection too - DbApiHook.run(autocommit=True) sets conn.autocommit,
+    # left on the wrapper nothing would be committed and putconn's reset() would roll it all back
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    # dunder methods skip __getattr__, so `with conn:` (commit / rollback) is passed through explicitly
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+
+class PostgresConnectionPool(object):
+    """
+    Idle psycopg2 connections for one set of connection parameters
+
+    Connections are made with the connect callable only when no idle one is left,
+    so IAM tokens are only fetched for brand new connections.
+    """
+    def __init__(self, maxsize=5):
+        self.maxsize = maxsize
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def getconn(self, connect):
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    return _PooledConnection(self, conn)
+        return _PooledConnection(self, connect())
+
+    def putconn(self, conn):
+        if not conn.closed:
+            try:
+                # roll back whatever the caller left open and reset session settings
+                conn.reset()
+                conn.autocommit = False
+            except psycopg2.Error:
+                conn.close()
+        with self._lock:
+            if not conn.closed and len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+# pools are per process - a forked worker must never reuse its parent's sockets
+_connection_pools = {}
+_connection_pools_pid = None
+_connection_pools_lock = threading.Lock()
+
+
+def _get_connection_pool(conn_args, maxsize):
+    global _connection_pools_pid
+    key = tuple(sorted(conn_args.items()))
+    with _connection_pools_lock:
+        if _connection_pools_pid != os.getpid():
+            _connection_pools.clear()
+            _connection_pools_pid = os.getpid()
+        pool = _connection_pools.get(key)
+        if pool is None:
+            pool = _connection_pools[key] = PostgresConnectionPool(maxsize)
+        return pool
+
+
+# streaming COPY helpers
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+_COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+_COPY_TEXT_UNESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+_copy_text_escape_re = re.compile(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)')
+
+
+def _copy_text_value(value):
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex format, the backslash itself has to be escaped for COPY
+        return '\\\\x' + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).translate(_COPY_TEXT_ESCAPES)
+
+
+def _copy_text_unescape(match):
+    seq = match.group(1)
+    if seq[0] == 'x' and len(seq) > 1:
+        return chr(int(seq[1:], 16))
+    if seq[0] in '01234567':
+        return chr(int(seq, 8))
+    return _COPY_TEXT_UNESCAPES.get(seq, seq)
+
+
+def parse_copy_text_row(line):
+    """
+    Splits one line of COPY text format into a tuple of strings (None for NULL)
+    """
+    return tuple(
+        None if field == '\\N'
+        else _copy_text_escape_re.sub(_copy_text_unescape, field) if '\\' in field
+        else field
+        for field in line.rstrip('\n').split('\t'))
+
+
+def iter_copy_text_chunks(rows, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Encodes rows into COPY text format, yielding chunks of about chunk_size bytes
+    """
+    lines = []
+    size = 0
+    for row in rows:
+        line = ('\t'.join([_copy_text_value(value) for value in row]) + '\n').encode('utf-8')
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield b''.join(lines)
+
+
+def _fixed_width(fmt):
+    # length prefix and value packed in one go, e.g. '>iq' for int8
+    packer = struct.Struct('>i' + fmt)
+    width = packer.size - 4
+    unpacker = struct.Struct('>' + fmt)
+    return (lambda value: packer.pack(width, value),
+            lambda data: unpacker.unpack(data)[0])
+
+
+def _variable_width(encode, decode):
+    def encode_field(value):
+        data = encode(value)
+        return struct.pack('>i', len(data)) + data
+    return encode_field, decode
+
+
+# numeric is sent as base 10000 digits: ndigits, weight (of the first digit), sign, display scale, digits
+# https://github.com/postgres/postgres/blob/master/src/backend/utils/adt/numeric.c (numeric_send)
+_NUMERIC_HEADER = struct.Struct('>hhHh')
+_NUMERIC_POS = 0x0000
+_NUMERIC_NEG = 0x4000
+_NUMERIC_NAN = 0xC000
+_NUMERIC_PINF = 0xD000  # infinity needs pg >= 14
+_NUMERIC_NINF = 0xF000
+
+
+def _encode_numeric(value):
+    if not isinstance(value, Decimal):
+        # str() so that floats go over as they print, not as their binary expansion
+        value = Decimal(str(value))
+    if value.is_nan():
+        return _NUMERIC_HEADER.pack(0, 0, _NUMERIC_NAN, 0)
+    if value.is_infinite():
+        return _NUMERIC_HEADER.pack(0, 0, _NUMERIC_NINF if value < 0 else _NUMERIC_PINF, 0)
+
+    sign, digits, exponent = value.as_tuple()
+    dscale = max(0, -exponent)
+    digits = (''.join(map(str, digits)) + '0' * max(0, exponent)).zfill(dscale)
+    # pad both parts to whole base 10000 digits, lined up on the decimal point
+    int_part, frac_part = digits[:len(digits) - dscale], digits[len(digits) - dscale:]
+    int_part = int_part.zfill(-(-len(int_part) // 4) * 4)
+    frac_part = frac_part.ljust(-(-len(frac_part) // 4) * 4, '0')
+    digits = int_part + frac_part
+    groups = [int(digits[i:i + 4]) for i in range(0, len(digits), 4)]
+    weight = len(int_part) // 4 - 1
+
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    return (_NUMERIC_HEADER.pack(len(groups), weight, _NUMERIC_NEG if sign else _NUMERIC_POS, dscale) +
+            struct.pack('>{}h'.format(len(groups)), *groups))
+
+
+def _decode_numeric(data):
+    ndigits, weight, sign, dscale = _NUMERIC_HEADER.unpack_from(data)
+    if sign == _NUMERIC_NAN:
+        return Decimal('NaN')
+    if sign in (_NUMERIC_PINF, _NUMERIC_NINF):
+        return Decimal('-Infinity' if sign == _NUMERIC_NINF else 'Infinity')
+    groups = struct.unpack_from('>{}h'.format(ndigits), data, _NUMERIC_HEADER.size)
+    digits = ''.join('{:04d}'.format(group) for group in groups)
+    # built from a tuple rather than with arithmetic, so no decimal context can round it
+    exponent = 4 * (weight - ndigits + 1)
+    if exponent > -dscale:
+        digits += '0' * (exponent + dscale)
+    else:
+        # only zeros are cut, postgres doesn't send digits beyond the display scale
+        digits = digits[:len(digits) - (-dscale - exponent)]
+    return Decimal((sign == _NUMERIC_NEG, tuple(map(int, digits or '0')), -dscale))
+
+
+# pg type name -> (encode field incl. length prefix, decode field data)
+COPY_BINARY_TYPES = {
+    'int2': _fixed_width('h'),
+    'int4': _fixed_width('i'),
+    'int8': _fixed_width('q'),
+    'float4': _fixed_width('f'),
+    'float8': _fixed_width('d'),
+    'bool': _fixed_width('?'),
+    'bytea': _variable_width(bytes, bytes),
+    'numeric': _variable_width(_encode_numeric, _decode_numeric),
+}
+for _text_type in ('text', 'varchar', 'bpchar', 'name'):
+    COPY_BINARY_TYPES[_text_type] = _variable_width(lambda value: value.encode('utf-8'),
+                                                    lambda data: data.decode('utf-8'))
+
+_COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+_COPY_BINARY_NULL = struct.pack('>i', -1)
+_COPY_BINARY_TRAILER = struct.pack('>h', -1)
+
+
+def _copy_binary_codecs(column_types):
+    try:
+        return [COPY_BINARY_TYPES[column_type] for column_type in column_types]
+    except KeyError as err:
+        raise ValueError('Column type {} is not supported by binary COPY, use the text format'
+                         .format(err))
+
+
+def iter_copy_binary_chunks(rows, column_types, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Encodes rows into COPY binary format, yielding chunks of about chunk_size bytes
+    Numbers go over the wire as fixed width values instead of being formatted and parsed as text
+    """
+    encoders = [encode for encode, _ in _copy_binary_codecs(column_types)]
+    field_count = struct.pack('>h', len(encoders))
+    chunk = bytearray(_COPY_BINARY_HEADER)
+    for row in rows:
+        chunk += field_count
+        for encode, value in zip(encoders, row):
+            chunk += _COPY_BINARY_NULL if value is None else encode(value)
+        if len(chunk) >= chunk_size:
+            yield bytes(chunk)
+            chunk = bytearray()
+    chunk += _COPY_BINARY_TRAILER
+    yield bytes(chunk)
+
+
+def iter_copy_binary_rows(chunks, column_types):
+    """
+    Decodes COPY binary format arriving in arbitrary chunks into tuples
+    """
+    decoders = [decode for _, decode in _copy_binary_codecs(column_types)]
+    buf = bytearray()
+    pos = None  # None until the header has been read
+    for chunk in chunks:
+        buf += chunk
+        if pos is None:
+            if len(buf) < len(_COPY_BINARY_HEADER):
+                continue
+            extension_length = struct.unpack_from('>i', buf, 15)[0]
+            pos = 19 + extension_length
+        while True:
+            # only parse a tuple once all of it has arrived
+            if len(buf) - pos < 2:
+                break
+            field_count = struct.unpack_from('>h', buf, pos)[0]
+            if field_count == -1:
+                return
+            end = pos + 2
+            fields = []
+            for decode in decoders[:field_count]:
+                if len(buf) - end < 4:
+                    break
+                length = struct.unpack_from('>i', buf, end)[0]
+                end += 4
+                if length == -1:
+                    fields.append(None)
+                    continue
+                if len(buf) - end < length:
+                    break
+                fields.append(decode(bytes(buf[end:end + length])))
+                end += length
+            if len(fields) < field_count:
+                break
+            yield tuple(fields)
+            pos = end
+        # drop what has been parsed so the buffer stays small
+        del buf[:pos]
+        pos = 0
+
+
+class _ChunkReader(object):
+    """
+    File-like object for COPY FROM STDIN that reads chunks produced by a background thread
+    The producer (and its encoding) runs while psycopg2 is sending the previous chunks,
+    with at most maxsize chunks buffered in between.
+    """
+    def __init__(self, chunks, maxsize=8):
+        self.error = None
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._buffer = b''
+        self._done = False
+        self._thread = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # give up if the COPY failed and nobody is reading anymore
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, chunks):
+        try:
+            for chunk in chunks:
+                if chunk and not self._put(chunk):
+                    return
+        except Exception as err:
+            self.error = err
+        self._put(None)
+
+    def read(self, size=-1):
+        if not self._buffer:
+            if self._done:
+                return b''
+            chunk = self._queue.get()
+            if chunk is None:
+                self._done = True
+                if self.error is not None:
+                    raise self.error
+                return b''
+            self._buffer = chunk
+        # whole chunks are handed over as they are, no copying unless psycopg2 asks for less
+        if size < 0 or size >= len(self._buffer):
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class _ChunkWriter(object):
+    """
+    File-like object for COPY TO STDOUT that hands each written chunk over to a consumer thread
+    """
+    def __init__(self, maxsize=8):
+        self.queue = queue.Queue(maxsize)
+        self.stop = threading.Event()
+
+    def write(self, data):
+        while True:
+            if self.stop.is_set():
+                # raising inside write makes psycopg2 abort the COPY
+                raise IOError('COPY consumer went away')
+            try:
+                self.queue.put(bytes(data), timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+# (aws_conn_id, redshift, host, login, port, dbname) -> (login, token, port, expires_at)
+_iam_token_cache = {}
+_iam_token_cache_lock = threading.Lock()
+
+
 class PostgresHook(DbApiHook):
     """
     Interact with Postgres.
@@ -307,15 +1611,26 @@ class PostgresHook(DbApiHook):
     Can specify ssql parameters in the extra field 
 
     For AWS IAM authentication, use something like extras example: ``{"iam":true, "aws_conn_id":"my_aws_conn"}``
+
+    Connections are pooled per process, keyed by the connection parameters.
+    Pass pool_maxsize=0 to open (and really close) a new connection every time.
     """
     conn_name_attr = 'postgres_conn_id'
     default_conn_name = 'posgres_default'
     supports_autocommit = True 
 
+    # the generic DbApiHook methods, instrumented
+    run = instrumented()(DbApiHook.run)
+    get_records = instrumented()(DbApiHook.get_records)
+    get_first = instrumented()(DbApiHook.get_first)
+    get_pandas_df = instrumented()(DbApiHook.get_pandas_df)
+    insert_rows = instrumented()(DbApiHook.insert_rows)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.schema = kwargs.pop("schema", None)
         self.connection = kwargs.pop("connection", None)
+        self.pool_maxsize = kwargs.pop("pool_maxsize", 5)
 
     def _get_cursor(self, raw_cursor):
         _cursor = raw_cursor.lower()
@@ -333,15 +1648,15 @@ class PostgresHook(DbApiHook):
         conn = self.connection or self.get_connection(conn_id)
 
         # check for authentication via AWS IAM
-        if conn.extra_dejson.get('iam', False):
-            conn.login, conn.password, conn.port = self.get_iam_token(conn)
+        iam = conn.extra_dejson.get('iam', False)
 
         # construct the conn args dict
+        # with IAM the password is a short lived token, so it is left out of the pool key
         conn_args = dict(
             host=conn.host,
             user=conn.login,
-            password=conn.password,
-            dbname=self.schema or conn.schema
+            password=None if iam else conn.password,
+            dbname=self.schema or conn.schema,
             port=conn.port)
         raw_cursor = conn.extra_dejson.get('cursor', False)
         if raw_cursor:
@@ -352,10 +1667,49 @@ class PostgresHook(DbApiHook):
                             'sslrootcert', 'sslcrl', 'application_name',
                             'keepalives_idle']:
                 conn_args[arg_name] = arg_val
-        
-        self.conn = psycopg2.connect(**conn_args)
+
+        def connect():
+            connect_args = dict(conn_args)
+            if iam:
+                connect_args['user'], connect_args['password'], connect_args['port'] = \
+                    self.get_iam_token(conn)
+            return psycopg2.connect(**connect_args)
+
+        if not self.pool_maxsize:
+            self.conn = connect()
+        else:
+            self.conn = _get_connection_pool(conn_args, self.pool_maxsize).getconn(connect)
         return self.conn 
 
+    def iter_records(self, sql, parameters=None, itersize=2000):
+        """
+        Runs a query on a named (server side) cursor and yields the rows one by one
+        Rows are fetched itersize at a time, so a huge SELECT never sits in client memory all at once
+        """
+        for batch in self.iter_batches(sql, parameters, batch_size=itersize):
+            yield from batch
+
+    @instrumented(items=len)
+    def iter_batches(self, sql, parameters=None, batch_size=2000):
+        """
+        Same as iter_records, but yields lists of up to batch_size rows
+        """
+        with closing(self.get_conn()) as conn:
+            # a named cursor makes postgres keep the result set server side
+            # https://www.psycopg.org/docs/usage.html#server-side-cursors
+            cursor_name = 'airflow_{}'.format(uuid.uuid4().hex)
+            with closing(conn.cursor(name=cursor_name)) as cur:
+                cur.itersize = batch_size
+                cur.execute(sql, parameters)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            # named cursors live inside a transaction, end it
+            conn.commit()
+
+    @instrumented()
     def copy_expert(self, sql, filename, open=open):
         """
         Executes SQL using psycopg2 copy_expert method
@@ -370,6 +1724,12 @@ class PostgresHook(DbApiHook):
                     cur.copy_expert(sql, file)
                     file.truncate(file.tell())
                     conn.commit()
+            call = current_hook_call()
+            if call is not None:
+                if 'TO STDOUT' in sql.upper():
+                    call.bytes_received += file.tell()
+                else:
+                    call.bytes_sent += file.tell()
 
     def bulk_load(self, table, tmp_file):
         """
@@ -383,21 +1743,302 @@ class PostgresHook(DbApiHook):
         """
         self.copy_expert("COPY {table} TO STDOUT".format(table=table), tmp_file)
 
+    # streaming versions of the above - no files involved
+
+    @instrumented()
+    def copy_expert_from_iter(self, sql, chunks):
+        """
+        Runs a COPY ... FROM STDIN reading the data from an iterator of bytes chunks
+        The iterator is consumed in a background thread while the COPY is running
+        """
+        call = current_hook_call()
+        if call is not None:
+            # the chunks are read in the reader's thread, count them on the call started in this one
+            chunks = call.count_sent(chunks)
+        reader = _ChunkReader(chunks)
+        try:
+            with closing(self.get_conn()) as conn:
+                with closing(conn.cursor()) as cur:
+                    try:
+                        cur.copy_expert(sql, reader, size=COPY_CHUNK_SIZE)
+                    except Exception:
+                        # psycopg2 wraps errors raised by read(), surface the producer's own error
+                        if reader.error is not None:
+                            raise reader.error
+                        raise
+                conn.commit()
+        finally:
+            reader.close()
+
+    @instrumented(received=len)
+    def copy_expert_to_iter(self, sql):
+        """
+        Runs a COPY ... TO STDOUT and yields the output as bytes chunks (one row per chunk in text format)
+        """
+        writer = _ChunkWriter()
+        errors = []
+
+        def run_copy():
+            try:
+                with closing(self.get_conn()) as conn:
+                    with closing(conn.cursor()) as cur:
+                        cur.copy_expert(sql, writer)
+            except Exception as err:
+                errors.append(err)
+            finally:
+                writer.queue.put(None)
+
+        thread = threading.Thread(target=run_copy, daemon=True)
+        thread.start()
+        try:
+            while True:
+                chunk = writer.queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            writer.stop.set()
+            # unblock the copy thread if it is waiting on a full queue
+            while thread.is_alive():
+                try:
+                    writer.queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        if errors:
+            raise errors[0]
+
+    def get_copy_column_types(self, table, columns=None):
+        """
+        Returns the pg type names of the columns of table, in COPY order
+        """
+        rows = self.get_records(
+            "SELECT a.attname, t.typname FROM pg_attribute a "
+            "JOIN pg_type t ON t.oid = a.atttypid "
+            "WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped "
+            "ORDER BY a.attnum", parameters=(table,))
+        types = dict(rows)
+        return [types[column] for column in columns] if columns else [typname for _, typname in rows]
+
+    @staticmethod
+    def _copy_sql(table, columns, direction, binary):
+        column_list = ' ({})'.format(', '.join(columns)) if columns else ''
+        options = ' WITH (FORMAT binary)' if binary else ''
+        return "COPY {table}{columns} {direction}{options}".format(
+            table=table, columns=column_list, direction=direction, options=options)
+
+    def bulk_load_rows(self, table, rows, columns=None, binary=False):
+        """
+        Loads an iterator of row tuples into a database table with COPY, no temp file
+        Rows are encoded to COPY text (or binary) format chunk by chunk as the COPY consumes them
+        Tables with a column type the binary encoder doesn't know (dates, json ...) are loaded as text
+        """
+        if binary:
+            column_types = self.get_copy_column_types(table, columns)
+            unsupported = sorted(set(column_types) - set(COPY_BINARY_TYPES))
+            if unsupported:
+                self.log.warning('Binary COPY does not support %s, loading %s as text',
+                                 ', '.join(unsupported), table)
+                binary = False
+        if binary:
+            chunks = iter_copy_binary_chunks(rows, column_types)
+        else:
+            chunks = iter_copy_text_chunks(rows)
+        self.copy_expert_from_iter(self._copy_sql(table, columns, 'FROM STDIN', binary), chunks)
+
+    def bulk_load_chunks(self, table, chunks, columns=None, binary=False):
+        """
+        Loads already COPY formatted bytes chunks (e.g. a tab-delimited object streamed from S3)
+        """
+        self.copy_expert_from_iter(self._copy_sql(table, columns, 'FROM STDIN', binary), chunks)
+
+    def bulk_dump_rows(self, table, columns=None, binary=False):
+        """
+        Yields the rows of a database table as tuples, streamed out of COPY TO STDOUT
+        Text format gives strings (None for NULL), binary format gives typed values
+        """
+        chunks = self.copy_expert_to_iter(self._copy_sql(table, columns, 'TO STDOUT', binary))
+        if binary:
+            yield from iter_copy_binary_rows(chunks, self.get_copy_column_types(table, columns))
+        else:
+            # rows normally arrive one per chunk, but don't count on it
+            pending = b''
+            for chunk in chunks:
+                *lines, pending = (pending + chunk).split(b'\n')
+                for line in lines:
+                    yield parse_copy_text_row(line.decode('utf-8'))
+
+    # parallel dumps - one COPY per key (or ctid) range, all reading the same snapshot
+
+    @contextmanager
+    def _exported_snapshot(self):
+        """
+        Opens a repeatable read transaction and exports its snapshot
+        Other connections can SET TRANSACTION SNAPSHOT to it for as long as this block is running
+        https://www.postgresql.org/docs/current/functions-admin.html#FUNCTIONS-SNAPSHOT-SYNCHRONIZATION
+        """
+        with closing(self.get_conn()) as conn:
+            with closing(conn.cursor()) as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                cur.execute("SELECT pg_export_snapshot()")
+                snapshot = cur.fetchone()[0]
+                yield cur, snapshot
+            conn.rollback()
+
+    @staticmethod
+    def _integer_primary_key(cur, table):
+        cur.execute(
+            "SELECT a.attname, t.typname FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "JOIN pg_type t ON t.oid = a.atttypid "
+            "WHERE i.indrelid = %s::regclass AND i.indisprimary", (table,))
+        key = cur.fetchall()
+        if len(key) != 1 or key[0][1] not in ('int2', 'int4', 'int8'):
+            raise ValueError("{} has no single integer primary key, use split_by='ctid'".format(table))
+        return key[0][0]
+
+    def _slice_copy_statements(self, cur, table, slices, split_by, binary):
+        """
+        Splits table into up to `slices` ranges and returns one COPY statement per range
+        The first and last ranges are left open so no row can fall outside of them
+        """
+        if split_by == 'ctid' and cur.connection.server_version < 140000:
+            # before pg 14 there is no TID range scan, every ctid range would read the whole table
+            try:
+                self._integer_primary_key(cur, table)
+                split_by = 'pk'
+            except ValueError:
+                slices = 1
+            self.log.warning("split_by='ctid' needs postgres >= 14, dumping %s in %s",
+                             table, 'primary key ranges' if split_by == 'pk' else 'a single slice')
+
+        if split_by == 'ctid':
+            # block ranges, e.g. ctid >= '(1000,0)' AND ctid < '(2000,0)', read with a TID range scan
+            cur.execute("SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::int", (table,))
+            column, low, high = 'ctid', 0, cur.fetchone()[0] - 1
+
+            def literal(block):
+                return "'({},0)'::tid".format(block)
+        elif split_by == 'pk':
+            column = self._integer_primary_key(cur, table)
+            cur.execute("SELECT min({key}), max({key}) FROM {table}".format(key=column, table=table))
+            low, high = cur.fetchone()
+            literal = str
+        else:
+            raise ValueError("split_by must be 'pk' or 'ctid', not {!r}".format(split_by))
+
+        bounds = []
+        if low is not None and high >= low:
+            step = -(-(high - low + 1) // slices)  # ceiling division
+            bounds = list(range(low + step, high + 1, step))
+
+        conditions = []
+        for start, end in zip([None] + bounds, bounds + [None]):
+            parts = []
+            if start is not None:
+                parts.append("{} >= {}".format(column, literal(start)))
+            if end is not None:
+                parts.append("{} < {}".format(column, literal(end)))
+            conditions.append(' AND '.join(parts) or 'true')
+
+        options = ' WITH (FORMAT binary)' if binary else ''
+        return ["COPY (SELECT * FROM {table} WHERE {condition}) TO STDOUT{options}".format(
+                    table=table, condition=condition, options=options)
+                for condition in conditions]
+
+    def _copy_slice(self, snapshot, sql, file):
+        # every slice runs on its own connection, inside the shared snapshot
+        with closing(self.get_conn()) as conn:
+            with closing(conn.cursor()) as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                cur.copy_expert(sql, file)
+            conn.rollback()
+
+    @instrumented(received=lambda files: sum(os.path.getsize(file) for file in files))
+    def bulk_dump_parallel(self, table, tmp_file, slices=4, split_by='pk', binary=False):
+        """
+        Dumps a database table into one file per slice, the slices are dumped concurrently
+        :param tmp_file: file name with a {slice} placeholder, e.g. '/tmp/orders_{slice}.tsv'
+        :param slices: number of key ranges, each one gets its own connection
+        :param split_by: 'pk' to split on an integer primary key, 'ctid' to split on physical pages
+            (postgres >= 14 only, older servers have no TID range scan and fall back to 'pk'
+            or, without an integer primary key, to a single slice)
+        Returns the list of files written, in key (or page) order
+        """
+        with self._exported_snapshot() as (cur, snapshot):
+            statements = self._slice_copy_statements(cur, table, slices, split_by, binary)
+            files = [tmp_file.format(slice=index) for index in range(len(statements))]
+
+            def dump(index):
+                with open(files[index], 'wb') as file:
+                    self._copy_slice(snapshot, statements[index], file)
+
+            with ThreadPoolExecutor(max_workers=len(statements)) as executor:
+                list(executor.map(dump, range(len(statements))))
+        return files
+
+    @instrumented(received=len)
+    def iter_bulk_dump_parallel(self, table, slices=4, split_by='pk'):
+        """
+        Dumps a database table with concurrent slices like bulk_dump_parallel,
+        but yields the merged COPY text output as bytes chunks instead of writing files
+        Chunks are whole rows, slices are interleaved in whatever order they arrive
+        """
+        writer = _ChunkWriter(maxsize=8 * slices)
+
+        def slice_done(future):
+            while not writer.stop.is_set():
+                try:
+                    writer.queue.put(None, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        with self._exported_snapshot() as (cur, snapshot):
+            statements = self._slice_copy_statements(cur, table, slices, split_by, binary=False)
+            with ThreadPoolExecutor(max_workers=len(statements)) as executor:
+                futures = [executor.submit(self._copy_slice, snapshot, sql, writer) for sql in statements]
+                for future in futures:
+                    future.add_done_callback(slice_done)
+                try:
+                    remaining = len(futures)
+                    while remaining:
+                        chunk = writer.queue.get()
+                        if chunk is None:
+                            remaining -= 1
+                        else:
+                            yield chunk
+                finally:
+                    # if the caller stopped early this aborts the slices still running
+                    writer.stop.set()
+                for future in futures:
+                    future.result()
+
     # helper function to retrieve temporary credentials to connect to Postgres/ Redshift
-    get_iam_token(self, conn):
-    """
-    Use AWSHook to retrieve a temporary password to connection to Postgres / Redshift
-    """
+    @instrumented('iam_token')
+    def get_iam_token(self, conn):
+        """
+        Use AWSHook to retrieve a temporary password to connection to Postgres / Redshift
+        Tokens are cached until shortly before they expire
+        """
         from airflow.contrib.hooks.aws_hook import AwsHook 
 
         redshift = conn.extra_dejson.get('redshift', None)
         aws_conn_id = conn.extra_dejson.get('aws_conn_id', 'aws_default')
-        aws_hook = AwsHook(aws_conn_id)
-        login = conn.login
         if conn.port is None:
             port = 5439 if redshift else 5432
         else:
             port = conn.port 
+
+        cache_key = (aws_conn_id, redshift, conn.host, conn.login, port, self.schema or conn.schema)
+        with _iam_token_cache_lock:
+            cached = _iam_token_cache.get(cache_key)
+        if cached and cached[3] - IAM_TOKEN_REFRESH_MARGIN > time.time():
+            return cached[:3]
+
+        aws_hook = AwsHook(aws_conn_id)
+        login = conn.login
+        expires_at = time.time() + IAM_TOKEN_LIFETIME
         if redshift:
             cluster_identifier = conn.extra_dejson.get('cluster-identifier', conn.host.split('.')[0])
             client = aws_hook.get_client_type('redshift')
@@ -408,9 +2049,14 @@ class PostgresHook(DbApiHook):
                 AutoCreate=False)
             token = cluster_creds['DbPassword']
             login = cluster_creds['DbUser']
+            if 'Expiration' in cluster_creds:
+                expires_at = cluster_creds['Expiration'].timestamp()
         else:
             client = aws_hook.get_client_type('rds')
             token = client.generate_db_auth_token(conn.host, port, conn.login)
+
+        with _iam_token_cache_lock:
+            _iam_token_cache[cache_key] = (login, token, port, expires_at)
         return login, token, port 
 
         
@@ -424,9 +2070,14 @@ class PostgresHook(DbApiHook):
 Interact with AWS S3 using the boto3 library
 """
 
+import codecs
 import fnmatch
 import io
+import os
+import queue
 import re
+import threading
+from collections import deque
 from functools import wraps
 from urllib.parse import urlparse
 
@@ -444,7 +2095,7 @@ def provide_bucket_name(func):
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        func_params = func.__code__.code_varnames
+        func_params = func.__code__.co_varnames
 
         def has_arg(name):
             name_in_args = name in func_params and func_params.index(name) < len(args)
@@ -457,7 +2108,120 @@ def provide_bucket_name(func):
             kwargs['bucket_name'] = connection.schema 
         
         return func(*args, **kwargs)
-    return wrapper 
+    return wrapper
+
+
+# shorthands for the S3 Select serialization dicts, so callers can pass 'CSV' instead of {'CSV': {}}
+# https://docs.aws.amazon.com/AmazonS3/latest/API/API_SelectObjectContent.html
+S3_SELECT_INPUT_SERIALIZATION = {
+    'CSV': {'CSV': {'FileHeaderInfo': 'USE'}},
+    'JSON': {'JSON': {'Type': 'LINES'}},
+    'PARQUET': {'Parquet': {}},
+}
+S3_SELECT_OUTPUT_SERIALIZATION = {
+    'CSV': {'CSV': {}},
+    'JSON': {'JSON': {}},
+}
+
+
+def _select_serialization(serialization, shorthands, default):
+    """
+    Turns None / a shorthand string / a full serialization dict into a serialization dict
+    """
+    if serialization is None:
+        return dict(shorthands[default])
+    if isinstance(serialization, str):
+        try:
+            return dict(shorthands[serialization.upper()])
+        except KeyError:
+            raise AirflowException('Unsupported S3 Select serialization "{}"'.format(serialization))
+    return serialization
+
+
+def _select_record_delimiter(output_serialization):
+    # both CSV and JSON output let you override the record delimiter, default is newline
+    for options in output_serialization.values():
+        return options.get('RecordDelimiter', '\n')
+    return '\n'
+
+
+def iter_select_records(event_stream, record_delimiter='\n', encoding='utf-8'):
+    """
+    Parses an S3 Select event stream and yields records one at a time
+
+    Records events carry raw payload chunks which do not line up with record
+    (or even utf-8 character) boundaries, so the tail of each chunk is carried
+    over to the next one. Only the carried-over partial record is held in memory.
+    """
+    # incremental decoder handles multi-byte characters split across two chunks
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    ended = False
+
+    for event in event_stream:
+        if 'Records' in event:
+            pending += decoder.decode(event['Records']['Payload'])
+            *records, pending = pending.split(record_delimiter)
+            for record in records:
+                yield record
+        elif 'End' in event:
+            ended = True
+        # 'Stats', 'Progress' and 'Cont' (keep-alive) events carry no records
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+    # without an End event the stream was cut off half way and the result is incomplete
+    if not ended:
+        raise AirflowException('S3 Select event stream ended without an End event')
+
+
+class _BackgroundIterator(object):
+    """
+    Runs an iterator in a background thread, with at most maxsize items buffered ahead of the consumer
+    An error raised by the iterator is raised to the consumer after the items that came before it.
+    """
+    _END = object()
+
+    def __init__(self, iterable, maxsize=1024):
+        self.error = None
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(iterable,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # give up if nobody is reading anymore
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except Exception as err:
+            self.error = err
+        self._put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
 
 
 class S3Hook(AwsHook):
@@ -483,6 +2247,7 @@ class S3Hook(AwsHook):
 
         return bucket_name, key
 
+    @instrumented()
     @provide_bucket_name
     def check_for_bucket(self, bucket_name=None):
         """
@@ -503,6 +2268,7 @@ class S3Hook(AwsHook):
         s3_resource = self.get_resource_type('s3')
         return s3_resource.Bucket(bucket_name)
     
+    @instrumented()
     @provide_bucket_name
     def create_bucket(self, bucket_name=None, region_name=None):
         """
@@ -537,6 +2303,22 @@ class S3Hook(AwsHook):
         pass 
         # calls self.get_conn().get_paginator
 
+    @instrumented()
+    @provide_bucket_name
+    def iter_objects(self, bucket_name=None, prefix='', delimiter='', page_size=None):
+        """
+        Yields the object summaries (Key, Size, ETag ...) under prefix page by page,
+        so listing millions of keys never builds the whole list first
+        """
+        paginator = self.get_conn().get_paginator('list_objects_v2')
+        response = paginator.paginate(Bucket=bucket_name,
+                                      Prefix=prefix,
+                                      Delimiter=delimiter,
+                                      PaginationConfig={'PageSize': page_size})
+        for page in response:
+            yield from page.get('Contents', [])
+
+    @instrumented(items=lambda keys: len(keys or []))
     @provide_bucket_name
     def list_keys(self, bucket_name=None, prefix='', delimiter='', 
                   page_size=None, max_items=None):
@@ -562,9 +2344,10 @@ class S3Hook(AwsHook):
                     keys.append(k['Key'])
         
         if has_results:
-            return key 
+            return keys
         return None 
 
+    @instrumented()
     @provide_bucket_name
     def check_for_key(self, key, bucket_name=None):
         """
@@ -574,12 +2357,13 @@ class S3Hook(AwsHook):
             (bucket_name, key) = self.parse_s3_url(key)
 
         try:
-            self.get_conn().head_object(Bucket=bucket_name, key=key)
+            self.get_conn().head_object(Bucket=bucket_name, Key=key)
             return True 
         except ClientError as e:
             self.log.info(e.response["Error"]["Message"])
             return False 
     
+    @instrumented()
     @provide_bucket_name
     def get_key(self, key, bucket_name=None):
         """
@@ -592,6 +2376,7 @@ class S3Hook(AwsHook):
         obj.load()
         return obj
     
+    @instrumented(received=len)
     @provide_bucket_name
     def read_key(self, key, bucket_name=None):
         """
@@ -601,14 +2386,116 @@ class S3Hook(AwsHook):
         obj = self.get_key(key, bucket_name)
         return obj.get()['Body'].read().decode('utf-8')
     
+    @instrumented(received=len)
     @provide_bucket_name
     def select_key(self, key, bucket_name=None,
                    expression='SELECT * FROM S3Object',
                    expression_type='SQL',
                    input_serialization=None,
-                   output_serialization=None):
-        pass
-    
+                   output_serialization=None,
+                   scan_range=None):
+        """
+        Reads a key with S3 Select, filtering on the server side
+        Yields the selected records one by one as the event stream arrives,
+        so pulling a few columns out of a huge CSV never holds the whole result
+
+        :param input_serialization: dict, or shorthand 'CSV' / 'JSON' / 'Parquet'
+        :param output_serialization: dict, or shorthand 'CSV' / 'JSON'
+        :param scan_range: (start, end) byte range, end inclusive, only records starting inside it are returned
+        """
+        input_serialization = _select_serialization(
+            input_serialization, S3_SELECT_INPUT_SERIALIZATION, 'CSV')
+        output_serialization = _select_serialization(
+            output_serialization, S3_SELECT_OUTPUT_SERIALIZATION, 'CSV')
+
+        if not bucket_name:
+            (bucket_name, key) = self.parse_s3_url(key)
+
+        select_kwargs = dict(Bucket=bucket_name,
+                             Key=key,
+                             Expression=expression,
+                             ExpressionType=expression_type,
+                             InputSerialization=input_serialization,
+                             OutputSerialization=output_serialization)
+        if scan_range is not None:
+            start, end = scan_range
+            select_kwargs['ScanRange'] = {'Start': start, 'End': end}
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.select_object_content
+        response = self.get_conn().select_object_content(**select_kwargs)
+
+        yield from iter_select_records(response['Payload'],
+                                       _select_record_delimiter(output_serialization))
+
+    @instrumented()
+    @provide_bucket_name
+    def select_key_scan_ranges(self, key, bucket_name=None, num_ranges=4, min_range_size=1024 * 1024):
+        """
+        Splits a key into byte ranges that can be selected independently
+        S3 only returns records that start inside a scan range, and its end is inclusive, so each range
+        ends one byte before the next one starts and no record is returned twice
+        (scan ranges work for uncompressed CSV, JSON lines and Parquet)
+        An empty key has no ranges, select it without a scan range.
+        """
+        if not bucket_name:
+            (bucket_name, key) = self.parse_s3_url(key)
+
+        size = self.get_conn().head_object(Bucket=bucket_name, Key=key)['ContentLength']
+        if not size:
+            return []
+        # don't bother splitting small objects, each select request has a fixed overhead
+        num_ranges = max(1, min(num_ranges, size // min_range_size))
+        step = -(-size // num_ranges)  # ceiling division
+
+        return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+    @provide_bucket_name
+    def select_key_parallel(self, key, bucket_name=None,
+                            expression='SELECT * FROM S3Object',
+                            expression_type='SQL',
+                            input_serialization=None,
+                            output_serialization=None,
+                            num_ranges=4,
+                            max_workers=4,
+                            min_range_size=1024 * 1024,
+                            max_buffered_records=1024):
+        """
+        Selects one large key with several workers, one scan range each
+        Records are still yielded in object order, as they arrive: at most max_workers ranges
+        are selected at once, the ranges after the one being yielded buffer up to
+        max_buffered_records records each and then wait
+        """
+        if not bucket_name:
+            (bucket_name, key) = self.parse_s3_url(key)
+
+        scan_ranges = self.select_key_scan_ranges(key, bucket_name, num_ranges=num_ranges,
+                                                  min_range_size=min_range_size)
+        # an empty key is selected without a scan range
+        pending = iter(scan_ranges or [None])
+        readers = deque()
+
+        def start_next():
+            scan_range = next(pending, False)
+            if scan_range is not False:
+                records = self.select_key(key, bucket_name,
+                                          expression=expression,
+                                          expression_type=expression_type,
+                                          input_serialization=input_serialization,
+                                          output_serialization=output_serialization,
+                                          scan_range=scan_range)
+                readers.append(_BackgroundIterator(records, maxsize=max_buffered_records))
+
+        try:
+            for _ in range(max(1, max_workers)):
+                start_next()
+            while readers:
+                yield from readers[0]
+                readers.popleft().close()
+                start_next()
+        finally:
+            for reader in readers:
+                reader.close()
+
     @provide_bucket_name
     def check_for_wildcard_key(self,
                                wildcard_key, bucket_name=None, delimiter=''):
@@ -618,6 +2505,7 @@ class S3Hook(AwsHook):
     def get_wildcard_key(self, wildcard_key, bucket_name=None, delimiter=''):
         pass
 
+    @instrumented(sent=lambda self, filename, *args, **kwargs: os.path.getsize(filename))
     @provide_bucket_name
     def load_file(self,
                   filename,
@@ -689,6 +2577,7 @@ class S3Hook(AwsHook):
         self._upload_file_obj(file_obj, key, bucket_name, replace, encrypt)
 
     # this is the helper function for uploading a file obj 
+    @instrumented('upload_file_obj')
     def _upload_file_obj(self,
                          file_obj,
                          key,
@@ -707,7 +2596,11 @@ class S3Hook(AwsHook):
 
         client = self.get_conn()
         client.upload_fileobj(file_obj, bucket_name, key, ExtraArgs=extra_args)
+        call = current_hook_call()
+        if call is not None and file_obj.seekable():
+            call.bytes_sent += file_obj.tell()
 
+    @instrumented()
     def copy_object(self,
                     source_bucket_key,
                     dest_bucket_key,
@@ -745,6 +2638,7 @@ class S3Hook(AwsHook):
         return response
 
 
+    @instrumented()
     def delete_objects(self, bucket, keys):
         """
         Delete keys from the bucket
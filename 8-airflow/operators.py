@@ -5,7 +5,255 @@
 
 # https://github.com/apache/airflow/blob/master/airflow/operators/python_operator.py
 
+import csv
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Dict, List, Optional
 
+from airflow.hooks.postgres_hook import PostgresHook
+from airflow.models import BaseOperator
+from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+from airflow.utils.decorators import apply_defaults
+
+# pandas / numpy are only needed for batch_format='pandas' / 'numpy'
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# call metrics of the instrumented hooks in hooks.py, collected per task when they are in use
+try:
+    from hooks import hook_metrics
+except ImportError:
+    hook_metrics = None
+
+
+@contextmanager
+def collect_hook_metrics(operator):
+    """
+    Collects the hook calls made inside the block, see HookMetrics.collect
+    The summary goes to the task log and, if the operator has a metrics_path, to that json file.
+    Yields the collecting HookMetrics, None if the hooks aren't instrumented
+    """
+    if hook_metrics is None:
+        yield None
+        return
+    with hook_metrics.collect(path=operator.metrics_path, log=operator.log) as collector:
+        yield collector
+
+
+def _to_batch_format(rows, batch_format, columns):
+    if batch_format == 'pandas':
+        return pd.DataFrame.from_records(rows, columns=columns)
+    if batch_format == 'numpy':
+        return np.array(rows)
+    return rows
+
+
+def _from_batch_format(result):
+    # whatever the callable returns is turned back into a list of row tuples
+    if result is None:
+        return []
+    if pd is not None and isinstance(result, pd.DataFrame):
+        return list(result.itertuples(index=False, name=None))
+    if np is not None and isinstance(result, np.ndarray):
+        return [tuple(row) for row in result.tolist()]
+    return list(result)
+
+
+def _apply_batch(python_callable, batch_format, columns, op_kwargs, rows):
+    """
+    Runs the callable on one batch - module level so it can be pickled into a worker process
+    """
+    return _from_batch_format(python_callable(_to_batch_format(rows, batch_format, columns), **op_kwargs))
+
+
+def _map_bounded(executor, func, iterable, max_in_flight):
+    """
+    Like executor.map, but only submits max_in_flight items ahead of the one being consumed,
+    so a huge input is never queued into the pool all at once. Results keep the input order.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class BatchPythonOperator(BaseOperator):
+    """
+    Applies a python callable to an input stream one batch at a time, instead of one row at a time
+
+    Input is read in chunks from Postgres (a server side cursor) or S3 (S3 Select records),
+    each batch is handed to the callable as a list of rows, a numpy array or a pandas DataFrame,
+    and the rows it returns are streamed into a Postgres table with COPY.
+    Reading, transforming and loading all overlap.
+
+    :param python_callable: called as python_callable(batch, **op_kwargs), returns the output rows
+        (an iterable of tuples, a numpy array or a DataFrame). Must be a module level function if processes > 0
+    :type python_callable: python callable
+    :param op_kwargs: keyword arguments passed to the callable
+    :type op_kwargs: dict
+    :param source_sql: query to read the input with (Postgres source)
+    :type source_sql: str
+    :param source_conn_id: Postgres connection for source_sql
+    :type source_conn_id: str
+    :param s3_bucket: bucket of the input key (S3 source)
+    :type s3_bucket: str
+    :param s3_key: input key, read with S3Hook.select_key and parsed as CSV
+    :type s3_key: str
+    :param s3_expression: S3 Select expression, to only pull the columns needed
+    :type s3_expression: str
+    :param batch_size: rows per batch
+    :type batch_size: int
+    :param batch_format: 'list', 'numpy' or 'pandas'
+    :type batch_format: str
+    :param columns: column names for the DataFrame batches
+    :type columns: list
+    :param processes: number of worker processes to fan batches out to, 0 to run in the task process
+    :type processes: int
+    :param target_table: table the output rows are loaded into, None to just count them
+    :type target_table: str
+    :param target_columns: columns of target_table the output rows map to
+    :type target_columns: list
+    :param target_conn_id: Postgres connection for target_table
+    :type target_conn_id: str
+    :param binary: load with binary COPY (faster for numeric columns)
+    :type binary: bool
+    :param metrics_path: where to write the task's hook call metrics as json (templated)
+    :type metrics_path: str
+    """
+
+    template_fields = ('source_sql', 's3_key', 'target_table', 'metrics_path')
+    ui_color = '#ffefeb'
+
+    @apply_defaults
+    def __init__(
+            self,
+            python_callable: Callable,
+            op_kwargs: Optional[Dict] = None,
+            source_sql: Optional[str] = None,
+            source_conn_id: str = 'postgres_default',
+            s3_bucket: Optional[str] = None,
+            s3_key: Optional[str] = None,
+            s3_expression: str = 'SELECT * FROM S3Object',
+            aws_conn_id: str = 'aws_default',
+            batch_size: int = 10000,
+            batch_format: str = 'list',
+            columns: Optional[List[str]] = None,
+            processes: int = 0,
+            target_table: Optional[str] = None,
+            target_columns: Optional[List[str]] = None,
+            target_conn_id: str = 'postgres_default',
+            binary: bool = False,
+            metrics_path: Optional[str] = None,
+            *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if not callable(python_callable):
+            raise ValueError('`python_callable` param must be callable')
+        if (source_sql is None) == (s3_key is None):
+            raise ValueError('Pass exactly one of source_sql or s3_key')
+        if batch_format not in ('list', 'numpy', 'pandas'):
+            raise ValueError("batch_format must be 'list', 'numpy' or 'pandas', not {!r}".format(batch_format))
+        if batch_format == 'numpy' and np is None or batch_format == 'pandas' and pd is None:
+            raise ImportError("batch_format={!r} requires {} to be installed".format(
+                batch_format, 'numpy' if batch_format == 'numpy' else 'pandas'))
+
+        self.python_callable = python_callable
+        self.op_kwargs = op_kwargs or {}
+        self.source_sql = source_sql
+        self.source_conn_id = source_conn_id
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.s3_expression = s3_expression
+        self.aws_conn_id = aws_conn_id
+        self.batch_size = batch_size
+        self.batch_format = batch_format
+        self.columns = columns
+        self.processes = processes
+        self.target_table = target_table
+        self.target_columns = target_columns
+        self.target_conn_id = target_conn_id
+        self.binary = binary
+        self.metrics_path = metrics_path
+
+    def _iter_input_batches(self):
+        if self.source_sql is not None:
+            # server side cursor, only one batch is ever on the client
+            hook = PostgresHook(postgres_conn_id=self.source_conn_id)
+            yield from hook.iter_batches(self.source_sql, batch_size=self.batch_size)
+            return
+
+        s3 = S3Hook(aws_conn_id=self.aws_conn_id)
+        records = s3.select_key(self.s3_key, bucket_name=self.s3_bucket, expression=self.s3_expression)
+        # select_key splits on every newline, quoted fields included - put the newlines back,
+        # so csv.reader joins a multi-line field into one row with its newlines intact
+        batch = []
+        for row in csv.reader(record + '\n' for record in records):
+            batch.append(tuple(row))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def execute(self, context):
+        with collect_hook_metrics(self) as metrics:
+            stats = self._execute(context)
+        if metrics is not None:
+            # per hook time, calls and bytes go to XCom along with the row counts
+            stats['hooks'] = metrics.hook_totals()
+        return stats
+
+    def _execute(self, context):
+        started = time.monotonic()
+        stats = {'batches': 0, 'rows_in': 0, 'rows_out': 0}
+
+        def counted(batches):
+            for batch in batches:
+                stats['batches'] += 1
+                stats['rows_in'] += len(batch)
+                yield batch
+
+        apply_batch = partial(_apply_batch, self.python_callable, self.batch_format, self.columns, self.op_kwargs)
+        executor = ProcessPoolExecutor(max_workers=self.processes) if self.processes else None
+        try:
+            if executor:
+                # two batches per worker keeps every worker busy without reading the whole input ahead
+                results = _map_bounded(executor, apply_batch, counted(self._iter_input_batches()),
+                                       max_in_flight=2 * self.processes)
+            else:
+                results = map(apply_batch, counted(self._iter_input_batches()))
+
+            def output_rows():
+                for rows in results:
+                    stats['rows_out'] += len(rows)
+                    yield from rows
+
+            if self.target_table:
+                # the COPY pulls rows through the whole pipeline as it goes
+                PostgresHook(postgres_conn_id=self.target_conn_id).bulk_load_rows(
+                    self.target_table, output_rows(), columns=self.target_columns, binary=self.binary)
+            else:
+                for _ in output_rows():
+                    pass
+        finally:
+            if executor:
+                executor.shutdown()
+
+        stats['seconds'] = time.monotonic() - started
+        self.log.info('Transformed %(rows_in)s rows in %(batches)s batches into %(rows_out)s rows '
+                      'in %(seconds).1fs', stats)
+        return stats
 
 
 ##################################################
@@ -21,3 +269,264 @@ from airflow.models import BaseOperator
 from airflow.providers.amazon.aws.hooks.s3 import S3Hook
 from airflow.utils.decorators import apply_defaults
 
+
+import fnmatch
+import json
+import re
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+# size of the pieces S3 bodies are streamed into COPY with
+S3_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _gunzip_chunks(chunks):
+    # wbits=31 -> expect a gzip header
+    decompressor = zlib.decompressobj(31)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+# the Redshift COPY options postgres' COPY FROM STDIN understands as they are (its pre 9.0 syntax)
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.10
+POSTGRES_COPY_OPTION_RE = re.compile(r"^(CSV|DELIMITER( AS)? '.+'|NULL( AS)? '.*'|QUOTE( AS)? '.+')$",
+                                     re.IGNORECASE)
+
+
+def _postgres_copy_options(copy_options):
+    """
+    Translates Redshift COPY options for postgres' COPY FROM STDIN
+    Returns the postgres options and whether every object is gzip'd. GZIP is done
+    on the client, IGNOREHEADER 1 becomes HEADER, anything else Redshift only is refused.
+    """
+    options = []
+    gzipped = False
+    for option in copy_options:
+        option = option.strip()
+        if option.upper() == 'GZIP':
+            gzipped = True
+        elif re.match(r'^IGNOREHEADER( AS)? 1$', option, re.IGNORECASE):
+            options.append('HEADER')
+        elif POSTGRES_COPY_OPTION_RE.match(option):
+            options.append(option)
+        else:
+            raise ValueError("COPY option {!r} isn't supported with target='postgres'".format(option))
+    if 'HEADER' in options and not any(option.upper() == 'CSV' for option in options):
+        raise ValueError("COPY option IGNOREHEADER needs CSV with target='postgres'")
+    return options, gzipped
+
+
+class S3ToRedshiftTransfer(BaseOperator):
+    """
+    Loads every file under an S3 prefix into a Redshift (or Postgres) table
+
+    The files are first COPYed into a staging table, then merged into the
+    target table in a single transaction, so readers never see a half loaded table.
+
+    :param schema: reference to a specific schema in the database
+    :type schema: str
+    :param table: reference to a specific table in the database
+    :type table: str
+    :param s3_bucket: reference to a specific S3 bucket
+    :type s3_bucket: str
+    :param s3_prefix: every key under this prefix is loaded
+    :type s3_prefix: str
+    :param key_pattern: optional fnmatch pattern the keys must match, e.g. '*.csv.gz'
+    :type key_pattern: str
+    :param target: 'redshift' to COPY from S3 with a manifest,
+        'postgres' to stream the S3 objects through COPY FROM STDIN
+    :type target: str
+    :param mode: 'append', 'upsert' (delete matching upsert_keys, then insert) or 'replace'
+    :type mode: str
+    :param upsert_keys: columns identifying a row, required for mode='upsert'
+    :type upsert_keys: list
+    :param parallel_slices: postgres target only - number of objects COPYed at once,
+        each on its own connection (redshift already spreads a manifest COPY over the cluster slices)
+    :type parallel_slices: int
+    :param copy_options: extra options appended to the COPY command, e.g. ['CSV', 'GZIP'].
+        With target='postgres' they are translated: GZIP decompresses every object (keys ending
+        in .gz always are), IGNOREHEADER 1 becomes HEADER, CSV, DELIMITER, NULL AS and QUOTE AS
+        are kept, any other option raises a ValueError
+    :type copy_options: list
+    :param iam_role: redshift target only - role to COPY with instead of the connection's access keys
+    :type iam_role: str
+    :param manifest_prefix: redshift target only - where the generated manifest is written
+    :type manifest_prefix: str
+    :param metrics_path: where to write the task's hook call metrics as json (templated)
+    :type metrics_path: str
+    """
+
+    template_fields = ('s3_prefix', 'metrics_path')
+    template_ext = ()
+    ui_color = '#ededed'
+
+    @apply_defaults
+    def __init__(
+            self,
+            schema: str,
+            table: str,
+            s3_bucket: str,
+            s3_prefix: str,
+            key_pattern: Optional[str] = None,
+            target: str = 'redshift',
+            mode: str = 'append',
+            upsert_keys: Optional[List[str]] = None,
+            parallel_slices: int = 4,
+            redshift_conn_id: str = 'redshift_default',
+            aws_conn_id: str = 'aws_default',
+            verify: Optional[Union[bool, str]] = None,
+            copy_options: Optional[List[str]] = None,
+            iam_role: Optional[str] = None,
+            manifest_prefix: str = 'manifests',
+            metrics_path: Optional[str] = None,
+            *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if target not in ('redshift', 'postgres'):
+            raise ValueError("target must be 'redshift' or 'postgres', not {!r}".format(target))
+        if mode not in ('append', 'upsert', 'replace'):
+            raise ValueError("mode must be 'append', 'upsert' or 'replace', not {!r}".format(mode))
+        if mode == 'upsert' and not upsert_keys:
+            raise ValueError("mode='upsert' needs upsert_keys")
+        if target == 'postgres':
+            # fail when the DAG is parsed rather than half way through a load
+            _postgres_copy_options(copy_options or [])
+
+        self.schema = schema
+        self.table = table
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self.key_pattern = key_pattern
+        self.target = target
+        self.mode = mode
+        self.upsert_keys = upsert_keys or []
+        self.parallel_slices = parallel_slices
+        self.redshift_conn_id = redshift_conn_id
+        self.aws_conn_id = aws_conn_id
+        self.verify = verify
+        self.copy_options = copy_options or []
+        self.iam_role = iam_role
+        self.manifest_prefix = manifest_prefix
+        self.metrics_path = metrics_path
+
+    def execute(self, context):
+        with collect_hook_metrics(self) as metrics:
+            stats = self._execute(context)
+        if metrics is not None:
+            stats['hooks'] = metrics.hook_totals()
+        return stats
+
+    def _execute(self, context):
+        self.hook = PostgresHook(postgres_conn_id=self.redshift_conn_id)
+        self.s3 = S3Hook(aws_conn_id=self.aws_conn_id, verify=self.verify)
+        started = time.monotonic()
+
+        objects = [obj for obj in self.s3.iter_objects(bucket_name=self.s3_bucket, prefix=self.s3_prefix)
+                   if not self.key_pattern or fnmatch.fnmatch(obj['Key'], self.key_pattern)]
+        stats = {'files': len(objects), 'bytes': sum(obj['Size'] for obj in objects), 'rows': 0}
+        if not objects:
+            self.log.info('No keys found under s3://%s/%s', self.s3_bucket, self.s3_prefix)
+            return stats
+
+        target_table = '{}.{}'.format(self.schema, self.table)
+        stage_table = '{}.{}__stage_{}'.format(self.schema, self.table, uuid.uuid4().hex[:8])
+
+        # a real (not TEMP) table, the postgres slices load it from several connections
+        unlogged = 'UNLOGGED ' if self.target == 'postgres' else ''
+        self.hook.run('CREATE {}TABLE {} (LIKE {})'.format(unlogged, stage_table, target_table), True)
+        try:
+            self.log.info('Loading %s files (%s bytes) into %s', stats['files'], stats['bytes'], stage_table)
+            if self.target == 'redshift':
+                self._copy_redshift(stage_table, objects)
+            else:
+                self._copy_postgres(stage_table, objects)
+            stats['rows'] = self._merge(stage_table, target_table)
+        finally:
+            self.hook.run('DROP TABLE IF EXISTS {}'.format(stage_table), True)
+
+        stats['seconds'] = time.monotonic() - started
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds']
+        stats['bytes_per_sec'] = stats['bytes'] / stats['seconds']
+        self.log.info('Loaded %(rows)s rows from %(files)s files in %(seconds).1fs '
+                      '(%(rows_per_sec).0f rows/s, %(bytes_per_sec).0f bytes/s)', stats)
+        # the return value goes to XCom
+        return stats
+
+    def _copy_redshift(self, stage_table, objects):
+        # https://docs.aws.amazon.com/redshift/latest/dg/loading-data-files-using-manifest.html
+        manifest = {'entries': [
+            {'url': 's3://{}/{}'.format(self.s3_bucket, obj['Key']),
+             'mandatory': True,
+             'meta': {'content_length': obj['Size']}}
+            for obj in objects]}
+        manifest_key = '{}/{}_{}.manifest'.format(self.manifest_prefix.rstrip('/'), self.table,
+                                                  uuid.uuid4().hex[:8])
+        self.s3.load_string(json.dumps(manifest), manifest_key, bucket_name=self.s3_bucket, replace=True)
+
+        if self.iam_role:
+            authorization = "IAM_ROLE '{}'".format(self.iam_role)
+        else:
+            credentials = self.s3.get_credentials()
+            authorization = "CREDENTIALS 'aws_access_key_id={};aws_secret_access_key={}{}'".format(
+                credentials.access_key, credentials.secret_key,
+                ';token={}'.format(credentials.token) if credentials.token else '')
+
+        copy_query = """
+            COPY {stage_table}
+            FROM 's3://{s3_bucket}/{manifest_key}'
+            {authorization}
+            MANIFEST
+            {copy_options};
+        """.format(stage_table=stage_table,
+                   s3_bucket=self.s3_bucket,
+                   manifest_key=manifest_key,
+                   authorization=authorization,
+                   copy_options='\n\t\t\t'.join(self.copy_options))
+
+        self.log.info('Executing COPY command...')
+        try:
+            self.hook.run(copy_query, True)
+        finally:
+            self.s3.delete_objects(self.s3_bucket, manifest_key)
+        self.log.info("COPY command complete...")
+
+    def _copy_postgres(self, stage_table, objects):
+        # one client for all the slices, boto3 clients are thread safe
+        s3_client = self.s3.get_conn()
+        copy_options, gzipped = _postgres_copy_options(self.copy_options)
+        copy_sql = 'COPY {} FROM STDIN {}'.format(stage_table, ' '.join(copy_options))
+
+        def load(obj):
+            body = s3_client.get_object(Bucket=self.s3_bucket, Key=obj['Key'])['Body']
+            chunks = body.iter_chunks(S3_STREAM_CHUNK_SIZE)
+            if gzipped or obj['Key'].endswith('.gz'):
+                chunks = _gunzip_chunks(chunks)
+            self.hook.copy_expert_from_iter(copy_sql, chunks)
+
+        # biggest files first, so one huge file doesn't start last and hold up the whole load
+        objects = sorted(objects, key=lambda obj: obj['Size'], reverse=True)
+        with ThreadPoolExecutor(max_workers=self.parallel_slices) as executor:
+            list(executor.map(load, objects))
+
+    def _merge(self, stage_table, target_table):
+        # one transaction - the target switches from the old rows to the new ones all at once
+        with closing(self.hook.get_conn()) as conn:
+            with closing(conn.cursor()) as cur:
+                if self.mode == 'replace':
+                    cur.execute('DELETE FROM {}'.format(target_table))
+                elif self.mode == 'upsert':
+                    # delete + insert works on both redshift and postgres (no ON CONFLICT needed)
+                    matches = ' AND '.join('{t}.{key} = {s}.{key}'.format(t=target_table, s=stage_table, key=key)
+                                           for key in self.upsert_keys)
+                    cur.execute('DELETE FROM {} USING {} WHERE {}'.format(target_table, stage_table, matches))
+                cur.execute('INSERT INTO {} SELECT * FROM {}'.format(target_table, stage_table))
+                rows = cur.rowcount
+            conn.commit()
+        return rows
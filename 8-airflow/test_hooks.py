@@ -0,0 +1,471 @@
+import threading
+import time
+from decimal import Decimal
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+pytest.importorskip('airflow')
+pytest.importorskip('psycopg2')
+
+from airflow.exceptions import AirflowException
+from airflow.models import Connection
+
+import hooks
+
+
+@pytest.fixture
+def pg_hook():
+    connection = Connection(conn_id='pg', conn_type='postgres', host='db', login='airflow', schema='airflow',
+                            port=5432)
+    return hooks.PostgresHook(postgres_conn_id='pg', connection=connection)
+
+
+def test_pooled_run_with_autocommit_commits(pg_connections, pg_hook):
+    pg_hook.run('CREATE TABLE stage (id int)', True)
+    pg_hook.run('DROP TABLE stage', autocommit=True)
+
+    # one connection, reused, and nothing was rolled back when it went back to the pool
+    assert len(pg_connections) == 1
+    assert pg_connections[0].committed == ['CREATE TABLE stage (id int)', 'DROP TABLE stage']
+    # autocommit is switched off again for the next user of the connection
+    assert pg_connections[0].autocommit is False
+
+
+def test_pooled_run_without_autocommit_commits(pg_connections, pg_hook):
+    pg_hook.run(['INSERT INTO t VALUES (1)', 'INSERT INTO t VALUES (2)'])
+
+    assert pg_connections[0].committed == ['INSERT INTO t VALUES (1)', 'INSERT INTO t VALUES (2)']
+
+
+def test_pooled_connection_left_open_is_rolled_back(pg_connections, pg_hook):
+    conn = pg_hook.get_conn()
+    conn.cursor().execute('DELETE FROM t')
+    conn.close()
+
+    assert pg_connections[0].committed == []
+    assert pg_hook.get_conn()._conn is pg_connections[0]
+
+
+def test_unpooled_connection_is_really_closed(pg_connections):
+    hook = hooks.PostgresHook(postgres_conn_id='pg', pool_maxsize=0,
+                              connection=Connection(conn_id='pg', host='db', schema='airflow'))
+    hook.run('CREATE TABLE stage (id int)', True)
+
+    assert pg_connections[0].committed == ['CREATE TABLE stage (id int)']
+    assert pg_connections[0].closed
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('0', '0'),
+    ('-0.00012300', '-0.00012300'),
+    ('10000', '10000'),
+    ('1E+5', '100000'),
+    ('123.4500', '123.4500'),
+    ('7E-20', '7E-20'),
+    ('-99999999999999999999999.000000000001', '-99999999999999999999999.000000000001'),
+    ('3.14159265358979323846264338327950288', '3.14159265358979323846264338327950288'),
+    ('NaN', 'NaN'),
+    ('Infinity', 'Infinity'),
+])
+def test_copy_binary_numeric_round_trip(value, expected):
+    chunks = hooks.iter_copy_binary_chunks([(Decimal(value), None)], ['numeric', 'numeric'])
+    (decoded, null), = hooks.iter_copy_binary_rows(chunks, ['numeric', 'numeric'])
+
+    # the decimals are kept, like postgres keeps the display scale
+    assert str(decoded) == expected
+    assert null is None
+
+
+def select_events(payload, chunk_size):
+    """
+    A recorded S3 Select event stream: the payload in Records events of chunk_size bytes
+    (records and characters split across them), with the Stats and End events S3 sends last
+    """
+    for start in range(0, len(payload), chunk_size):
+        yield {'Records': {'Payload': payload[start:start + chunk_size]}}
+    yield {'Stats': {'Details': {'BytesScanned': len(payload), 'BytesReturned': len(payload)}}}
+    yield {'End': {}}
+
+
+class FakeSelectS3Client:
+    """
+    Replays S3 Select over one CSV key: a scan range returns the records that start inside it, end inclusive
+    """
+    def __init__(self, data, chunk_size=7, block_range=None):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.selects = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        # the select of this range stops after its first few chunks until released
+        self.block_range = block_range
+        self.release = threading.Event()
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.data)}
+
+    def select_object_content(self, **kwargs):
+        self.selects.append(kwargs)
+        scan_range = kwargs.get('ScanRange', {'Start': 0, 'End': len(self.data) - 1})
+        records = []
+        offset = 0
+        for line in self.data.splitlines(True):
+            if scan_range['Start'] <= offset <= scan_range['End']:
+                records.append(line)
+            offset += len(line)
+        return {'Payload': self._payload(b''.join(records), (scan_range['Start'], scan_range['End']))}
+
+    def _payload(self, payload, scan_range):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            for i, event in enumerate(select_events(payload, self.chunk_size)):
+                if i == 3 and scan_range == self.block_range:
+                    assert self.release.wait(5)
+                yield event
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    # 100 records of 8 bytes, the 4 scan ranges of 200 bytes each start right on a record
+    client = FakeSelectS3Client(b''.join(b'rec%04d\n' % i for i in range(100)))
+    monkeypatch.setattr(hooks.S3Hook, 'get_conn', lambda self: client)
+    return client
+
+
+def test_select_records_split_across_chunks():
+    payload = 'a,1\nb,éé\nc,3\n'.encode('utf-8')
+    for chunk_size in range(1, len(payload) + 1):
+        records = hooks.iter_select_records(select_events(payload, chunk_size))
+        assert list(records) == ['a,1', 'b,éé', 'c,3']
+
+
+def test_select_records_raise_error_event():
+    from botocore.exceptions import EventStreamError
+
+    def events():
+        yield {'Records': {'Payload': b'a,1\nb,'}}
+        yield {'Records': {'Payload': b'2\nc'}}
+        # botocore raises the error events of the stream while iterating it
+        raise EventStreamError({'Error': {'Code': 'InternalError', 'Message': 'failed'}},
+                               'SelectObjectContent')
+
+    records = hooks.iter_select_records(events())
+    assert next(records) == 'a,1'
+    assert next(records) == 'b,2'
+    with pytest.raises(EventStreamError):
+        next(records)
+
+
+def test_select_records_without_end_event():
+    with pytest.raises(AirflowException):
+        list(hooks.iter_select_records([{'Records': {'Payload': b'a,1\n'}}]))
+
+
+def test_select_key_scan_ranges_do_not_overlap(s3_client):
+    hook = hooks.S3Hook(aws_conn_id='aws')
+
+    assert hook.select_key_scan_ranges('data.csv', 'bucket', min_range_size=1) == [
+        (0, 199), (200, 399), (400, 599), (600, 799)]
+
+
+def test_select_key_parallel_yields_every_record_once_in_order(s3_client):
+    hook = hooks.S3Hook(aws_conn_id='aws')
+
+    records = list(hook.select_key_parallel('data.csv', 'bucket', min_range_size=1, max_workers=2))
+
+    assert records == ['rec%04d' % i for i in range(100)]
+    assert [select['ScanRange'] for select in s3_client.selects] == [
+        {'Start': start, 'End': start + 199} for start in range(0, 800, 200)]
+    assert s3_client.max_running <= 2
+
+
+def test_select_key_parallel_streams_records(s3_client):
+    s3_client.block_range = (0, 199)
+    hook = hooks.S3Hook(aws_conn_id='aws')
+
+    records = hook.select_key_parallel('data.csv', 'bucket', min_range_size=1, max_workers=2,
+                                       max_buffered_records=4)
+    # the first records come out while their range is still being selected
+    assert next(records) == 'rec0000'
+    assert not s3_client.release.is_set()
+    # and no more than max_workers ranges were started
+    assert len(s3_client.selects) == 2
+    s3_client.release.set()
+    assert list(records) == ['rec%04d' % i for i in range(1, 100)]
+
+
+def test_select_key_parallel_empty_key(monkeypatch):
+    client = FakeSelectS3Client(b'')
+    monkeypatch.setattr(hooks.S3Hook, 'get_conn', lambda self: client)
+    hook = hooks.S3Hook(aws_conn_id='aws')
+
+    assert list(hook.select_key_parallel('data.csv', 'bucket', min_range_size=1)) == []
+    assert 'ScanRange' not in client.selects[0]
+
+
+def test_run_many_returns_responses_in_call_order(http_sessions):
+    def handler(request):
+        # the first calls take the longest, so they finish last
+        n = int(request.url.rsplit('/', 1)[1])
+        time.sleep(0.01 * (10 - n))
+        return 200, {}, str(n).encode()
+    http_sessions.handler = handler
+    hook = hooks.HttpHook(method='GET', http_conn_id='api')
+
+    responses = hook.run_many([('items/{}'.format(n), None) for n in range(10)], max_workers=5)
+
+    assert [response.text for response in responses] == [str(n) for n in range(10)]
+
+
+def test_run_many_limits_requests_in_flight(http_sessions):
+    lock = threading.Lock()
+    in_flight = []
+    most_in_flight = []
+
+    def handler(request):
+        with lock:
+            in_flight.append(request)
+            most_in_flight.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.remove(request)
+        return 200, {}, b'{}'
+    http_sessions.handler = handler
+    hook = hooks.HttpHook(method='GET', http_conn_id='api')
+
+    hook.run_many([('items', {'page': n}) for n in range(20)], max_workers=3)
+
+    assert 1 < max(most_in_flight) <= 3
+
+
+def test_pooled_session_reused_per_connection(http_sessions):
+    hooks.HttpHook(method='GET', http_conn_id='api').run('a', headers={'X-Request': '1'})
+    hooks.HttpHook(method='GET', http_conn_id='api').run_many([('b', None), ('c', None)])
+    hooks.HttpHook(method='GET', http_conn_id='other').run('d')
+
+    assert len(http_sessions) == 2
+    assert [request.url for request in http_sessions[0].sent] == [
+        'https://api/a', 'https://api/b', 'https://api/c']
+    assert [request.url for request in http_sessions[1].sent] == ['https://api/d']
+    # per request headers are sent with the request, not merged into the shared session
+    assert http_sessions[0].sent[0].headers['X-Request'] == '1'
+    assert 'X-Request' not in http_sessions[0].headers
+
+
+def http_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return response
+
+
+def retry_state(attempt, response=None, error=None, elapsed=0.0):
+    """
+    What tenacity hands the retry policy after attempt number `attempt` failed
+    """
+    if error is not None:
+        outcome = SimpleNamespace(failed=True, exception=lambda: error)
+    else:
+        outcome = SimpleNamespace(failed=False, result=lambda: response)
+    return SimpleNamespace(attempt_number=attempt, outcome=outcome, seconds_since_start=elapsed)
+
+
+def test_retry_backoff_full_jitter_bounds():
+    policy = hooks.HttpRetryPolicy(backoff=1.0, max_backoff=5.0)
+    for attempt, cap in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)]:
+        waits = [policy.wait(retry_state(attempt, http_response(500))) for _ in range(200)]
+        assert all(0 <= wait <= cap for wait in waits)
+        # spread out, not all the same delay
+        assert max(waits) - min(waits) > cap / 4
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_retry_after_is_respected(status):
+    policy = hooks.HttpRetryPolicy(backoff=1.0)
+
+    assert policy.wait(retry_state(1, http_response(status, {'Retry-After': '7'}))) == 7.0
+    date = formatdate(time.time() + 20, usegmt=True)
+    assert 15 < policy.wait(retry_state(1, http_response(status, {'Retry-After': date}))) <= 20
+
+    ignoring = hooks.HttpRetryPolicy(backoff=1.0, respect_retry_after=False)
+    assert ignoring.wait(retry_state(1, http_response(status, {'Retry-After': '7'}))) <= 1.0
+
+
+def test_retry_per_status_rules(http_sessions):
+    statuses = []
+
+    def handler(request):
+        statuses.append(int(request.url.rsplit('/', 1)[1]))
+        return statuses[-1], {'Retry-After': '0'}, b''
+    http_sessions.handler = handler
+    policy = hooks.HttpRetryPolicy(max_attempts=5, retry_statuses={429: 4, 503: 2}, backoff=0.001,
+                                   failure_threshold=100)
+    hook = hooks.HttpHook(method='GET', http_conn_id='api', retry_policy=policy)
+
+    for status, attempts in [(429, 4), (503, 2), (500, 1), (404, 1)]:
+        del statuses[:]
+        with pytest.raises(AirflowException, match=str(status)):
+            hook.run(str(status))
+        assert statuses == [status] * attempts
+
+
+def test_retry_connection_errors_only():
+    policy = hooks.HttpRetryPolicy()
+
+    assert policy.retry(retry_state(1, error=requests.exceptions.ConnectionError()))
+    assert policy.retry(retry_state(1, error=requests.exceptions.Timeout()))
+    assert not policy.retry(retry_state(1, error=ValueError()))
+    assert not policy.retry(retry_state(1, http_response(404)))
+
+
+def test_retry_total_deadline(http_sessions):
+    http_sessions.handler = lambda request: (500, {}, b'')
+    policy = hooks.HttpRetryPolicy(max_attempts=100, backoff=10.0, deadline=0.2)
+    hook = hooks.HttpHook(method='GET', http_conn_id='api', retry_policy=policy)
+
+    # the backoff is cut short by the deadline, and no attempt starts after it
+    assert policy.wait(retry_state(3, http_response(500), elapsed=0.15)) == pytest.approx(0.05)
+    assert policy.stop(retry_state(3, http_response(500), elapsed=0.2))
+    start = time.monotonic()
+    with pytest.raises(AirflowException, match='500'):
+        hook.run('items')
+    assert time.monotonic() - start < 1.0
+
+    # a Retry-After beyond the deadline isn't waited for at all
+    http_sessions.handler = lambda request: (503, {'Retry-After': '30'}, b'')
+    del http_sessions[0].sent[:]
+    with pytest.raises(AirflowException, match='503'):
+        hook.run('items')
+    assert len(http_sessions[0].sent) == 1
+
+
+def test_circuit_breaker_open_half_open_closed(http_sessions):
+    status = [500]
+    http_sessions.handler = lambda request: (status[0], {}, b'')
+    policy = hooks.HttpRetryPolicy(max_attempts=1, failure_threshold=2, reset_timeout=0.1)
+    hook = hooks.HttpHook(method='GET', http_conn_id='api', retry_policy=policy)
+    sent = lambda: len(http_sessions[0].sent)
+
+    for _ in range(2):
+        with pytest.raises(AirflowException, match='500'):
+            hook.run('items')
+    # open: fails fast without sending anything
+    with pytest.raises(AirflowException, match='Circuit open'):
+        hook.run('items')
+    assert sent() == 2
+
+    # half open after reset_timeout: one trial call, which fails and opens it again
+    time.sleep(0.1)
+    with pytest.raises(AirflowException, match='500'):
+        hook.run('items')
+    with pytest.raises(AirflowException, match='Circuit open'):
+        hook.run('items')
+    assert sent() == 3
+
+    # a successful trial closes it
+    time.sleep(0.1)
+    status[0] = 200
+    hook.run('items')
+    hook.run('items')
+    assert sent() == 5
+
+
+def test_circuit_breaker_per_settings(http_sessions):
+    http_sessions.handler = lambda request: (500, {}, b'')
+    lenient = hooks.HttpHook(method='GET', http_conn_id='api', retry_policy=hooks.HttpRetryPolicy(
+        max_attempts=1, failure_threshold=100))
+    strict = hooks.HttpHook(method='GET', http_conn_id='api', retry_policy=hooks.HttpRetryPolicy(
+        max_attempts=1, failure_threshold=2))
+
+    with pytest.raises(AirflowException, match='500'):
+        lenient.run('items')
+    for _ in range(2):
+        with pytest.raises(AirflowException, match='500'):
+            strict.run('items')
+
+    with pytest.raises(AirflowException, match='Circuit open'):
+        strict.run('items')
+    with pytest.raises(AirflowException, match='500'):
+        lenient.run('items')
+
+
+@pytest.fixture
+def orders_table(pg_connections):
+    # orders has an int4 primary key id from 1 to 100 and 40 pages
+    pg_connections.results[:] = [
+        ('pg_export_snapshot', [('00000003-0000001B-1',)]),
+        ('pg_index', [('id', 'int4')]),
+        ('min(id)', [(1, 100)]),
+        ('pg_relation_size', [(40,)]),
+        ('TO STDOUT', [b'1\tbook\n']),
+    ]
+    return pg_connections
+
+
+def copy_statements(pg_connections):
+    return sorted(sql for conn in pg_connections for sql, _ in conn.executed if sql.startswith('COPY'))
+
+
+def test_bulk_dump_parallel_pk_ranges(orders_table, pg_hook, tmp_path):
+    files = pg_hook.bulk_dump_parallel('orders', str(tmp_path / 'orders_{slice}.tsv'), slices=4)
+
+    assert files == [str(tmp_path / 'orders_{}.tsv'.format(index)) for index in range(4)]
+    assert all(open(file, 'rb').read() == b'1\tbook\n' for file in files)
+    # the first and last ranges are open, so rows added beyond min / max aren't lost
+    assert copy_statements(orders_table) == sorted(
+        'COPY (SELECT * FROM orders WHERE {}) TO STDOUT'.format(condition) for condition in [
+            'id < 26', 'id >= 26 AND id < 51', 'id >= 51 AND id < 76', 'id >= 76'])
+
+
+def test_bulk_dump_parallel_slices_share_the_snapshot(orders_table, pg_hook, tmp_path):
+    pg_hook.bulk_dump_parallel('orders', str(tmp_path / 'orders_{slice}.tsv'), slices=4)
+
+    copies = 0
+    for conn in orders_table:
+        for previous, (sql, _) in zip(conn.executed, conn.executed[1:]):
+            if sql.startswith('COPY'):
+                copies += 1
+                assert previous == ('SET TRANSACTION SNAPSHOT %s', ('00000003-0000001B-1',))
+    assert copies == 4
+
+
+def test_bulk_dump_parallel_ctid_ranges(orders_table, pg_hook, tmp_path):
+    pg_hook.bulk_dump_parallel('orders', str(tmp_path / 'orders_{slice}.tsv'), slices=4, split_by='ctid')
+
+    assert copy_statements(orders_table) == sorted(
+        'COPY (SELECT * FROM orders WHERE {}) TO STDOUT'.format(condition) for condition in [
+            "ctid < '(10,0)'::tid",
+            "ctid >= '(10,0)'::tid AND ctid < '(20,0)'::tid",
+            "ctid >= '(20,0)'::tid AND ctid < '(30,0)'::tid",
+            "ctid >= '(30,0)'::tid"])
+
+
+def test_bulk_dump_parallel_ctid_before_pg14_falls_back_to_pk(orders_table, pg_hook, tmp_path):
+    orders_table.server_version = 130011
+
+    pg_hook.bulk_dump_parallel('orders', str(tmp_path / 'orders_{slice}.tsv'), slices=2, split_by='ctid')
+
+    assert copy_statements(orders_table) == [
+        'COPY (SELECT * FROM orders WHERE id < 51) TO STDOUT',
+        'COPY (SELECT * FROM orders WHERE id >= 51) TO STDOUT']
+    assert not any('pg_relation_size' in sql for conn in orders_table for sql, _ in conn.executed)
+
+
+def test_bulk_dump_parallel_ctid_before_pg14_without_pk_is_one_slice(orders_table, pg_hook, tmp_path):
+    orders_table.server_version = 130011
+    orders_table.results[1] = ('pg_index', [])
+
+    files = pg_hook.bulk_dump_parallel('orders', str(tmp_path / 'orders_{slice}.tsv'), slices=4,
+                                       split_by='ctid')
+
+    assert len(files) == 1
+    assert copy_statements(orders_table) == ['COPY (SELECT * FROM orders WHERE true) TO STDOUT']
@@ -0,0 +1,190 @@
+import gzip
+import json
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip('airflow')
+pytest.importorskip('psycopg2')
+
+from airflow.models import Connection
+
+import hooks
+import operators
+
+Credentials = namedtuple('Credentials', 'access_key secret_key token')
+
+
+class FakeS3Body:
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+class FakeS3Hook:
+    """
+    An S3Hook over a dict of key -> bytes
+    """
+    objects = {}
+
+    def __init__(self, aws_conn_id=None, verify=None):
+        self.strings = {}
+        self.deleted = []
+
+    def iter_objects(self, bucket_name=None, prefix=''):
+        for key, data in sorted(self.objects.items()):
+            if key.startswith(prefix):
+                yield {'Key': key, 'Size': len(data)}
+
+    def get_conn(self):
+        return self
+
+    def get_object(self, Bucket, Key):
+        return {'Body': FakeS3Body(self.objects[Key])}
+
+    def load_string(self, string_data, key, bucket_name=None, replace=False):
+        self.strings[key] = string_data
+
+    def delete_objects(self, bucket, keys):
+        self.deleted.append(keys)
+
+    def get_credentials(self):
+        return Credentials('key', 'secret', None)
+
+    def select_key(self, key, bucket_name=None, expression=None):
+        yield from hooks.iter_select_records([{'Records': {'Payload': self.objects[key]}}, {'End': {}}])
+
+
+@pytest.fixture
+def redshift_hook(monkeypatch, pg_connections):
+    connection = Connection(conn_id='redshift', host='db', login='airflow', schema='airflow', port=5439)
+    # the operator's PostgresHook, pooled, as the hooks module implements it
+    monkeypatch.setattr(operators, 'PostgresHook',
+                        lambda postgres_conn_id: hooks.PostgresHook(postgres_conn_id=postgres_conn_id,
+                                                                    connection=connection))
+    monkeypatch.setattr(operators, 'S3Hook', FakeS3Hook)
+    monkeypatch.setattr(FakeS3Hook, 'objects', {
+        'exports/a.tsv': b'1\ta\n2\tb\n',
+        'exports/b.tsv.gz': gzip.compress(b'3\tc\n'),
+        'other/c.tsv': b'4\td\n',
+    })
+    return pg_connections
+
+
+def committed(connections):
+    return [sql.strip() for conn in connections for sql in conn.committed]
+
+
+def test_s3_to_postgres_load_is_committed(redshift_hook):
+    operator = operators.S3ToRedshiftTransfer(task_id='load', schema='public', table='t', s3_bucket='bucket',
+                                              s3_prefix='exports/', target='postgres', mode='upsert',
+                                              upsert_keys=['id'], parallel_slices=2)
+    stats = operator.execute({})
+
+    statements = committed(redshift_hook)
+    stage_table = statements[0].split()[3]
+    assert statements[0] == 'CREATE UNLOGGED TABLE {} (LIKE public.t)'.format(stage_table)
+    # every file was streamed into the stage table (gzip'd ones decompressed) and committed
+    assert statements.count('COPY {} FROM STDIN'.format(stage_table)) == 2
+    assert sorted(data for conn in redshift_hook for data in conn.copied) == [b'1\ta\n2\tb\n', b'3\tc\n']
+    merge = ['DELETE FROM public.t USING {stage} WHERE public.t.id = {stage}.id'.format(stage=stage_table),
+             'INSERT INTO public.t SELECT * FROM {}'.format(stage_table)]
+    assert statements[-3:] == merge + ['DROP TABLE IF EXISTS {}'.format(stage_table)]
+    assert stats['files'] == 2
+
+
+def test_s3_to_redshift_load_is_committed(redshift_hook):
+    operator = operators.S3ToRedshiftTransfer(task_id='load', schema='public', table='t', s3_bucket='bucket',
+                                              s3_prefix='exports/', mode='replace', iam_role='arn:role')
+    operator.execute({})
+
+    # everything ran in order on the one pooled connection, and nothing was rolled back
+    statements = committed(redshift_hook)
+    stage_table = statements[0].split()[2]
+    assert len(redshift_hook) == 1
+    assert statements[0] == 'CREATE TABLE {} (LIKE public.t)'.format(stage_table)
+    assert statements[1].startswith('COPY {}\n'.format(stage_table))
+    assert "IAM_ROLE 'arn:role'" in statements[1]
+    assert statements[2:] == ['DELETE FROM public.t',
+                              'INSERT INTO public.t SELECT * FROM {}'.format(stage_table),
+                              'DROP TABLE IF EXISTS {}'.format(stage_table)]
+    assert redshift_hook[0].pending == []
+
+
+def test_batch_python_operator_keeps_multiline_csv_fields(monkeypatch):
+    monkeypatch.setattr(operators, 'S3Hook', FakeS3Hook)
+    monkeypatch.setattr(FakeS3Hook, 'objects', {
+        'notes.csv': b'1,"first line\nsecond line"\r\n2,plain\r\n3,"a\r\nb"\r\n',
+    })
+    batches = []
+
+    def transform(batch):
+        batches.append(batch)
+        return batch
+
+    operator = operators.BatchPythonOperator(task_id='transform', python_callable=transform,
+                                             s3_bucket='bucket', s3_key='notes.csv', batch_size=2)
+    stats = operator.execute({})
+
+    assert batches == [[('1', 'first line\nsecond line'), ('2', 'plain')], [('3', 'a\r\nb')]]
+    assert stats['rows_in'] == stats['rows_out'] == 3
+
+
+def test_load_collects_hook_metrics(redshift_hook, tmp_path):
+    metrics_path = str(tmp_path / 'metrics.json')
+    operator = operators.S3ToRedshiftTransfer(task_id='load', schema='public', table='t', s3_bucket='bucket',
+                                              s3_prefix='exports/', target='postgres',
+                                              metrics_path=metrics_path)
+    stats = operator.execute({})
+
+    # the stage table create and drop, and one COPY per file
+    totals, = [total for total in stats['hooks'] if total['hook'] == 'PostgresHook']
+    assert totals['calls'] == 4
+    assert totals['bytes_sent'] == len(b'1\ta\n2\tb\n') + len(b'3\tc\n')
+    with open(metrics_path) as file:
+        operations = {row['operation']: row['calls'] for row in json.load(file)['operations']}
+    assert operations == {'run': 2, 'copy_expert_from_iter': 2}
+
+
+@pytest.mark.parametrize('copy_options, expected', [
+    ([], ([], False)),
+    (['CSV', 'GZIP'], (['CSV'], True)),
+    (['CSV', 'IGNOREHEADER 1', "DELIMITER ';'", "NULL AS ''", "QUOTE AS '\"'"],
+     (['CSV', 'HEADER', "DELIMITER ';'", "NULL AS ''", "QUOTE AS '\"'"], False)),
+])
+def test_postgres_copy_options(copy_options, expected):
+    assert operators._postgres_copy_options(copy_options) == expected
+
+
+@pytest.mark.parametrize('copy_options', [
+    ['BZIP2'], ['CSV', 'IGNOREHEADER 2'], ['IGNOREHEADER 1'], ["TIMEFORMAT 'auto'"], ['BLANKSASNULL'],
+])
+def test_postgres_copy_options_redshift_only(copy_options):
+    with pytest.raises(ValueError):
+        operators._postgres_copy_options(copy_options)
+    with pytest.raises(ValueError):
+        operators.S3ToRedshiftTransfer(task_id='load', schema='public', table='t', s3_bucket='bucket',
+                                       s3_prefix='exports/', target='postgres', copy_options=copy_options)
+    # redshift itself gets them as they are
+    operators.S3ToRedshiftTransfer(task_id='load', schema='public', table='t', s3_bucket='bucket',
+                                   s3_prefix='exports/', copy_options=copy_options)
+
+
+def test_s3_to_postgres_translates_redshift_copy_options(redshift_hook, monkeypatch):
+    monkeypatch.setattr(FakeS3Hook, 'objects', {
+        'exports/a.csv': gzip.compress(b'id,name\n1,a\n'),
+        'exports/b.csv.gz': gzip.compress(b'id,name\n2,b\n'),
+    })
+    operator = operators.S3ToRedshiftTransfer(task_id='load', schema='public', table='t', s3_bucket='bucket',
+                                              s3_prefix='exports/', target='postgres',
+                                              copy_options=['CSV', 'GZIP', 'IGNOREHEADER 1'])
+    operator.execute({})
+
+    statements = committed(redshift_hook)
+    stage_table = statements[0].split()[3]
+    assert statements.count('COPY {} FROM STDIN CSV HEADER'.format(stage_table)) == 2
+    assert sorted(data for conn in redshift_hook for data in conn.copied) == [
+        b'id,name\n1,a\n', b'id,name\n2,b\n']